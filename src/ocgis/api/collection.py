@@ -5,6 +5,7 @@ from shapely.geometry.polygon import Polygon
 from shapely.geometry.multipolygon import MultiPolygon
 from copy import deepcopy
 from ocgis.calc.base import KeyedFunctionOutput
+from ocgis.util import dates
 
 
 class AbstractCollection(object):
@@ -48,13 +49,15 @@ class AbstractCollection(object):
             ret = headers
         return(ret)
     
-    def get_iter(self,with_geometry_ids=False):
+    def get_iter(self,with_geometry_ids=False,time_strings=False):
         '''
         :param with_geometry_ids: If True, return a dictionary containing geometry identifiers.
         :type with_geometry_ids: bool
+        :param time_strings: If True, times are returned formatted as strings.
+        :type time_strings: bool
         '''
         headers = self.get_headers()
-        for geom,attrs in self._get_iter_():
+        for geom,attrs in self._get_iter_(time_strings=time_strings):
             row = [attrs[h] for h in headers]
             if with_geometry_ids:
                 geom_ids = {'ugid':attrs['ugid'],'gid':attrs['gid'],'did':attrs['did']}
@@ -74,7 +77,7 @@ class AbstractCollection(object):
         return(ret)
     
     @abstractmethod
-    def _get_iter_(self): 'generator'
+    def _get_iter_(self,time_strings=False): 'generator'
     
     
 class RawCollection(AbstractCollection):
@@ -84,31 +87,19 @@ class RawCollection(AbstractCollection):
         self.variables = OrderedDict()
         super(RawCollection,self).__init__(ops=ops)
     
-    def _get_iter_(self):
-        ## we want to break out the date parts if any date parts are present
-        ## in the headers argument.
-        headers = self.get_headers()
-        intersection = set(headers).intersection(set(['year','month','day']))
-        if len(intersection) > 0:
-            add_date_parts = True
-        else:
-            add_date_parts = False
-
+    def _get_iter_(self,time_strings=False):
+        ## date parts are added to the attributes by the time dimension
         vid = 1
         ugid = self.ugid
         for alias,ds in self.variables.iteritems():
             did = ds.request_dataset.did
             variable = ds.request_dataset.variable
-            for geom,attrs in ds.get_iter_value():
+            for geom,attrs in ds.get_iter_value(time_strings=time_strings):
                 attrs['did'] = did
                 attrs['alias'] = alias
                 attrs['variable'] = variable
                 attrs['vid'] = vid
                 attrs['ugid'] = ugid
-                if add_date_parts:
-                    attrs['year'] = attrs['time'].year
-                    attrs['month'] = attrs['time'].month
-                    attrs['day'] = attrs['time'].day
                 if type(geom) == Polygon:
                     geom = MultiPolygon([geom])
                 yield(geom,attrs)
@@ -127,7 +118,7 @@ class CalcCollection(AbstractCollection):
         self.funcs = funcs
         super(CalcCollection,self).__init__(ops=raw_collection.ops)
     
-    def _get_iter_(self):
+    def _get_iter_(self,time_strings=False):
 #        headers = self.get_headers()
         vid = 1
         cid = 1
@@ -153,12 +144,19 @@ class CalcCollection(AbstractCollection):
             vid += 1
             
     def _get_headers_(self):
-        return(deepcopy(constants.calc_headers))
+        ret = deepcopy(constants.calc_headers)
+        ## groupings other than date parts follow the date part headers
+        grouping = None if self.ops is None else self.ops.calc_grouping
+        if grouping is not None:
+            idx = ret.index('day') + 1
+            names = dates.get_group_names(grouping)
+            ret[idx:idx] = [h for h in constants.calc_group_headers if h in names]
+        return(ret)
             
             
 class MultivariateCalcCollection(CalcCollection):
     
-    def _get_iter_(self):
+    def _get_iter_(self,time_strings=False):
         arch = self._archetype
         ## determine if there is a temporal grouping
         temporal_group = False if arch.temporal.group is None else True
@@ -167,7 +165,7 @@ class MultivariateCalcCollection(CalcCollection):
         ugid = self.ugid
         for calc_name,calc_value in self.calc.iteritems():
             for geom,attrs in arch.get_iter_value(value=calc_value,temporal_group=temporal_group,
-                                                  add_masked=True):
+                                                  add_masked=True,time_strings=time_strings):
                 attrs['calc_name'] = calc_name
                 attrs['cid'] = cid
                 attrs['ugid'] = ugid
@@ -217,7 +215,7 @@ class KeyedOutputCalcCollection(CalcCollection):
             ret = headers
         return(ret)
     
-    def _get_iter_(self):
+    def _get_iter_(self,time_strings=False):
 #        headers = self._get_headers_()
         vid = 1
         cid = 1
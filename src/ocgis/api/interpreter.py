@@ -5,10 +5,17 @@ from ocgis.api.parms import definition
 from ocgis.conv.meta import MetaConverter
 from ocgis.conv.base import OcgConverter
 from subset import SubsetOperation
+from ocgis.exc import EmptyData, RequestSizeError
+from ocgis.interface.projection import WGS84
+from ocgis.interface.shp import ShpDataset
+from ocgis.util.spatial.wrap import Wrapper
+from shapely.geometry.point import Point
+from collections import OrderedDict
+from copy import deepcopy
+import numpy as np
 import os
 import shutil
-
-## TODO: add method to estimate request size
+from ocgis.util import dates
 
 class Interpreter(object):
     '''Superclass for custom interpreter frameworks.
@@ -32,6 +39,10 @@ class Interpreter(object):
         '''Validate operation definition dictionary.'''
         raise(NotImplementedError)
     
+    def estimate(self):
+        '''Estimate the size of the request without reading data values.'''
+        raise(NotImplementedError)
+    
     def execute(self):
         '''Run requested operations and return a path to the output file or a
         NumPy-based output object depending on specification.'''
@@ -43,10 +54,71 @@ class OcgInterpreter(Interpreter):
     
     def check(self):
         definition.identify_iterator_mode(self.ops)
+        
+    def estimate(self):
+        '''
+        Estimate the size of the request using only dimension metadata and the
+        bounding boxes of the selection geometries. No data values are read.
+        
+        :returns: A dictionary with keys `bytes_read` (bytes pulled from source
+         data), `peak_bytes` (peak in-memory bytes for data values, masks, and
+         calculation outputs), and `datasets`. `datasets` maps each request
+         dataset alias to its `cells`, `time_steps`, `levels`, `bytes_read`, and
+         `peak_bytes`. Cells are summed across selection geometries.
+        :rtype: :class:`collections.OrderedDict`
+        '''
+        ## iterate over the selection geometries in the same manner as the
+        ## subset operation
+        if self.ops.geom is None:
+            geoms = [None]
+        elif isinstance(self.ops.geom,ShpDataset):
+            geoms = list(self.ops.geom)
+        else:
+            geoms = [self.ops.geom]
+            
+        datasets = OrderedDict()
+        peaks = []
+        for geom in geoms:
+            peak = 0
+            for rd in self.ops.dataset:
+                est = self._estimate_request_dataset_(rd,geom)
+                if rd.alias not in datasets:
+                    datasets[rd.alias] = OrderedDict.fromkeys(est.keys(),0)
+                for key in ['cells','bytes_read','peak_bytes']:
+                    datasets[rd.alias][key] += est[key]
+                for key in ['time_steps','levels']:
+                    datasets[rd.alias][key] = est[key]
+                ## datasets in a collection are held in memory together
+                peak += est['peak_bytes']
+            peaks.append(peak)
+            
+        ## numpy output holds all collections in memory. otherwise, collections
+        ## are released following their conversion.
+        if self.ops.output_format == 'numpy':
+            peak_bytes = sum(peaks)
+        else:
+            peak_bytes = max(peaks)
+        
+        ret = OrderedDict()
+        ret['bytes_read'] = sum([v['bytes_read'] for v in datasets.itervalues()])
+        ret['peak_bytes'] = peak_bytes
+        ret['datasets'] = datasets
+        return(ret)
     
     def execute(self):
         ## check for a user-supplied output prefix
         prefix = self.ops.prefix
+        
+        ## check the request size against the memory limit before any data is
+        ## loaded. eligible requests are switched to the tiled path.
+        if env.MEMORY_LIMIT is not None and self.ops.output_format != 'meta':
+            tile_dimension = self._check_memory_limit_()
+            if tile_dimension is not None:
+                from ocgis.util.large_array import compute
+                ## the sample size calculation is appended by the operations
+                calc = [deepcopy(c) for c in self.ops.calc if c['func'] != 'n']
+                return(compute(self.ops.dataset,calc,self.ops.calc_grouping,
+                               tile_dimension,prefix=prefix,dir_output=self.ops.dir_output))
             
         ## do directory management.
         if self.ops.output_format == 'numpy':
@@ -124,12 +196,12 @@ class OcgInterpreter(Interpreter):
             else:
                 ## the operations object performs subsetting and calculations
                 ocgis_lh('initializing subset',interpreter_log,level=logging.DEBUG)
+                Conv = OcgConverter.get_converter(self.ops.output_format)
                 so = SubsetOperation(self.ops,serial=env.SERIAL,nprocs=env.CORES,
-                                     validate=True)
+                                     validate=True,ordered=not Conv._allow_unordered)
                 ## if there is no grouping on the output files, a singe converter is
                 ## is needed
                 if self.ops.output_grouping is None:
-                    Conv = OcgConverter.get_converter(self.ops.output_format)
                     ocgis_lh('initializing converter',interpreter_log,
                              level=logging.DEBUG)
                     conv = Conv(so,outdir,prefix,mode=self.ops.mode,ops=self.ops)
@@ -145,3 +217,136 @@ class OcgInterpreter(Interpreter):
         finally:
 #            env.ops = None
             ocgis_lh.shutdown()
+            
+    def _check_memory_limit_(self):
+        '''
+        :returns: `None` if the request fits into :attr:`env.MEMORY_LIMIT` or a
+         tile dimension if the request should be executed using tiles.
+        :raises: :class:`ocgis.exc.RequestSizeError`
+        '''
+        est = self.estimate()
+        if est['peak_bytes'] <= env.MEMORY_LIMIT:
+            ret = None
+        else:
+            ## only netCDF calculation requests on the entire spatial domain may
+            ## be tiled.
+            ops = self.ops
+            tileable = ops.output_format == 'nc' and ops.calc is not None and \
+                       ops.geom is None and ops.slice is None and not ops.file_only and \
+                       not ops.snippet
+            ret = None
+            if tileable:
+                cells = sum([v['cells'] for v in est['datasets'].itervalues()])
+                per_cell = float(est['peak_bytes'])/cells
+                tile_dimension = int(np.sqrt(env.MEMORY_LIMIT/per_cell))
+                if tile_dimension >= 1:
+                    ret = tile_dimension
+            if ret is None:
+                e = RequestSizeError(est['peak_bytes'],env.MEMORY_LIMIT)
+                ocgis_lh(exc=e,logger='interpreter')
+        return(ret)
+            
+    def _estimate_request_dataset_(self,rd,geom):
+        ops = self.ops
+        ods = rd.ds
+        ## no data values are loaded for these requests
+        if ops.output_format == 'meta' or ops.file_only:
+            load_values = False
+        else:
+            load_values = True
+        if ops.slice is not None:
+            ods = ods[ops.slice]
+            
+        ## spatial cells to load
+        cells = self._estimate_cells_(ods,geom)
+        
+        ## levels to load
+        if ods.level is None:
+            levels = 1
+        elif rd.level_range is not None:
+            levels = rd.level_range[1] - rd.level_range[0] + 1
+        else:
+            levels = ods.level.value.shape[0]
+        if ops.snippet:
+            levels = 1
+            
+        ## time steps to load. time regions are read as one hyperslab per
+        ## contiguous run of time indices.
+        temporal = ods.temporal
+        try:
+            if ops.snippet and ops.calc is None:
+                temporal = temporal[0]
+            else:
+                if rd.time_range is not None:
+                    temporal = temporal.subset(rd.time_range)
+                if rd.time_region is not None:
+                    temporal = temporal.subset(rd.time_region)
+            time_steps = temporal.value.shape[0]
+        except EmptyData:
+            time_steps = 0
+        if time_steps == 0:
+            runs = []
+        else:
+            runs = ods._get_time_runs_(temporal.real_idx)
+        
+        ## data type size of the variable and its mask
+        itemsize = np.dtype(ods.metadata['variables'][rd.variable]['dtype']).itemsize
+        itemsize_masked = itemsize + 1
+        
+        elements = time_steps*levels*cells
+        if load_values:
+            bytes_read = elements*itemsize
+            peak_bytes = elements*itemsize_masked
+            ## multiple runs are read into a buffer before copying to the
+            ## output array
+            if len(runs) > 1:
+                peak_bytes += max([stop-start for start,stop in runs])*levels*cells*itemsize_masked
+            ## aggregation keeps a copy of the raw values
+            if ops.aggregate:
+                peak_bytes += elements*itemsize_masked
+        else:
+            bytes_read = 0
+            peak_bytes = 0
+            
+        ## add the calculation outputs
+        if ops.calc is not None and ops.calc_grouping is not None and not ops.file_only and time_steps > 0:
+            names,columns = dates.get_group_columns(temporal.value_date_parts,ops.calc_grouping)
+            ## months outside of custom seasons are not grouped
+            if 'season' in names:
+                columns = columns[columns[:,names.index('season')] > 0]
+            groups = set([tuple(row) for row in columns])
+            if ops.aggregate and not ops.calc_raw:
+                calc_cells = 1
+            else:
+                calc_cells = cells
+            peak_bytes += len(ops.calc)*len(groups)*levels*calc_cells*(np.dtype(float).itemsize+1)
+            
+        ret = OrderedDict([['cells',cells],['time_steps',time_steps],['levels',levels],
+                           ['bytes_read',bytes_read],['peak_bytes',peak_bytes]])
+        return(ret)
+    
+    def _estimate_cells_(self,ods,geom):
+        if geom is None:
+            shape = ods.spatial.grid.shape
+            ret = shape[0]*shape[1]
+        else:
+            ## match the selection geometry to the dataset as is done during the
+            ## subset
+            copy_geom = deepcopy(geom)
+            if type(ods.spatial.projection) != type(copy_geom.spatial.projection):
+                copy_geom.project(ods.spatial.projection)
+            if type(ods.spatial.projection) == WGS84 and ods.spatial.is_360:
+                w = Wrapper(axis=ods.spatial.pm)
+                copy_geom.spatial.geom[0] = w.unwrap(copy_geom.spatial.geom[0])
+            igeom = copy_geom.spatial.geom[0]
+            ## point selections return the nearest cell
+            if isinstance(igeom,Point):
+                ret = 1
+            else:
+                ## only the bounding box is used for the grid subset
+                try:
+                    shape = ods.spatial.grid.subset(polygon=igeom).shape
+                    ret = shape[0]*shape[1]
+                except (EmptyData,ValueError):
+                    ret = 0
+        return(ret)
@@ -35,8 +35,9 @@ class OcgOperations(object):
     :type aggregate: bool
     :param calc: Calculations to be performed on the dataset subset.
     :type calc: list of dictionaries
-    :param calc_grouping: Temporal grouping to apply during calculation.
-    :type calc_grouping: list of str
+    :param calc_grouping: Temporal grouping to apply during calculation. Lists
+     of months define custom seasons.
+    :type calc_grouping: list of str or lists of int
     :param calc_raw: If `True`, perform calculations on the "raw" data regardless of `aggregation` flag.
     :type calc_raw: bool
     :param abstraction: The geometric abstraction to use for the dataset geometries.
@@ -170,6 +171,18 @@ class OcgOperations(object):
                 pass
         return(ret)
     
+    def estimate(self):
+        """Estimate the size of the request using dimension metadata and selection
+        geometry bounding boxes. No data values are read.
+        
+        >>> ops = OcgOperations(RequestDataset('/path/to/some/dataset','foo'))
+        >>> ops.estimate()['peak_bytes']
+        
+        :rtype: :class:`collections.OrderedDict`
+        """
+        interp = OcgInterpreter(self)
+        return(interp.estimate())
+    
     def execute(self):
         """Execute the request using the selected backend.
         
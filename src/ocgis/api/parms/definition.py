@@ -14,6 +14,7 @@ from types import NoneType
 from shapely.geometry.point import Point
 from ocgis import constants
 from ocgis import env
+from ocgis.util import dates
 
 
 class Abstraction(base.StringOptionParameter):
@@ -153,7 +154,7 @@ class CalcGrouping(base.IterableParameter,base.OcgParameter):
     input_types = [list,tuple]
     return_type = tuple
     default = None
-    element_type = str
+    element_type = (str,tuple)
     unique = True
     
     def _get_meta_(self):
@@ -163,10 +164,33 @@ class CalcGrouping(base.IterableParameter,base.OcgParameter):
             msg = 'Temporal aggregation determined by the following group(s): {0}'.format(self.value)
         return(msg)
     
+    ## groupings that cannot be combined
+    _exclusive = [('season','month'),('season','day'),('season','pentad'),('season','water_year'),
+                  ('water_year','year'),('water_year','day'),('pentad','month'),('pentad','day')]
+    
+    def parse(self,value):
+        ## sequences of months are custom seasons
+        if value is not None and not isinstance(value,basestring):
+            value = [str(element) if isinstance(element,basestring) else tuple(element) for element in value]
+        return(super(CalcGrouping,self).parse(value))
+    
     def _validate_(self,value):
+        seasons = [val for val in value if isinstance(val,tuple)]
         for val in value:
-            if val not in ['day','month','year']:
-                raise(DefinitionValidationError(self,'"{0}" is not a valid temporal group or is currently not supported. Supported groupings are combinations of day, month, and year.'.format(val)))
+            if isinstance(val,tuple):
+                if 'season' in value:
+                    raise(DefinitionValidationError(self,'"season" may not be grouped with custom seasons.'))
+                if len(val) == 0 or any([month not in range(1,13) for month in val]):
+                    raise(DefinitionValidationError(self,'Custom seasons must be sequences of month integers 1 through 12: {0}'.format(list(val))))
+            elif val not in ['day','month','year','season','water_year','pentad']:
+                raise(DefinitionValidationError(self,'"{0}" is not a valid temporal group or is currently not supported. Supported groupings are combinations of day, month, year, season, water_year, and pentad, or sequences of months defining custom seasons.'.format(val)))
+        months = [month for val in seasons for month in val]
+        if len(set(months)) < len(months):
+            raise(DefinitionValidationError(self,'A month may only appear in one custom season.'))
+        names = dates.get_group_names(value)
+        for first,second in self._exclusive:
+            if first in names and second in names:
+                raise(DefinitionValidationError(self,'"{0}" and "{1}" may not be grouped together.'.format(first,second)))
             
             
 class CalcRaw(base.BooleanParameter):
@@ -339,7 +363,7 @@ class Headers(base.IterableParameter,base.OcgParameter):
     name = 'headers'
     default = None
     return_type = tuple
-    valid = set(constants.raw_headers+constants.calc_headers+constants.multi_headers)
+    valid = set(constants.raw_headers+constants.calc_headers+constants.multi_headers+constants.calc_group_headers)
     input_types = [list,tuple]
     nullable = True
     element_type = str
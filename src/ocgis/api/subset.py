@@ -1,4 +1,7 @@
 import itertools
+import sys
+import traceback
+import cPickle
 from multiprocessing import Pool
 from ocgis.calc.engine import OcgCalculationEngine
 from ocgis import env
@@ -10,14 +13,17 @@ from ocgis.util.spatial.wrap import Wrapper
 from copy import deepcopy
 from ocgis.util.logging_ocgis import ocgis_lh
 import logging
+from ocgis.interface.nc.pool import pool as nc_pool
+from ocgis.util.prefetch import prefetch
 
 
 class SubsetOperation(object):
     
-    def __init__(self,ops,serial=True,nprocs=1,validate=True):
+    def __init__(self,ops,serial=True,nprocs=1,validate=True,ordered=True):
         self.ops = ops
         self.serial = serial
         self.nprocs = nprocs
+        self.ordered = ordered
         
         subset_log = ocgis_lh.get_logger('subset')
         
@@ -61,30 +67,48 @@ class SubsetOperation(object):
                 else:
                     ods.temporal.set_grouping(self.cengine.grouping)
                     tgdim = ods.temporal.group
-                    times = ods.temporal.value[tgdim.dgroups[0]]
+                    times = ods.temporal.value[tgdim.get_indices(0)]
                     rd.time_range = list(ods.temporal.get_datetime([times.min(),times.max()]))
         
     def __iter__(self):
         ''':rtype: AbstractCollection'''
         
-        ## simple iterator for serial operations
+        ## simple iterator for serial operations. subsets of the next selection
+        ## geometries may be read in the background while the current
+        ## collection is calculated and converted.
         if self.serial:
-            it = itertools.imap(get_collection,self._iter_proc_args_())
-        ## use a multiprocessing pool returning unordered geometries
-        ## for the parallel case
+            colls = itertools.imap(get_subset_collection,self._iter_proc_args_())
+            for coll in prefetch(colls,env.PREFETCH):
+                yield(calculate_collection(self,coll,'subset'))
+        ## use a multiprocessing pool for the parallel case. the subset operation
+        ## is shipped to each worker once through the pool initializer. only the
+        ## selection geometries are passed per task.
         else:
-            raise(NotImplementedError)
-            pool = Pool(processes=self.nprocs)
-            it = pool.imap_unordered(get_collection,
-                                     self._iter_proc_args_())
-        ## the iterator return from the Pool requires calling its 'next'
-        ## method and catching the StopIteration exception
-        while True:
+            subset_log = ocgis_lh.get_logger('subset')
+            ocgis_lh('starting process pool with {0} worker(s)'.format(self.nprocs),subset_log)
+            pool = Pool(processes=self.nprocs,initializer=_init_worker_,initargs=(self,))
             try:
-                yld = it.next()
-                yield(yld)
-            except StopIteration:
-                break
+                args = ((idx,geom) for idx,(_,geom,_) in enumerate(self._iter_proc_args_()))
+                ## ordered iteration returns collections in selection geometry
+                ## order. unordered iteration returns collections as soon as they
+                ## are available.
+                if self.ordered:
+                    it = pool.imap(get_collection_parallel,args)
+                else:
+                    it = pool.imap_unordered(get_collection_parallel,args)
+                for idx,coll,err in it:
+                    if err is not None:
+                        e,tb = err
+                        msg = 'exception raised in subset worker for geometry index {0}:\n{1}'.format(idx,tb)
+                        ocgis_lh(msg,subset_log,level=logging.ERROR)
+                        raise(e)
+                    yield(coll)
+                pool.close()
+            except:
+                pool.terminate()
+                raise
+            finally:
+                pool.join()
         
     def _iter_proc_args_(self):
         ''':rtype: tuple'''
@@ -107,12 +131,67 @@ class SubsetOperation(object):
             ocgis_lh('1 geometry to process'.format(len(self.ops.geom)),subset_log)
             yield(self,self.ops.geom,subset_log)
             
+
+## the subset operation referenced by a worker process in the parallel case
+_worker_so = None
+
+def _init_worker_(so):
+    '''Process pool initializer storing the subset operation in the worker. Any
+    open file handles inherited from the parent process, including pooled
+    handles, are dropped to ensure each worker opens its own.
+    
+    :type so: SubsetOperation
+    '''
+    global _worker_so
+    nc_pool.clear(close=False)
+    for rd in so.ops.dataset:
+        if rd._ds is not None:
+            rd._ds._reset_handle_()
+    _worker_so = so
+
+def get_collection_parallel((idx,geom)):
+    '''
+    Worker function for the parallel case. Exceptions are returned to the parent
+    process with their formatted traceback as opposed to raised in the worker.
+    
+    :type idx: int
+    :type geom: None, GeometryDataset, ShpDataset
+    :returns: A tuple composed of the geometry index, the collection (`None` if
+     an exception occurred), and `None` or a tuple of the exception and its
+     formatted traceback.
+    :rtype: tuple
+    '''
+    try:
+        coll = get_collection((_worker_so,geom,'subset'))
+        ret = (idx,coll,None)
+    except Exception as e:
+        tb = ''.join(traceback.format_exception(*sys.exc_info()))
+        ## not all exceptions survive the trip back to the parent process
+        try:
+            cPickle.dumps(e,cPickle.HIGHEST_PROTOCOL)
+        except Exception:
+            e = RuntimeError('{0}: {1}'.format(e.__class__.__name__,e))
+        ret = (idx,None,(e,tb))
+    return(ret)
+            
 def get_collection((so,geom,logger)):
     '''
     :type so: SubsetOperation
     :type geom: None, GeometryDataset, ShpDataset
     :rtype: AbstractCollection
     '''
+    coll = get_subset_collection((so,geom,logger))
+    return(calculate_collection(so,coll,logger))
+
+def get_subset_collection((so,geom,logger)):
+    '''
+    Subset the request datasets by the selection geometry without performing
+    calculations.
+    
+    :type so: SubsetOperation
+    :type geom: None, GeometryDataset, ShpDataset
+    :rtype: :class:`~ocgis.api.collection.RawCollection`
+    '''
     
     ## initialize the collection object to store the subsetted data.
     coll = RawCollection(ugeom=geom,ops=so.ops)
@@ -131,6 +210,13 @@ def get_collection((so,geom,logger)):
         ## return a slice or do the other operations
         if so.ops.slice is not None:
             ods = ods.__getitem__(so.ops.slice)
+            ## time and level subsets are applied within the slice (i.e. for
+            ## the tiles of a large array calculation)
+            temporal = request_dataset.time_range or request_dataset.time_region
+            if temporal is not None or request_dataset.level_range is not None:
+                ods = ods.get_subset(temporal=temporal,level=request_dataset.level_range)
+                if request_dataset.time_range is not None and request_dataset.time_region is not None:
+                    ods._temporal = ods.temporal.subset(request_dataset.time_region)
         ## other subsetting operations
         else:
             ## if a geometry is passed and the target dataset is 360 longitude,
@@ -207,7 +293,9 @@ def get_collection((so,geom,logger)):
                                  ugid=ugid,level=logging.DEBUG)
                 ## check for all masked values
                 if env.OPTIMIZE_FOR_CALC is False and so.ops.file_only is False:
-                    if ods.value.mask.all():
+                    ## if values are streamed, stop on the first block with
+                    ## unmasked data.
+                    if all(block.mask.all() for _,block in ods.iter_value()):
                         ## masked data may be okay depending on other opeartional
                         ## conditions.
                         if so.ops.snippet or so.ops.allow_empty:
@@ -243,10 +331,19 @@ def get_collection((so,geom,logger)):
                     ocgis_lh(msg,logger,exc=ExtentError(msg),alias=alias,ugid=ugid)
         ods.spatial._ugid = ugid
         coll.variables.update({request_dataset.alias:ods})
+    return(coll)
 
+def calculate_collection(so,coll,logger):
+    '''
+    Perform any calculations on a subsetted collection.
+    
+    :type so: SubsetOperation
+    :type coll: :class:`~ocgis.api.collection.RawCollection`
+    :rtype: AbstractCollection
+    '''
     ## if there are calculations, do those now and return a new type of collection
     if so.cengine is not None:
-        ocgis_lh('performing computations',logger,alias=alias,ugid=ugid)
+        ocgis_lh('performing computations',logger,ugid=coll.ugid)
         coll = so.cengine.execute(coll,file_only=so.ops.file_only)
     
     ## conversion of groups.
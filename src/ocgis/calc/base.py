@@ -81,8 +81,8 @@ class OcgFunction(object):
     
     :param values: An array with dimensions of (time,level,row,column) containing the target values.
     :type values: numpy.ma.MaskedArray
-    :param groups: A sequence of boolean arrays with individual array dimensions matching the `time` dimension of `values`.
-    :type groups: sequence
+    :param groups: The temporal groups or a sequence of boolean arrays with individual array dimensions matching the `time` dimension of `values`.
+    :type groups: :class:`~ocgis.interface.base.AbstractTemporalGroupDimension` or sequence
     :param agg: If True, calculation is performed on raw values from an aggregated data request. This requires the execution of :func:`ocgis.calc.base.OcgFunction.aggregate_spatial` to aggregate the calculations on individual data cells.
     :type agg: bool
     :param weights: Array of weights with dimension (row,column).
@@ -104,6 +104,8 @@ class OcgFunction(object):
     units = ''
     nargs = 0
     name = None
+    ## if True, streamed values are reduced block by block
+    _reducible = False
     
     def __init__(self,values=None,groups=None,agg=False,weights=None,kwds={},
                  dataset=None,calc_name=None,file_only=False):
@@ -131,13 +133,24 @@ class OcgFunction(object):
         if self.file_only:
             ret = self._get_file_only_fill_()
         else:
-            ## holds output from calculation
-            fill = self._get_fill_(self.values)
+            ## values may be streamed as (time slice,block) tuples
+            if isinstance(self.values,np.ndarray):
+                ## holds output from calculation
+                fill = self._get_fill_(self.values)
+                group_values = ((idx,self.values[self._get_time_selection_(group),:,:,:])
+                                for idx,group in enumerate(self._group_indices))
+                group_calcs = self._iter_calculations_(group_values)
+            else:
+                blocks = iter(self.values)
+                first = next(blocks)
+                fill = self._get_fill_(first[1])
+                blocks = itertools.chain([first],blocks)
+                if self._reducible:
+                    group_calcs = self._iter_streamed_groups_(blocks,reduce=True)
+                else:
+                    group_calcs = self._iter_calculations_(self._iter_streamed_groups_(blocks))
             ## iterate over temporal groups and levels
-            for idx,group in enumerate(self.groups):
-                value_slice = self.values[group,:,:,:]
-                self._curr_group = group
-                calc = self._calculate_(value_slice,**self.kwds)
+            for idx,calc in group_calcs:
                 ## we want to leave the mask alone and only fill the data. calculations
                 ## are not concerned with the global mask (though they can be).
                 fill.data[idx] = calc
@@ -183,6 +196,26 @@ class OcgFunction(object):
         '''
         raise(NotImplementedError)
     
+    def _get_partial_(self,values):
+        '''
+        Optional method to overload with :meth:`_combine_partials_` and
+        :meth:`_finish_partial_` for calculations reducible block by block. Set
+        the `_reducible` class attribute to True to reduce streamed values
+        without holding the values of a complete temporal group.
+        
+        :param values: Values of a temporal group in a single time block.
+        :returns: The partial reduction of `values` along the time axis.
+        '''
+        return(self._calculate_(values,**self.kwds))
+    
+    def _combine_partials_(self,first,second):
+        ''':returns: The partial reduction of two consecutive partials.'''
+        raise(NotImplementedError)
+    
+    def _finish_partial_(self,partial):
+        ''':returns: The calculation value of a complete partial reduction.'''
+        return(partial)
+    
     def _aggregate_spatial_(self,values,weights):
         '''
         Optional spatial aggregation method to overload.
@@ -195,15 +228,107 @@ class OcgFunction(object):
     
     def _get_fill_(self,values,dtype=None):
         new_dtype = dtype or self.dtype
-        fill = np.zeros((len(self.groups),values.shape[1],values.shape[2],values.shape[3]),dtype=new_dtype)
+        fill = np.zeros((len(self._group_indices),values.shape[1],values.shape[2],values.shape[3]),dtype=new_dtype)
         mask = np.zeros(fill.shape,dtype=bool)
         mask[:] = values.mask[0,0,:]
         fill = np.ma.array(fill,mask=mask)
         return(fill)
     
+    def _iter_calculations_(self,group_values):
+        for idx,value_slice in group_values:
+            self._curr_group = self._group_indices[idx]
+            yield(idx,self._calculate_(value_slice,**self.kwds))
+    
+    def _iter_streamed_groups_(self,blocks,reduce=False):
+        '''
+        Assemble temporal group values from time blocks. A group is yielded
+        once the block containing its last time index is read. Groups spanning
+        many blocks (e.g. a month grouping over a multi-year record) are held
+        until complete unless they are reduced.
+        
+        :param blocks: Iterator of (slice,numpy.ma.MaskedArray) tuples.
+        :param reduce: If True, reduce the group values of each block with
+         :meth:`_get_partial_` and yield the calculated group values.
+        :type reduce: bool
+        :rtype: tuple (int,numpy.ma.MaskedArray)
+        '''
+        indices = self._group_indices
+        ## time indices of all groups in time order with their group index
+        times = np.concatenate(indices)
+        owners = np.repeat(np.arange(len(indices)),[group.shape[0] for group in indices])
+        order = np.argsort(times,kind='mergesort')
+        times = times[order]
+        owners = owners[order]
+        ## groups in order of completion
+        last = np.array([group[-1] if group.shape[0] > 0 else -1 for group in indices])
+        completion = np.argsort(last,kind='mergesort')
+        position = 0
+        pending = {}
+        for time_slice,block in blocks:
+            lower,upper = np.searchsorted(times,[time_slice.start,time_slice.stop])
+            block_times = times[lower:upper] - time_slice.start
+            block_owners = owners[lower:upper]
+            by_owner = np.argsort(block_owners,kind='mergesort')
+            splits = np.flatnonzero(np.diff(block_owners[by_owner])) + 1
+            for select in np.split(by_owner,splits):
+                if select.shape[0] == 0:
+                    continue
+                idx = block_owners[select[0]]
+                part = block[block_times[select],:,:,:]
+                if reduce:
+                    self._curr_group = indices[idx]
+                    partial = self._get_partial_(part)
+                    if idx in pending:
+                        partial = self._combine_partials_(pending[idx],partial)
+                    pending[idx] = partial
+                else:
+                    pending.setdefault(idx,[]).append(part)
+            while position < completion.shape[0] and last[completion[position]] < time_slice.stop:
+                idx = completion[position]
+                position += 1
+                if idx not in pending:
+                    continue
+                if reduce:
+                    yield(idx,self._finish_partial_(pending.pop(idx)))
+                    continue
+                parts = pending.pop(idx)
+                if len(parts) == 1:
+                    yield(idx,parts[0])
+                else:
+                    ## numpy.ma.concatenate collapses an all False mask
+                    data = np.concatenate([part.data for part in parts],axis=0)
+                    mask = np.concatenate([np.ma.getmaskarray(part) for part in parts],axis=0)
+                    yield(idx,np.ma.array(data,mask=mask))
+    
     def _get_file_only_fill_(self):
         return(np.ma.array(np.empty(0,dtype=self.dtype),mask=True))
     
+    @property
+    def _group_indices(self):
+        '''The sorted time indices of each group.'''
+        try:
+            ret = self.__group_indices
+        except AttributeError:
+            try:
+                ret = [self.groups.get_indices(idx) for idx in range(len(self.groups))]
+            ## groups may be a sequence of boolean time masks
+            except AttributeError:
+                ret = [np.flatnonzero(group) for group in self.groups]
+            self.__group_indices = ret
+        return(ret)
+    
+    @staticmethod
+    def _get_time_selection_(indices):
+        '''
+        :returns: A slice if the time indices are contiguous to avoid copying
+         group values. Otherwise, the indices are returned.
+        '''
+        if indices.shape[0] > 0 and indices[-1] - indices[0] + 1 == indices.shape[0]:
+            ret = slice(indices[0],indices[-1]+1)
+        else:
+            ret = indices
+        return(ret)
+    
     def _is_aggregated_(self,fill):
         '''
         Based on the shape of `fill`, return True if the data is spatially aggregated.
@@ -257,8 +382,8 @@ class OcgCvArgFunction(OcgArgFunction):
                 arch = self.kwds[self.keys[0]]
                 fill = self._get_fill_(arch)
                 ## iterate over temporal groups and levels
-                for idx,group in enumerate(self.groups):
-                    kwds = self._subset_kwds_(group,self.kwds)
+                for idx,group in enumerate(self._group_indices):
+                    kwds = self._subset_kwds_(self._get_time_selection_(group),self.kwds)
                     calc = self._calculate_(**kwds)
                     calc = self.aggregate_temporal(calc)
                     fill[idx] = calc
@@ -8,6 +8,7 @@ from ocgis import constants
 from ocgis.util.logging_ocgis import ocgis_lh
 import logging
 from ocgis.calc.base import KeyedFunctionOutput
+from ocgis import env
 
 
 class OcgCalculationEngine(object):
@@ -33,9 +34,12 @@ class OcgCalculationEngine(object):
         else:
             self.use_agg = False
 
-    def _get_value_weights_(self,ds,file_only=False):
+    def _get_value_weights_(self,ds,file_only=False,stream=False):
         '''
         :type ds: AbstractDataset
+        :param stream: If True, raw values may be returned as an iterator over
+         time blocks. See :meth:`~ocgis.calc.engine.OcgCalculationEngine._get_value_`.
+        :type stream: bool
         '''
         ## empty data only for the file
         if file_only:
@@ -46,13 +50,29 @@ class OcgCalculationEngine(object):
                 value = ds.raw_value
                 weights = ds.spatial.vector.raw_weights
             except AttributeError:
-                value = ds.value
+                if stream:
+                    value = self._get_value_(ds)
+                else:
+                    value = ds.value
                 weights = ds.spatial.vector.weights
         else:
             value = ds.value
             weights = ds.spatial.vector.weights
         return(value,weights)
     
+    def _get_value_(self,ds):
+        '''
+        Return the value array of `ds` or, if a time chunk size is set and the
+        values are not loaded, an iterator over time blocks of the value.
+        
+        :type ds: AbstractDataset
+        '''
+        if env.TIME_CHUNK_SIZE is not None and ds._value is None:
+            ret = ds.iter_value(chunk_size=env.TIME_CHUNK_SIZE)
+        else:
+            ret = ds.value
+        return(ret)
+    
     def _check_calculation_members_(self,funcs,klass):
         '''
         Return True if a subclass of type `klass` is contained in the calculation
@@ -114,7 +134,7 @@ class OcgCalculationEngine(object):
                         if self.grouping is None:
                             dgroups = None
                         else:
-                            dgroups = dref.temporal.group.dgroups
+                            dgroups = dref.temporal.group
                     ## update dict with properly reference data
                     kwds.update({key:value})
                 ## function object instance
@@ -128,24 +148,22 @@ class OcgCalculationEngine(object):
                 for alias,var in coll.variables.iteritems():
                     if alias not in ret.calc:
                         ret.calc[alias] = OrderedDict()
-                    value,weights = self._get_value_weights_(var,file_only=file_only)
-                    ## make the function instance
-                    try:
-                        ref = f['ref'](values=value,agg=self.agg,
-                                       groups=var.temporal.group.dgroups,
-                                       kwds=f['kwds'],weights=weights,
-                                       dataset=var,calc_name=f['name'],
-                                       file_only=file_only)
-                    except AttributeError:
+                    value,weights = self._get_value_weights_(var,file_only=file_only,
+                                                             stream=True)
+                    if var.temporal.group is None:
                         ## if there is no grouping, there is no need to calculate
                         ## sample size.
-                        if self.grouping is None and f['ref'] == SampleSize:
+                        if f['ref'] == SampleSize:
                             break
-                        elif self.grouping is None:
+                        else:
                             e = NotImplementedError('Univariate calculations must have a temporal grouping.')
                             ocgis_lh(exc=e,logger='calc.engine')
-                        else:
-                            raise
+                    ## make the function instance
+                    ref = f['ref'](values=value,agg=self.agg,
+                                   groups=var.temporal.group,
+                                   kwds=f['kwds'],weights=weights,
+                                   dataset=var,calc_name=f['name'],
+                                   file_only=file_only)
                     ## calculate the values
                     calc = ref.calculate()
                     ## store the values
@@ -36,6 +36,7 @@ class SampleSize(OcgFunction):
     dtype = np.int32
     units = 'NA'
     long_name = 'Statistical Sample Size'
+    _reducible = True
     
     def _calculate_(self,values):
         ret = np.empty(values.shape[-2:],dtype=int)
@@ -43,6 +44,10 @@ class SampleSize(OcgFunction):
         ret = np.ma.array(ret,mask=values.mask[0,0,:])
         return(ret)
     
+    def _combine_partials_(self,first,second):
+        ## the mask is taken from the first time step
+        return(np.ma.array(first.data + second.data,mask=first.mask))
+    
     def _aggregate_spatial_(self,values,weights):
         return(np.ma.sum(values))
 
@@ -60,28 +65,47 @@ class Mean(OcgFunction):
     description = 'Mean value for the series.'
     Group = groups.BasicStatistics
     dtype = np.float32
+    _reducible = True
     
     def _calculate_(self,values):
         return(np.ma.mean(values,axis=0))
     
+    def _get_partial_(self,values):
+        return(np.ma.sum(values,axis=0).filled(0),np.ma.count(values,axis=0))
+    
+    def _combine_partials_(self,first,second):
+        return(first[0] + second[0],first[1] + second[1])
+    
+    def _finish_partial_(self,partial):
+        total,count = partial
+        return(np.ma.array(total*1./np.maximum(count,1),mask=count == 0))
+    
     
 class Max(OcgFunction):
     description = 'Max value for the series.'
     Group = groups.BasicStatistics
     dtype = np.float32
+    _reducible = True
     
     def _calculate_(self,values):
         return(np.ma.max(values,axis=0))
     
+    def _combine_partials_(self,first,second):
+        return(np.ma.max(np.ma.stack((first,second)),axis=0))
+    
     
 class Min(OcgFunction):
     description = 'Min value for the series.'
     Group = groups.BasicStatistics
     dtype = np.float32
+    _reducible = True
     
     def _calculate_(self,values):
         return(np.ma.min(values,axis=0))
     
+    def _combine_partials_(self,first,second):
+        return(np.ma.min(np.ma.stack((first,second)),axis=0))
+    
     
 class StandardDeviation(OcgFunction):
     description = 'Standard deviation for the series.'
@@ -1,13 +1,23 @@
 import numpy as np
 import itertools
+from ocgis.interface.nc.chunking import align
 
 
-def get_tile_schema(nrow,ncol,tdim,origin=0):
+def get_tile_schema(nrow,ncol,tdim,origin=0,chunks=None):
+    '''
+    :param chunks: The `(row,column)` chunk lengths of the variable. If
+     provided, tile edges are aligned to chunk boundaries.
+    :type chunks: tuple
+    '''
     ret = {}
-    row_idx = np.arange(origin,nrow+tdim,step=tdim,dtype=int)
+    if chunks is None:
+        row_dim,col_dim = tdim,tdim
+    else:
+        row_dim,col_dim = align(tdim,chunks[0]),align(tdim,chunks[1])
+    row_idx = np.arange(origin,nrow+row_dim,step=row_dim,dtype=int)
     if row_idx[-1] > nrow:
         row_idx[-1] = nrow
-    col_idx = np.arange(origin,ncol+tdim,step=tdim,dtype=int)
+    col_idx = np.arange(origin,ncol+col_dim,step=col_dim,dtype=int)
     if col_idx[-1] > ncol:
         col_idx[-1] = ncol
     row_slices = get_slices(row_idx)
@@ -10,6 +10,8 @@ fill_value = 1e20
 raw_headers = ['did','vid','ugid','tid','lid','gid','variable','alias','time','level','value']
 calc_headers = ['did','vid','cid','ugid','tgid','lid','gid','variable','alias','calc_name','year','month','day','level','value']
 multi_headers = ['ugid','tid','lid','gid','calc_name','time','level','value']
+## headers for temporal groupings not in the date parts
+calc_group_headers = ['season','water_year','pentad']
 
 #test_data_download_url_prefix = 'https://dl.dropboxusercontent.com/u/867854/test_data_download/'
 test_data_download_url_prefix = 'http://www.earthsystemmodeling.org/download/data/ocgis/nc/'
@@ -21,6 +23,31 @@ calc_year_centroid_day = 1
 
 ## the number of values to use when calculation resolutions
 resolution_limit = 100
+## the number of time steps of output attributes built at once
+temporal_output_block_size = 1024
+
+## the maximum size in bytes of a netCDF variable's chunk cache
+chunk_cache_limit = 256*1024**2
+
+## the number of time axes held by the temporal cache
+temporal_cache_size = 32
+## the number of grid cell area arrays held by the area cache
+area_cache_size = 16
+## the number of nearest-neighbour trees held by the neighbour cache
+neighbor_cache_size = 8
+## the number of transformed coordinate grids held by the projection cache
+projection_cache_size = 8
+## the number of multi-file time indices held in memory
+mfindex_cache_size = 16
+
+## the target number of vertices in each tile of an indexed selection geometry
+spatial_index_vertices = 256
+## the number of children of each spatial index node
+spatial_index_node_capacity = 16
+## the maximum number of point and edge pairs tested at once by point-in-polygon
+spatial_index_block_size = 2**20
+## the maximum number of points in each leaf of a nearest-neighbour tree
+spatial_index_leaf_size = 32
 
 ## the data type to use for numpy integers
 np_int = np.int32
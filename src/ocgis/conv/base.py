@@ -28,6 +28,7 @@ class OcgConverter(object):
     _add_ugeom = False ## added user geometry in the output folder
     _add_ugeom_nest = True ## nest the user geometry in a shp folder
     _add_source_meta = True ## add a source metadata file
+    _allow_unordered = False ## collections may be written in any order
     
     @abc.abstractmethod
     def _write_(self): pass # string path or data
@@ -25,7 +25,7 @@ class CsvConverter(OcgConverter):
                     headers = coll.get_headers(upper=True)
                     writer.writerow(headers)
                     build = False
-                for geom,row in coll.get_iter():
+                for geom,row in coll.get_iter(time_strings=True):
                     writer.writerow(row)
 
 
@@ -53,7 +53,7 @@ class CsvPlusConverter(CsvConverter):
                     build = False
                     ocgis_lh(msg='build finished'.format(self.path),level=logging.DEBUG,
                      logger='conv.csv+')
-                for geom,row,geom_ids in coll.get_iter(with_geometry_ids=True):
+                for geom,row,geom_ids in coll.get_iter(with_geometry_ids=True,time_strings=True):
                     if not is_aggregated:
                         ugid = geom_ids['ugid']
                         did = geom_ids['did']
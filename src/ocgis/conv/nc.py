@@ -3,16 +3,23 @@ import netCDF4 as nc
 from ocgis.interface.projection import WGS84
 from ocgis import constants
 from ocgis.api.collection import CalcCollection, MultivariateCalcCollection
+import itertools
+from ocgis.interface.nc.pool import nc_locked
 
     
 class NcConverter(OcgConverter):
     _ext = 'nc'
     
     def _write_(self,file_only=False):
-        ## get the collection
+        ## get the collection. the lock is not held here as the collections may
+        ## be read by a prefetch thread.
         for ii,coll in enumerate(self):
             if ii > 0:
                 raise(ValueError('only one collection should be returned for NC conversion'))
+        self._write_collection_(coll,file_only=file_only)
+    
+    @nc_locked
+    def _write_collection_(self,coll,file_only=False):
         arch = coll._archetype
         ## dataset object to write to
         ds = nc.Dataset(self.path,'w',format=arch.request_dataset.ds._ds.file_format)
@@ -184,11 +191,15 @@ class NcConverter(OcgConverter):
             for var_name,var_value in coll.variables.iteritems():
                 ## reference level interface
     #            level = var_value.ocg_dataset.i.level
+                ## values are written by time block. the values are streamed
+                ## if a time chunk size is set.
+                blocks = var_value.iter_value()
+                first = next(blocks)
                 ## create the value variable.
-                value = ds.createVariable(var_name,var_value.value.dtype,
+                value = ds.createVariable(var_name,first[1].dtype,
                                value_dims,fill_value=constants.fill_value)
-                if not file_only:
-                    value[:] = var_value.value
+                for time_slice,block in itertools.chain([first],blocks):
+                    value[time_slice] = block
     #            value.fill_value = var_value.raw_value.fill_value
                 for key,val in meta['variables'][var_name]['attrs'].iteritems():
                     setattr(value,key,val)
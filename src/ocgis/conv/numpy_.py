@@ -3,6 +3,7 @@ from ocgis.conv.base import OcgConverter
     
 class NumpyConverter(OcgConverter):
     _create_directory = False
+    _allow_unordered = True
         
     def __iter__(self):
         for coll in self.colls:
@@ -66,6 +66,16 @@ class SubsetException(OcgException):
     pass
 
 
+class RequestSizeError(OcgException):
+    """Raised when the estimated size of a request exceeds :attr:`env.MEMORY_LIMIT`."""
+    
+    def __init__(self,estimated,limit):
+        self.estimated = estimated
+        self.limit = limit
+        self.message = ('The estimated peak memory of the request ({0} bytes) exceeds '
+                        'env.MEMORY_LIMIT ({1} bytes).'.format(estimated,limit))
+
+
 class OcgisEnvironmentError(OcgException):
     
     def __init__(self,env_parm,msg):
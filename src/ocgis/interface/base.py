@@ -1,10 +1,12 @@
-from ocgis import env, constants
+from ocgis import constants
 from abc import ABCMeta, abstractmethod, abstractproperty
 import numpy as np
 import itertools
 from collections import deque
 from ocgis.exc import EmptyData
 import datetime
+from ocgis.util import dates
+from ocgis.util.cache import temporal_cache, get_array_digest
 
 
 class AbstractDataset(object):
@@ -73,6 +75,13 @@ class AbstractDataset(object):
         msg = "Aggregation is not implemented for {0}".format(self.__class__.__name__)
         raise(NotImplementedError(msg))
     
+    def iter_value(self,chunk_size=None):
+        '''
+        Yield (slice,value) blocks along the time dimension. The default
+        implementation yields the complete value array.
+        '''
+        yield(slice(0,self.value.shape[0]),self.value)
+    
     @abstractmethod
     def get_subset(self,temporal=None,level=None,spatial=None):
         pass
@@ -136,6 +145,7 @@ class AbstractInterfaceDimension(object):
         if val is not None:
             val = np.atleast_1d(val)
         self._value = val
+        self._monotonic = None
         
     @property
     def bounds(self):
@@ -145,6 +155,7 @@ class AbstractInterfaceDimension(object):
         if val is not None:
             val = np.atleast_2d(val)
         self._bounds = val
+        self._monotonic = None
     
     @classmethod
     def _load_(cls,gi,subset_by=None):
@@ -161,6 +172,7 @@ class AbstractInterfaceDimension(object):
             
 class AbstractVectorDimension(object):
     __metaclass__ = ABCMeta
+    _monotonic = None
     
     def __getitem__(self,slc):
         value = np.atleast_1d(self.value[slc])
@@ -173,6 +185,9 @@ class AbstractVectorDimension(object):
         ret = self.__class__(value=value,bounds=bounds,
                              uid=uid,real_idx=real_idx,name=self.name,
                              name_bounds=self.name_bounds,dataset=self.dataset)
+        ## forward slices keep the ordering of the parent
+        if isinstance(slc,slice) and (slc.step is None or slc.step > 0):
+            ret._monotonic = self._monotonic
         return(ret)
     
     @property
@@ -183,6 +198,25 @@ class AbstractVectorDimension(object):
             ret = (self.bounds.min(),self.bounds.max())
         return(ret)
     
+    @property
+    def monotonic(self):
+        '''
+        :returns: 1 if the values and both bounds columns are increasing, -1 if
+         they are decreasing, and 0 otherwise. Equal neighbors are allowed. The
+         ordering is computed once and cached.
+        :rtype: int
+        '''
+        if self._monotonic is None:
+            arrays = [self.value]
+            if self.bounds is not None:
+                arrays += [self.bounds[:,0],self.bounds[:,1]]
+            self._monotonic = 0
+            for direction in (1,-1):
+                if all([self._is_ordered_(arr,direction) for arr in arrays]):
+                    self._monotonic = direction
+                    break
+        return(self._monotonic)
+    
     @property
     def resolution(self):
         ret = np.abs(np.ediff1d(self.value).mean())
@@ -224,36 +258,88 @@ class AbstractVectorDimension(object):
             yield(idx,ret)
     
     def subset(self,lower,upper):
+        return(self._get_subset_(self._get_subset_index_(lower,upper)))
+    
+    def _get_subset_(self,idx):
         if self.bounds is None:
-            lidx = self.value >= lower
-            uidx = self.value <= upper
-            idx = np.logical_and(lidx,uidx)
             bounds = None
         else:
+            bounds = np.atleast_2d(self.bounds[idx,:])
+        ret = self.__class__(value=self.value[idx],bounds=bounds,
+                             uid=self.uid[idx],real_idx=self.real_idx[idx],
+                             name=self.name,name_bounds=self.name_bounds,
+                             dataset=self.dataset)
+        if isinstance(idx,slice):
+            ret._monotonic = self._monotonic
+        return(ret)
+    
+    def _get_subset_index_(self,lower,upper):
+        '''
+        :returns: The elements overlapping the range `lower` to `upper`. A slice
+         found by binary search is returned for monotonic dimensions. Otherwise,
+         a boolean array is returned.
+        :rtype: slice or numpy.ndarray
+        :raises: EmptyData
+        '''
+        direction = self.monotonic
+        value = np.ma.getdata(self.value)
+        if self.bounds is None:
+            if direction == 0:
+                idx = np.logical_and(value >= lower,value <= upper)
+            else:
+                idx = self._search_(direction,value,lower,'left',value,upper,'right')
+        else:
+            bounds = np.ma.getdata(self.bounds)
             ## identify ordering
-            if self.bounds[0,0] > self.bounds[0,1]:
+            if bounds[0,0] > bounds[0,1]:
                 lower_col = 1
                 upper_col = 0
             else:
                 lower_col = 0
                 upper_col = 1
-            lidx = self.bounds[:,upper_col] > lower
-            uidx = self.bounds[:,lower_col] < upper
-            idx = np.logical_and(lidx,uidx)
-            if not idx.any():
+            if direction == 0:
+                idx = np.logical_and(bounds[:,upper_col] > lower,bounds[:,lower_col] < upper)
+            else:
+                idx = self._search_(direction,bounds[:,upper_col],lower,'right',
+                                    bounds[:,lower_col],upper,'left')
+            if self._is_empty_index_(idx):
                 ## bounds may align with centroids, check if the centroids
                 ## return a match
-                lidx = self.value >= lower
-                uidx = self.value <= upper
-                idx = np.logical_and(lidx,uidx)
-                if not idx.any():
+                if direction == 0:
+                    idx = np.logical_and(value >= lower,value <= upper)
+                else:
+                    idx = self._search_(direction,value,lower,'left',value,upper,'right')
+                if self._is_empty_index_(idx):
                     raise(EmptyData('temporal subset returned empty'))
-            bounds = np.atleast_2d(self.bounds[idx,:])
-        ret = self.__class__(value=self.value[idx],bounds=bounds,
-                             uid=self.uid[idx],real_idx=self.real_idx[idx],
-                             name=self.name,name_bounds=self.name_bounds,
-                             dataset=self.dataset)
+        return(idx)
+    
+    @staticmethod
+    def _is_empty_index_(idx):
+        if isinstance(idx,slice):
+            ret = idx.stop <= idx.start
+        else:
+            ret = not idx.any()
         return(ret)
+    
+    @staticmethod
+    def _is_ordered_(arr,direction):
+        if np.ma.is_masked(arr) or np.ma.getdata(arr).dtype.kind not in 'iuf':
+            return(False)
+        return(bool(np.all(np.diff(np.ma.getdata(arr))*direction >= 0)))
+    
+    @staticmethod
+    def _search_(direction,first,lower,first_side,last,upper,last_side):
+        ## the selection starts at the first element of `first` above `lower`
+        ## and stops after the last element of `last` below `upper`. decreasing
+        ## arrays are searched in reverse.
+        n = first.shape[0]
+        if direction < 0:
+            first,last = first[::-1],last[::-1]
+        start = int(np.searchsorted(first,lower,side=first_side))
+        stop = max(start,int(np.searchsorted(last,upper,side=last_side)))
+        if direction < 0:
+            start,stop = n - stop,n - start
+        return(slice(start,stop))
 
 
 class AbstractLevelDimension(AbstractVectorDimension,AbstractInterfaceDimension):
@@ -267,6 +353,7 @@ class AbstractTemporalDimension(AbstractVectorDimension,AbstractInterfaceDimensi
     def __init__(self,*args,**kwds):
         super(AbstractTemporalDimension,self).__init__(*args,**kwds)
         self.group = None
+        self._output = None
         
         ## try to get format time from operations if it is present
         if self.dataset._ops is not None:
@@ -277,6 +364,27 @@ class AbstractTemporalDimension(AbstractVectorDimension,AbstractInterfaceDimensi
     @abstractproperty
     def _dtemporal_group_dimension(self): AbstractTemporalGroupDimension
     
+    @property
+    def value_date_parts(self):
+        ''':rtype: numpy.ndarray of integer date parts as returned by :func:`ocgis.util.dates.decode`'''
+        return(dates.get_parts(self.value_datetime))
+    
+    @property
+    def bounds_date_parts(self):
+        ''':rtype: numpy.ndarray of integer date parts as returned by :func:`ocgis.util.dates.decode`'''
+        if self.bounds is None:
+            ret = None
+        else:
+            ret = dates.get_parts(self.bounds_datetime)
+        return(ret)
+    
+    @property
+    def output(self):
+        ''':rtype: :class:`~ocgis.interface.base.TemporalOutput`'''
+        if self._output is None:
+            self._output = TemporalOutput(self)
+        return(self._output)
+    
     def _get_iter_value_bounds_ref(self):
         if self.format_time:
             ret = self.value_datetime,self.bounds_datetime
@@ -284,16 +392,41 @@ class AbstractTemporalDimension(AbstractVectorDimension,AbstractInterfaceDimensi
             ret = self.value,self.bounds
         return(ret)
     
+    def get_iter(self,add_bounds=True,time_strings=False):
+        '''
+        :param time_strings: If True, times are formatted as strings.
+        :type time_strings: bool
+        '''
+        ## rows are built by block to avoid holding a row for each time step
+        step = constants.temporal_output_block_size
+        for start in range(0,self.value.shape[0],step):
+            rows = self.output.get_rows(slice(start,start+step),add_bounds=add_bounds,
+                                        time_strings=time_strings)
+            for idx,row in enumerate(rows,start=start):
+                yield(idx,row)
+    
+    def _get_cache_entry_(self):
+        '''
+        :returns: The dictionary shared by all time dimensions with the same
+         cache key in :data:`ocgis.util.cache.temporal_cache`.
+        :rtype: dict
+        '''
+        return(temporal_cache.setdefault(self._get_cache_key_(),{}))
+    
+    def _get_cache_key_(self):
+        return(get_array_digest(self.value),get_array_digest(self.bounds))
+    
     def set_grouping(self,grouping):
         
-        ## if we are optimizing, attempt to pull the group
-        if env.OPTIMIZE_FOR_CALC:
-            self.group = env._optimize_store[self.dataset.request_dataset.alias]['group']
+        ## groupings are shared by time dimensions with identical values
+        entry = self._get_cache_entry_()
+        cache_key = ('group',tuple(grouping))
+        try:
+            self.group = entry[cache_key]
             return()
+        except KeyError:
+            pass
         
-        group_map = dict(zip(range(0,7),self._date_parts,))
-        group_map_rev = dict(zip(self._date_parts,range(0,7),))
-
         value = np.empty((self.value.shape[0],3),dtype=object)
         
         if self.bounds is None:
@@ -303,116 +436,253 @@ class AbstractTemporalDimension(AbstractVectorDimension,AbstractInterfaceDimensi
             value[:,1] = self.value_datetime
             value[:,2] = self.bounds_datetime[:,1]
         
-        def _get_attrs_(dt):
-            return([dt.year,dt.month,dt.day,dt.hour,dt.minute,dt.second,dt.microsecond])
+        names,columns = dates.get_group_columns(self.value_date_parts,grouping)
+        
+        ## time steps in months outside of custom seasons are not grouped
+        if 'season' in names:
+            included = np.flatnonzero(columns[:,names.index('season')] > 0)
+            if included.shape[0] == 0:
+                raise(EmptyData(message='No time steps fall in the seasons of the temporal grouping.'))
+        else:
+            included = np.arange(columns.shape[0])
+        
+        ## pack the grouped parts into a single integer key per time step. parts
+        ## are packed in group order so sorted keys order the groups by year,
+        ## month, day, etc.
+        key = np.zeros(included.shape[0],dtype=np.int64)
+        for idx in range(len(names)):
+            column = columns[included,idx]
+            lower = column.min()
+            key = key*(column.max()-lower+1) + (column-lower)
+        labels = np.empty(columns.shape[0],dtype=int)
+        labels.fill(-1)
+        labels[included] = np.unique(key,return_inverse=True)[1]
         
-        parts = np.empty((len(self.value),len(self._date_parts)),dtype=int)
-        for row in range(parts.shape[0]):
-            parts[row,:] = _get_attrs_(value[row,1])
+        ## time indices sorted by group and the offset of each group into them
+        order = included[np.argsort(labels[included],kind='mergesort')]
+        offsets = np.concatenate(([0],np.cumsum(np.bincount(labels[included]))))
+        starts = offsets[:-1]
+        first = order[starts]
         
-        unique = deque()
-        for idx in range(parts.shape[1]):
-            if group_map[idx] in grouping:
-                fill = np.unique(parts[:,idx])
+        dtype = [(dp,object) for dp in self._date_parts+dates.custom_parts]
+        new_value = np.empty((starts.shape[0],),dtype=dtype)
+        for part in new_value.dtype.names:
+            if part in names:
+                new_value[part] = columns[first,names.index(part)]
             else:
-#                fill = np.array([0])
-                fill = [None]
-            unique.append(fill)
-
-        select = deque()
-        idx2_seq = range(len(self._date_parts))
-        for idx in itertools.product(*[range(len(u)) for u in unique]):
-            select.append([unique[idx2][idx[idx2]] for idx2 in idx2_seq])
-        select = np.array(select)
-        dgroups = deque()
-        idx_cmp = [group_map_rev[group] for group in grouping]
-        keep_select = []
-        for idx in range(select.shape[0]):
-            match = select[idx,idx_cmp] == parts[:,idx_cmp]
-            dgrp = match.all(axis=1)
-            if dgrp.any():
-                keep_select.append(idx)
-                dgroups.append(dgrp)
-        select = select[keep_select,:]
-        assert(len(dgroups) == select.shape[0])
+                new_value[part] = None
+        
+        new_bounds = np.empty((starts.shape[0],2),dtype=object)
+        sorted_value = value[order]
+        new_bounds[:,0] = np.minimum.reduceat(sorted_value[:,(0,2)].min(axis=1),starts)
+        new_bounds[:,1] = np.maximum.reduceat(sorted_value[:,(0,2)].max(axis=1),starts)
         
-        dtype = [(dp,object) for dp in self._date_parts]
-        new_value = np.empty((len(dgroups),),dtype=dtype)
-        new_bounds = np.empty((len(dgroups),2),dtype=object)
+        self.group = self._dtemporal_group_dimension(grouping,new_value,new_bounds,labels,
+                                                     order=order,offsets=offsets)
+        entry[cache_key] = self.group
 
-        for idx,dgrp in enumerate(dgroups):
-            ## tuple conversion is required for structure arrays: http://docs.scipy.org/doc/numpy/user/basics.rec.html#filling-structured-arrays
-            new_value[idx] = tuple(select[idx])
-            sel = value[dgrp][:,(0,2)]
-            new_bounds[idx,:] = [sel.min(),sel.max()]
+
+class TemporalOutput(object):
+    '''
+    Output attributes of a time dimension served by time index. Date parts and
+    time strings are compact arrays computed once from the integer date parts
+    of the dimension. Rows are only built for the requested time steps and
+    datetime objects are not created for the complete dimension.
+    
+    >>> rows = TemporalOutput(temporal).get_rows(slice(0,10))
+    >>> rows[0]['year']
+    2000
+    
+    :param temporal: The time dimension to write.
+    :type temporal: :class:`~ocgis.interface.base.AbstractTemporalDimension`
+    '''
+    
+    def __init__(self,temporal):
+        self.temporal = temporal
+        self._strings = {}
+    
+    def get_rows(self,time_slice=slice(None),add_bounds=True,time_strings=False):
+        '''
+        :param time_slice: Slice along the time dimension.
+        :type time_slice: slice
+        :param add_bounds: If True, add the time bounds if present.
+        :type add_bounds: bool
+        :param time_strings: If True, times are formatted as strings.
+        :type time_strings: bool
+        :returns: A dictionary of output attributes for each time step in
+         `time_slice`.
+        :rtype: list of dict
+        '''
+        temporal = self.temporal
+        add_bounds = add_bounds and temporal.bounds is not None
         
-        new_bounds = np.atleast_2d(new_bounds)
-        new_value = np.atleast_1d(new_value)
-        self.group = self._dtemporal_group_dimension(grouping,new_value,new_bounds,dgroups)
+        name_value = temporal._name_long
+        names = [temporal._name_id,name_value]
+        columns = [list(temporal.uid[time_slice])]
+        if add_bounds:
+            names += ['bnd_left_'+name_value,'bnd_right_'+name_value]
+        if temporal.format_time:
+            parts = temporal.value_date_parts[time_slice]
+            values = [self._get_times_('value',parts,time_slice,time_strings)]
+            if add_bounds:
+                bounds = self._get_times_('bounds',temporal.bounds_date_parts[time_slice],
+                                          time_slice,time_strings)
+                values += [bounds[:,0],bounds[:,1]]
+            columns += [value.tolist() for value in values]
+            ## break out the date parts as python integers
+            columns += [parts[:,0].tolist(),parts[:,1].tolist(),parts[:,2].tolist()]
+        else:
+            columns.append(list(temporal.value[time_slice]))
+            if add_bounds:
+                bounds = temporal.bounds[time_slice]
+                columns += [list(bounds[:,0]),list(bounds[:,1])]
+            columns += [[None]*len(columns[0])]*3
+        names += ['year','month','day']
+        return([dict(zip(names,row)) for row in zip(*columns)])
+    
+    def _get_times_(self,key,parts,time_slice,time_strings):
+        if time_strings:
+            ## strings are formatted once for the complete dimension
+            try:
+                strings = self._strings[key]
+            except KeyError:
+                if key == 'value':
+                    strings = dates.get_strings(self.temporal.value_date_parts)
+                else:
+                    strings = dates.get_strings(self.temporal.bounds_date_parts)
+                self._strings[key] = strings
+            ret = strings[time_slice]
+        else:
+            ret = dates.get_datetime(parts)
+        return(ret)
 
     
 class AbstractTemporalGroupDimension(AbstractVectorDimension,AbstractInterfaceDimension):
     __metaclass__ = ABCMeta
     
-    def __init__(self,grouping,value,bounds,dgroups,uid=None):
+    '''
+    :param labels: The group index of each time step or -1 for time steps not
+     in a group.
+    :type labels: numpy.ndarray
+    :param order: Time indices sorted by group. Computed from `labels` if not
+     provided.
+    :type order: numpy.ndarray
+    :param offsets: The start of each group in `order` with the total number of
+     time steps appended.
+    :type offsets: numpy.ndarray
+    '''
+    
+    def __init__(self,grouping,value,bounds,labels,uid=None,order=None,offsets=None):
         self.grouping = grouping
         self.value = np.atleast_1d(value)
         assert(isinstance(self.value,np.ndarray))
         self.bounds = np.atleast_2d(bounds)
         assert(isinstance(self.bounds[0,0],datetime.datetime))
-        self.dgroups = dgroups
+        self.labels = labels
+        if order is None:
+            order = np.flatnonzero(labels >= 0)
+            order = order[np.argsort(labels[order],kind='mergesort')]
+        if offsets is None:
+            offsets = np.concatenate(([0],np.cumsum(np.bincount(labels[labels >= 0],minlength=self.value.shape[0]))))
+        self.order = order
+        self.offsets = offsets
         if uid is None:
             uid = np.arange(1,self.value.shape[0]+1,dtype=int)
         self.uid = uid
         self._representative_datetime = None
     
+    def __len__(self):
+        return(self.value.shape[0])
+    
+    @property
+    def dgroups(self):
+        '''Boolean time masks for each group. Prefer :meth:`get_indices`.'''
+        ret = deque()
+        for idx in range(len(self)):
+            dgrp = np.zeros(self.labels.shape[0],dtype=bool)
+            dgrp[self.get_indices(idx)] = True
+            ret.append(dgrp)
+        return(ret)
+    
+    def get_indices(self,idx):
+        '''
+        :param idx: The group index.
+        :type idx: int
+        :returns: The sorted time indices of the group.
+        :rtype: numpy.ndarray
+        '''
+        return(self.order[self.offsets[idx]:self.offsets[idx+1]])
+    
     @property
     def representative_datetime(self):
+        '''
+        A single time for each group. Grouped parts are taken from the group
+        value. Parts not grouped are taken from the centroid constants or the
+        start of the group's bounds. Seasons are represented by their middle
+        month (the later one for custom seasons with an even number of months),
+        water years by April 1, and pentads by their third day.
+        
+        :rtype: numpy.ndarray of :class:`datetime.datetime` objects
+        '''
         if self._representative_datetime is None:
-            ref_value = self.value
-            ref_bounds = self.bounds
-            ret = np.empty((ref_value.shape[0],),dtype=object)
-            set_grouping = set(self.grouping)
-            if set_grouping == set(['month']):
-                ref_calc_month_centroid = constants.calc_month_centroid
-                for idx in range(ret.shape[0]):
-                    month = ref_value[idx]['month']
-                    ## get the start year from the bounds data
-                    start_year = ref_bounds[idx][0].year
-                    ## create the datetime object
-                    ret[idx] = datetime.datetime(start_year,month,ref_calc_month_centroid)
-            elif set_grouping == set(['year']):
-                ref_calc_year_centroid_month = constants.calc_year_centroid_month
-                ref_calc_year_centroid_day = constants.calc_year_centroid_day
-                for idx in range(ret.shape[0]):
-                    year = ref_value[idx]['year']
-                    ## create the datetime object
-                    ret[idx] = datetime.datetime(year,ref_calc_year_centroid_month,ref_calc_year_centroid_day)
-            elif set_grouping == set(['month','year']):
-                ref_calc_month_centroid = constants.calc_month_centroid
-                for idx in range(ret.shape[0]):
-                    year,month = ref_value[idx]['year'],ref_value[idx]['month']
-                    ret[idx] = datetime.datetime(year,month,ref_calc_month_centroid)
-            elif set_grouping == set(['day']):
-                for idx in range(ret.shape[0]):
-                    start_year,start_month = ref_bounds[idx][0].year,ref_bounds[idx][0].month
-                    ret[idx] = datetime.datetime(start_year,start_month,ref_value[idx]['day'],12)
-            elif set_grouping == set(['day','month']):
-                for idx in range(ret.shape[0]):
-                    start_year = ref_bounds[idx][0].year
-                    day,month = ref_value[idx]['day'],ref_value[idx]['month']
-                    ret[idx] = datetime.datetime(start_year,month,day,12)
-            elif set_grouping == set(['day','year']):
-                for idx in range(ret.shape[0]):
-                    day,year = ref_value[idx]['day'],ref_value[idx]['year']
-                    ret[idx] = datetime.datetime(year,1,day,12)
-            elif set_grouping == set(['day','year','month']):
-                for idx in range(ret.shape[0]):
-                    day,year,month = ref_value[idx]['day'],ref_value[idx]['year'],ref_value[idx]['month']
-                    ret[idx] = datetime.datetime(year,month,day,12)
+            grouping = dates.get_group_names(self.grouping)
+            get_value = lambda part: self.value[part].astype(int)
+            start = dates.get_parts(self.bounds[:,0])
+            parts = np.zeros((self.value.shape[0],len(dates.date_parts)),dtype=int)
+            month = None
+            day = None
+            
+            if 'pentad' in grouping:
+                month,day = dates.get_pentad_center(get_value('pentad'))
+                parts[:,3] = 12
+            if 'season' in grouping:
+                seasons = dates.get_seasons(self.grouping)
+                _,season_offset = dates.get_season_tables(seasons)
+                middle = np.array([0]+[months[len(months)//2] for months in seasons])
+                month = middle[get_value('season')]
+                day = constants.calc_month_centroid
+            if 'month' in grouping:
+                month = get_value('month')
+            if 'day' in grouping:
+                day = get_value('day')
+                parts[:,3] = 12
+            
+            if 'year' in grouping:
+                year = get_value('year')
+            elif 'water_year' in grouping:
+                if month is None:
+                    year = get_value('water_year')
+                    month = 4
+                    day = 1
+                else:
+                    year = get_value('water_year') - (month >= 10)
+            elif 'season' in grouping:
+                year = start[:,0] + season_offset[start[:,1]]
             else:
-                raise(NotImplementedError('grouping: {0}'.format(self.grouping)))
-            return(ret)
+                ## get the start year from the bounds data
+                year = start[:,0]
+            ## seasons crossing the year are labeled by the year they end
+            if 'season' in grouping:
+                year = year - season_offset[month]
+            
+            if month is None:
+                if 'day' not in grouping:
+                    month = constants.calc_year_centroid_month
+                elif 'year' in grouping:
+                    month = 1
+                else:
+                    month = start[:,1]
+            if day is None:
+                if 'month' in grouping:
+                    day = constants.calc_month_centroid
+                else:
+                    day = constants.calc_year_centroid_day
+            
+            parts[:,0] = year
+            parts[:,1] = month
+            parts[:,2] = day
+            self._representative_datetime = dates.get_datetime(parts)
+        return(self._representative_datetime)
         
     def get_iter(self,add_bounds=True):
         value = self.value
@@ -423,12 +693,16 @@ class AbstractTemporalGroupDimension(AbstractVectorDimension,AbstractInterfaceDi
             has_bounds = False
         name_id = self._name_id
         
+        custom_parts = dates.custom_parts
+        
         ret = {}
         for idx in range(value.shape[0]):
             ret[name_id] = uid[idx]
             ret['year'] = value[idx]['year']
             ret['month'] = value[idx]['month']
             ret['day'] = value[idx]['day']
+            for part in custom_parts:
+                ret[part] = value[idx][part]
             yield(idx,ret)
     
     
@@ -471,6 +745,7 @@ class AbstractSpatialVector(AbstractSpatialDimension,AbstractInterfaceDimension)
     __metaclass__ = ABCMeta
     _name_id = None
     _name_long = None
+    _mask = None
     
     def __getitem__(self,slc):
         raise(NotImplementedError)
@@ -478,9 +753,26 @@ class AbstractSpatialVector(AbstractSpatialDimension,AbstractInterfaceDimension)
     @property
     def geom(self):
         if self._geom is None:
-            self._geom = self._get_all_geoms_()
+            geom = self._get_all_geoms_()
+            ## apply any mask set by a spatial operation
+            if self._mask is not None:
+                geom.mask = np.logical_or(geom.mask,self._mask)
+            self._geom = geom
         return(self._geom)
     
+    @property
+    def mask(self):
+        '''
+        :returns: The mask of the geometries or None if no spatial operation has
+         been performed and the geometries have not been loaded.
+        :rtype: numpy.ndarray
+        '''
+        if self._geom is None:
+            ret = self._mask
+        else:
+            ret = self._geom.mask
+        return(ret)
+    
     @property
     def resolution(self):
         raise(NotImplementedError('Resolution is not a spatial vector property.'))
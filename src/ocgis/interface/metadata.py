@@ -18,9 +18,10 @@ class NcMetadata(AbstractMetadata):
         super(NcMetadata,self).__init__()
         try:
             self._parse_(rootgrp)
-        ## likely raised by an initialization following a copy.
+        ## likely raised by an initialization following a copy. a sequence of
+        ## items is passed when unpickling.
         except AttributeError:
-            if isinstance(rootgrp,NcMetadata):
+            if isinstance(rootgrp,(NcMetadata,list)):
                 super(NcMetadata,self).__init__(rootgrp)
             else:
                 raise
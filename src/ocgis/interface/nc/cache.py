@@ -0,0 +1,300 @@
+import os
+import hashlib
+import tempfile
+import cPickle
+import zipfile
+from collections import OrderedDict
+from copy import deepcopy
+import numpy as np
+from ocgis import env, constants
+from ocgis.interface.metadata import NcMetadata
+from ocgis.interface.nc.pool import pool, nc_locked
+from ocgis.util.logging_ocgis import ocgis_lh
+import logging
+
+
+class CachedVariable(object):
+    '''
+    Stands in for a :class:`netCDF4.Variable` using cached attributes and, for
+    coordinate variables, cached values.
+    
+    :param name: Name of the variable.
+    :type name: str
+    :param meta: The variable's entry in :class:`~ocgis.interface.metadata.NcMetadata`.
+    :type meta: dict
+    :param value: Cached values of the variable.
+    :type value: numpy.ndarray
+    '''
+    
+    def __init__(self,name,meta,value=None):
+        self._name = name
+        self._attrs = meta['attrs']
+        self._value = value
+        self.dimensions = meta['dimensions']
+        self.dtype = np.dtype(meta['dtype']) if value is None else value.dtype
+    
+    def __getattr__(self,name):
+        try:
+            return(self.__dict__['_attrs'][name])
+        except KeyError:
+            raise(AttributeError(name))
+    
+    def __getitem__(self,slc):
+        if self._value is None:
+            raise(ValueError('Values of variable "{0}" are not cached.'.format(self._name)))
+        return(self._value[slc])
+    
+    def ncattrs(self):
+        return(self._attrs.keys())
+
+
+class CachedHeader(object):
+    '''
+    The metadata, dimension maps, and coordinate values of a netCDF file. The
+    `variables` attribute mirrors :attr:`netCDF4.Dataset.variables`.
+    
+    :type metadata: :class:`~ocgis.interface.metadata.NcMetadata`
+    :param arrays: Values of coordinate and bounds variables keyed by variable name.
+    :type arrays: dict
+    :param dimension_maps: Dimension maps keyed by data variable name. Dimension
+     maps reference variables by name.
+    :type dimension_maps: dict
+    '''
+    
+    def __init__(self,metadata,arrays,dimension_maps=None):
+        self.metadata = metadata
+        self.arrays = arrays
+        self.dimension_maps = dimension_maps or {}
+        self.variables = OrderedDict()
+        for name,meta in metadata['variables'].iteritems():
+            self.variables[name] = CachedVariable(name,meta,value=arrays.get(name))
+    
+    @classmethod
+    def from_dataset(cls,ds):
+        '''
+        :type ds: :class:`netCDF4.Dataset`
+        '''
+        metadata = NcMetadata(ds)
+        ## coordinate variables are one-dimensional. bounds variables are found
+        ## as in the dimension map: through the attributes of the coordinate
+        ## variables or by a bounds dimension.
+        names = [name for name,var in ds.variables.iteritems() if len(var.dimensions) == 1]
+        for name in list(names):
+            var = ds.variables[name]
+            for attr in constants.name_bounds + ['climatology']:
+                if attr in var.ncattrs() and var.getncattr(attr) in ds.variables:
+                    names.append(var.getncattr(attr))
+        coordinate_dimensions = set([ds.variables[name].dimensions[0] for name in names
+                                     if len(ds.variables[name].dimensions) == 1])
+        for name,var in ds.variables.iteritems():
+            dims = var.dimensions
+            if len(dims) == 2 and dims[0] in coordinate_dimensions and dims[1] in constants.name_bounds:
+                names.append(name)
+        arrays = {}
+        for name in set(names):
+            var = ds.variables[name]
+            if np.dtype(var.dtype).kind in 'biuf':
+                arrays[name] = var[:]
+        return(cls(metadata,arrays))
+    
+    def get_dimension_map(self,variable):
+        '''
+        :raises: KeyError
+        '''
+        ret = {}
+        for axis,names in self.dimension_maps[variable].iteritems():
+            if names is None:
+                ret[axis] = None
+            else:
+                bounds = names['bounds']
+                ret[axis] = {'variable':self.variables[names['variable']],
+                             'dimension':names['dimension'],
+                             'bounds':None if bounds is None else self.variables[bounds]}
+        return(ret)
+    
+    def set_dimension_map(self,variable,mp):
+        names = {}
+        for axis,value in mp.iteritems():
+            if value is None:
+                names[axis] = None
+            else:
+                bounds = value['bounds']
+                names[axis] = {'variable':value['variable']._name,
+                               'dimension':value['dimension'],
+                               'bounds':None if bounds is None else bounds._name}
+        self.dimension_maps[variable] = names
+
+
+class NcCache(object):
+    '''
+    On-disk cache of netCDF file headers stored in :attr:`ocgis.env.DIR_CACHE`.
+    Entries are keyed by a file's absolute path, size, and modification time.
+    Each entry is a single `.npz` file holding the coordinate and bounds values
+    and the pickled metadata and dimension maps. Unreadable entries are treated
+    as misses and rewritten. The time indices of multi-file datasets are stored
+    in the same directory (see :class:`~ocgis.interface.nc.mfindex.MFTimeIndex`).
+    
+    >>> header = cache.get('/path/to/tas.nc')
+    >>> cache.stats
+    OrderedDict([('hits', 0), ('misses', 1)])
+    '''
+    
+    def __init__(self):
+        ## headers loaded in this process keyed by cache path
+        self._headers = {}
+        self.hits = 0
+        self.misses = 0
+    
+    @property
+    def stats(self):
+        return(OrderedDict([['hits',self.hits],['misses',self.misses]]))
+    
+    def clear(self):
+        '''Remove all cache files and reset the statistics.'''
+        directory = env.DIR_CACHE
+        if directory is not None and os.path.exists(directory):
+            for fn in os.listdir(directory):
+                if os.path.splitext(fn)[1] == '.npz':
+                    os.remove(os.path.join(directory,fn))
+        self._headers = {}
+        self.hits = 0
+        self.misses = 0
+    
+    @nc_locked
+    def get(self,uri):
+        '''
+        Return the cached header of `uri` creating the cache entry if needed.
+        None is returned if caching is disabled or the file is not local.
+        
+        :type uri: str
+        :rtype: :class:`~ocgis.interface.nc.cache.CachedHeader`
+        '''
+        path = self._get_path_(uri)
+        if path is None:
+            return(None)
+        try:
+            ret = self._headers[path]
+        except KeyError:
+            try:
+                ret = self._read_(path)
+                self.hits += 1
+                ocgis_lh('cache hit: {0}'.format(uri),'nc.cache',level=logging.DEBUG)
+            except IOError:
+                ret = None
+                ocgis_lh('cache miss: {0}'.format(uri),'nc.cache',level=logging.DEBUG)
+            ## truncated or otherwise corrupt entries
+            except Exception as e:
+                ret = None
+                ocgis_lh('unreadable cache entry for {0} ({1}), rewriting'.format(uri,e),
+                         'nc.cache',level=logging.WARNING)
+            if ret is None:
+                self.misses += 1
+                ret = CachedHeader.from_dataset(pool.get(uri))
+                self._write_(path,ret)
+            self._headers[path] = ret
+        return(ret)
+    
+    def set_dimension_map(self,uri,variable,mp):
+        '''
+        Add the dimension map of `variable` to the cache entry of `uri`.
+        
+        :param mp: Dimension map as returned by :meth:`~ocgis.interface.nc.dataset.NcDataset._get_dimension_map_`.
+        :type mp: dict
+        '''
+        path = self._get_path_(uri)
+        header = self._headers[path]
+        header.set_dimension_map(variable,mp)
+        self._write_(path,header)
+    
+    def get_path(self,uris,*args):
+        '''
+        :param uris: Local file paths.
+        :type uris: sequence of str
+        :param args: Additional values identifying the entry.
+        :returns: The path of the cache entry for data derived from `uris`
+         without the `.npz` extension. None is returned if caching is disabled
+         or a file is not local.
+        :rtype: str
+        '''
+        directory = env.DIR_CACHE
+        if directory is None:
+            return(None)
+        parts = []
+        for uri in uris:
+            try:
+                uri = os.path.abspath(uri)
+                stat = os.stat(uri)
+            ## remote data is not cached
+            except (OSError,AttributeError):
+                return(None)
+            parts.append('{0}|{1}|{2!r}'.format(uri,stat.st_size,stat.st_mtime))
+        parts += [repr(arg) for arg in args]
+        key = hashlib.sha1('|'.join(parts)).hexdigest()
+        return(os.path.join(directory,key))
+    
+    def load(self,path):
+        '''
+        Read the cache entry at `path`.
+        
+        :returns: Tuple of the entry's state and its arrays keyed by name.
+        :rtype: tuple (dict,dict)
+        :raises: IOError if the entry does not exist. Other exceptions are
+         raised for damaged entries.
+        '''
+        ## numpy does not clean up after failing to open a damaged archive
+        if os.path.exists(path+'.npz') and not zipfile.is_zipfile(path+'.npz'):
+            raise(zipfile.BadZipfile('Damaged cache entry: {0}.npz'.format(path)))
+        with np.load(path+'.npz') as npz:
+            state = cPickle.loads(npz['__state__'].tostring())
+            arrays = {}
+            for name in state['arrays']:
+                value = npz[name]
+                mask_name = name+'__mask'
+                if mask_name in npz.files:
+                    value = np.ma.array(value,mask=npz[mask_name])
+                arrays[name] = value
+        return(state,arrays)
+    
+    def save(self,path,arrays,state):
+        '''
+        Write a cache entry to `path`.
+        
+        :param arrays: Arrays keyed by name. Masks are kept.
+        :type arrays: dict
+        :param state: Picklable values stored with the arrays.
+        :type state: dict
+        '''
+        ## the entry is written to a temporary location and moved to make
+        ## updates atomic for concurrent readers
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        to_save = {}
+        for name,value in arrays.iteritems():
+            to_save[name] = np.ma.getdata(value)
+            if np.ma.is_masked(value):
+                to_save[name+'__mask'] = np.ma.getmaskarray(value)
+        state = dict(state)
+        state['arrays'] = arrays.keys()
+        state = cPickle.dumps(state,protocol=cPickle.HIGHEST_PROTOCOL)
+        to_save['__state__'] = np.frombuffer(state,dtype=np.uint8)
+        fd,tmp = tempfile.mkstemp(suffix='.npz',dir=directory)
+        os.close(fd)
+        np.savez(tmp,**to_save)
+        os.rename(tmp,path+'.npz')
+    
+    def _get_path_(self,uri):
+        return(self.get_path([uri]))
+    
+    def _read_(self,path):
+        state,arrays = self.load(path)
+        return(CachedHeader(state['metadata'],arrays,dimension_maps=state['dimension_maps']))
+    
+    def _write_(self,path,header):
+        state = {'metadata':deepcopy(header.metadata),
+                 'dimension_maps':header.dimension_maps}
+        self.save(path,header.arrays,state)
+
+
+## the header cache shared by all datasets in the process
+cache = NcCache()
@@ -0,0 +1,187 @@
+import numpy as np
+import netCDF4 as nc
+from ocgis import constants, env
+from ocgis.util.logging_ocgis import ocgis_lh
+import logging
+
+
+def get_chunk_shape(variable):
+    '''
+    :returns: The on-disk chunk shape of `variable` or None if the variable is
+     stored contiguously.
+    :rtype: tuple
+    '''
+    try:
+        chunks = variable.chunking()
+    ## variables not read through the netCDF library have no chunking
+    except AttributeError:
+        return(None)
+    if chunks == 'contiguous' or chunks is None:
+        return(None)
+    return(tuple([int(c) for c in chunks]))
+
+def align(size,chunk):
+    '''
+    Align the length of a read window along a dimension to the dimension's
+    chunk length. Windows at least as long as a chunk are shrunk to a multiple
+    of the chunk length. Shorter windows are shrunk to a divisor of the chunk
+    length so windows never straddle a chunk boundary. If the chunk length has
+    no divisor of at least half the window (i.e. a prime chunk length), the
+    window is returned unaligned.
+    
+    >>> align(100,30)
+    90
+    >>> align(20,30)
+    15
+    >>> align(100,181)
+    100
+    
+    :type size: int
+    :type chunk: int
+    :rtype: int
+    '''
+    if chunk is None or chunk <= 1 or size <= 0:
+        return(size)
+    if size >= chunk:
+        ret = (size//chunk)*chunk
+    else:
+        ret = max([d for d in range(1,size+1) if chunk % d == 0])
+        ## smaller windows cost more reads than straddling chunks
+        if 2*ret < size:
+            ret = size
+    return(ret)
+
+def get_block_starts(real_idx,size,chunk):
+    '''
+    Split indices into blocks of at most `size` indices starting on chunk
+    boundaries where possible. Blocks of an aligned size (see :func:`align`)
+    start where the indices enter a new window of `size` along the chunked
+    dimension. Otherwise, blocks start where the indices enter a new chunk.
+    
+    >>> get_block_starts(np.arange(4,35),5,10)
+    [0, 1, 6, 11, 16, 21, 26]
+    >>> get_block_starts(np.array([0,1,2,10,11,40,60]),2,10)
+    [0, 2, 3, 5]
+    
+    :param real_idx: Increasing indices along the chunked dimension.
+    :type real_idx: numpy.ndarray
+    :type size: int
+    :type chunk: int
+    :returns: The start of each block in `real_idx`.
+    :rtype: list of int
+    '''
+    real_idx = np.asarray(real_idx)
+    if chunk is None or chunk <= 1 or real_idx.shape[0] == 0:
+        return(range(0,real_idx.shape[0],size))
+    if size % chunk == 0 or chunk % size == 0:
+        window = size
+    else:
+        window = chunk
+    edges = (np.flatnonzero(np.diff(real_idx//window)) + 1).tolist() + [real_idx.shape[0]]
+    starts = [0]
+    ## the last boundary the current block may stop at
+    last = 0
+    for edge in edges:
+        while edge - starts[-1] > size:
+            if last > starts[-1]:
+                starts.append(last)
+            ## the block holds no boundary
+            else:
+                starts.append(starts[-1] + size)
+        last = edge
+    return(starts)
+
+
+class ReadPlan(object):
+    '''
+    The chunks of a netCDF variable touched by a hyperslab read. The first
+    dimension is assumed to be read in order so the working set is the chunks
+    overlapping the window in a single layer of chunks along that dimension.
+    
+    >>> plan = ReadPlan(ds.variables['tas'],[(0,365),(10,20),(0,180)])
+    >>> plan.set_chunk_cache()
+    
+    :param variable: The variable to read.
+    :type variable: :class:`netCDF4.Variable`
+    :param bounds: `(start,stop)` indices of the read along each dimension.
+    :type bounds: sequence of tuple
+    '''
+    
+    def __init__(self,variable,bounds):
+        self.variable = variable
+        self.bounds = [(int(start),int(stop)) for start,stop in bounds]
+        self.chunks = get_chunk_shape(variable)
+        ## chunk cache settings replaced by set_chunk_cache
+        self._previous = None
+        if self.chunks is None:
+            self.counts = None
+            self.nchunks = 0
+            self.nchunks_layer = 0
+            self.working_set = 0
+        else:
+            ## number of chunks overlapping the window along each dimension
+            self.counts = [(stop-1)//c - start//c + 1 if stop > start else 0
+                           for (start,stop),c in zip(self.bounds,self.chunks)]
+            chunk_bytes = int(np.prod(self.chunks))*np.dtype(variable.dtype).itemsize
+            self.nchunks = int(np.prod(self.counts))
+            self.nchunks_layer = int(np.prod(self.counts[1:]))
+            self.working_set = self.nchunks_layer*chunk_bytes
+    
+    def __str__(self):
+        window = ','.join(['{0}:{1}'.format(start,stop) for start,stop in self.bounds])
+        if self.chunks is None:
+            msg = 'planned read {0}[{1}]: contiguous'
+        else:
+            msg = 'planned read {0}[{1}]: {2} chunks of shape {3}, working set {4} bytes'
+        return(msg.format(self.variable._name,window,self.nchunks,self.chunks,self.working_set))
+    
+    def set_chunk_cache(self):
+        '''
+        Grow the variable's chunk cache to hold the working set of the read so
+        that no chunk is decompressed more than once. The cache size is limited
+        by :attr:`ocgis.env.MEMORY_LIMIT` if set and
+        :attr:`ocgis.constants.chunk_cache_limit` otherwise. The cache is never
+        shrunk. Call :meth:`restore_chunk_cache` once the read finishes as the
+        cache is held by the pooled handle.
+        
+        :returns: True if the chunk cache was changed.
+        :rtype: bool
+        '''
+        ## the chunk cache of aggregated and memory mapped variables is not
+        ## managed by their handle
+        if self.chunks is None or not isinstance(self.variable,nc.Variable):
+            return(False)
+        limit = env.MEMORY_LIMIT or constants.chunk_cache_limit
+        size = min(self.working_set,limit)
+        current_size,current_nelems,preemption = self.variable.get_var_chunk_cache()
+        if size <= current_size:
+            return(False)
+        ## the number of hash slots should be a prime much larger than the
+        ## number of cached chunks
+        nelems = _get_next_prime_(max(current_nelems,10*self.nchunks_layer))
+        self.variable.set_var_chunk_cache(size=size,nelems=nelems,preemption=preemption)
+        self._previous = (current_size,current_nelems,preemption)
+        ocgis_lh('chunk cache of {0} set to {1} bytes'.format(self.variable._name,size),
+                 'nc.chunking',level=logging.DEBUG)
+        return(True)
+    
+    def restore_chunk_cache(self):
+        '''
+        Restore the chunk cache settings replaced by :meth:`set_chunk_cache`.
+        
+        :returns: True if the chunk cache was changed.
+        :rtype: bool
+        '''
+        if self._previous is None:
+            return(False)
+        size,nelems,preemption = self._previous
+        self.variable.set_var_chunk_cache(size=size,nelems=nelems,preemption=preemption)
+        self._previous = None
+        return(True)
+
+
+def _get_next_prime_(n):
+    n = max(int(n),2)
+    while any([n % d == 0 for d in range(2,int(np.sqrt(n))+1)]):
+        n += 1
+    return(n)
@@ -0,0 +1,215 @@
+import os
+import struct
+import numpy as np
+from ocgis.util.logging_ocgis import ocgis_lh
+import logging
+
+
+## parsed layouts keyed by path and modification time
+_layouts = {}
+
+## netCDF external type codes mapped to big-endian numpy type codes
+_types = {1:'i1',2:'S1',3:'i2',4:'i4',5:'f4',6:'f8',7:'u1',8:'u2',9:'u4',10:'i8',11:'u8'}
+
+## list tags of the classic header
+_ABSENT,_NC_DIMENSION,_NC_VARIABLE,_NC_ATTRIBUTE = 0,10,11,12
+
+## attributes transforming values on read are not reproduced by the memory map
+_unsupported_attrs = ('scale_factor','add_offset','valid_min','valid_max','valid_range')
+
+
+class NotClassic(Exception):
+    pass
+
+
+class ClassicLayout(object):
+    '''
+    On-disk layout of the variables of a netCDF classic (CDF-1), 64-bit offset
+    (CDF-2), or 64-bit data (CDF-5) file parsed from its header. The `variables`
+    attribute maps variable names to `(dtype,shape,strides,begin)` tuples.
+    
+    :param path: Path to the local file.
+    :type path: str
+    :raises: NotClassic
+    '''
+    
+    def __init__(self,path):
+        self.path = path
+        with open(path,'rb') as f:
+            self._f = f
+            try:
+                self._parse_()
+            finally:
+                self._f = None
+    
+    def get_array(self,name):
+        '''
+        :returns: A read-only view of the variable's values backed by a memory
+         map of the file.
+        :rtype: numpy.ndarray
+        '''
+        dtype,shape,strides,begin = self.variables[name]
+        mm = np.memmap(self.path,dtype=np.uint8,mode='r')
+        return(np.ndarray(shape,dtype=dtype,buffer=mm,offset=begin,strides=strides))
+    
+    def _parse_(self):
+        magic = self._f.read(4)
+        if len(magic) != 4 or magic[:3] != 'CDF' or ord(magic[3]) not in (1,2,5):
+            raise(NotClassic)
+        version = ord(magic[3])
+        self._size_fmt = '>q' if version == 5 else '>i'
+        offset_fmt = '>i' if version == 1 else '>q'
+        
+        numrecs = self._read_(self._size_fmt)
+        ## files written in streaming mode do not record the number of records
+        if numrecs < 0:
+            raise(NotClassic)
+        
+        dimensions = [(name,self._read_(self._size_fmt)) for name in self._iter_list_(_NC_DIMENSION)]
+        for name in self._iter_list_(_NC_ATTRIBUTE):
+            self._skip_attribute_()
+        
+        variables = []
+        for name in self._iter_list_(_NC_VARIABLE):
+            dimids = [self._read_(self._size_fmt) for ii in range(self._read_(self._size_fmt))]
+            for attr_name in self._iter_list_(_NC_ATTRIBUTE):
+                self._skip_attribute_()
+            nc_type = self._read_('>i')
+            ## vsize overflows for large variables and is computed instead
+            self._read_(self._size_fmt)
+            begin = self._read_(offset_fmt)
+            variables.append((name,dimids,np.dtype('>'+_types[nc_type]),begin))
+        
+        ## values of record variables are interleaved record by record
+        is_record = lambda dimids: len(dimids) > 0 and dimensions[dimids[0]][1] == 0
+        record_sizes = [self._get_nbytes_(dimensions,dimids[1:],dtype) for name,dimids,dtype,begin in variables if is_record(dimids)]
+        if len(record_sizes) == 1:
+            recsize = record_sizes[0]
+        else:
+            recsize = sum([size + (-size % 4) for size in record_sizes])
+        
+        self.variables = {}
+        for name,dimids,dtype,begin in variables:
+            shape = [dimensions[dimid][1] for dimid in dimids]
+            strides = [dtype.itemsize]*len(shape)
+            for idx in range(len(shape)-2,-1,-1):
+                strides[idx] = strides[idx+1]*shape[idx+1]
+            if is_record(dimids):
+                shape[0] = numrecs
+                strides[0] = recsize
+            self.variables[name] = (dtype,tuple(shape),tuple(strides),begin)
+    
+    @staticmethod
+    def _get_nbytes_(dimensions,dimids,dtype):
+        return(int(np.prod([dimensions[dimid][1] for dimid in dimids]))*dtype.itemsize)
+    
+    def _iter_list_(self,tag):
+        list_tag = self._read_('>i')
+        nelems = self._read_(self._size_fmt)
+        if list_tag not in (_ABSENT,tag):
+            raise(NotClassic)
+        for ii in range(nelems):
+            yield(self._read_name_())
+    
+    def _read_(self,fmt):
+        return(struct.unpack(fmt,self._f.read(struct.calcsize(fmt)))[0])
+    
+    def _read_name_(self):
+        nchar = self._read_(self._size_fmt)
+        ret = self._f.read(nchar)
+        self._f.read(-nchar % 4)
+        return(ret)
+    
+    def _skip_attribute_(self):
+        nc_type = self._read_('>i')
+        nbytes = self._read_(self._size_fmt)*np.dtype(_types[nc_type]).itemsize
+        self._f.read(nbytes + (-nbytes % 4))
+
+
+class MemmapVariable(object):
+    '''
+    Read-only view of a netCDF variable serving reads from a memory map of a
+    classic format file. Only the sliced values are copied from the map. Reads
+    are masked against the `missing_value` and `_FillValue` attributes as
+    :class:`netCDF4.Variable` does.
+    
+    :param template: The variable opened by :mod:`netCDF4`.
+    :type template: :class:`netCDF4.Variable`
+    :param array: The memory mapped values.
+    :type array: numpy.ndarray
+    '''
+    
+    def __init__(self,template,array):
+        self._template = template
+        self._array = array
+        self._name = template._name
+        self.dimensions = template.dimensions
+        self.shape = array.shape
+    
+    def __getattr__(self,name):
+        return(getattr(self._template,name))
+    
+    def __getitem__(self,slc):
+        data = self._array[slc].astype(self._array.dtype.newbyteorder('='))
+        
+        attrs = self._template.ncattrs()
+        fill_values = []
+        if 'missing_value' in attrs:
+            fill_values += list(np.atleast_1d(self._template.missing_value))
+        if '_FillValue' in attrs:
+            fill_values.append(self._template._FillValue)
+        
+        mask = np.zeros(data.shape,dtype=bool)
+        fill_value = None
+        for value in fill_values:
+            value = np.array(value,dtype=data.dtype)
+            if data.dtype.kind == 'f' and np.isnan(value):
+                select = np.isnan(data)
+            else:
+                select = data == value
+            if select.any():
+                mask |= select
+                if fill_value is None:
+                    fill_value = value
+        if fill_value is None:
+            ret = np.ma.array(data,mask=False)
+        else:
+            ret = np.ma.array(data,mask=mask,fill_value=fill_value)
+        return(ret)
+
+
+def get_memmap_variable(path,variable):
+    '''
+    Return a memory mapped view of `variable` if `path` is a local classic
+    format file and the variable's values are stored unpacked. Otherwise, None
+    is returned.
+    
+    :param path: Path to the file containing `variable`.
+    :type path: str
+    :type variable: :class:`netCDF4.Variable`
+    :rtype: :class:`~ocgis.interface.nc.classic.MemmapVariable`
+    '''
+    try:
+        key = (os.path.abspath(path),os.path.getmtime(path))
+    ## remote data cannot be memory mapped
+    except (OSError,TypeError):
+        return(None)
+    try:
+        layout = _layouts[key]
+    except KeyError:
+        try:
+            layout = ClassicLayout(path)
+        except (NotClassic,KeyError,struct.error):
+            layout = None
+        _layouts[key] = layout
+    
+    if layout is None or variable._name not in layout.variables:
+        return(None)
+    if any([attr in variable.ncattrs() for attr in _unsupported_attrs]):
+        return(None)
+    dtype = layout.variables[variable._name][0]
+    if dtype.kind == 'S':
+        return(None)
+    
+    ocgis_lh('memory mapping {0}:{1}'.format(path,variable._name),'nc.classic',level=logging.DEBUG)
+    return(MemmapVariable(variable,layout.get_array(variable._name)))
@@ -2,10 +2,15 @@ from ocgis.interface import base
 from ocgis.interface.nc.dimension import NcTemporalDimension, NcLevelDimension,\
     NcSpatialDimension, NcRowDimension
 from ocgis.interface.metadata import NcMetadata
+from ocgis.interface.nc.mfindex import MFTimeIndex, MFVariable
+from ocgis.interface.nc.pool import pool, nc_lock, nc_locked
+from ocgis.interface.nc.cache import cache as nc_cache, CachedHeader
+from ocgis.interface.nc.classic import get_memmap_variable
+from ocgis.interface.nc.chunking import ReadPlan, get_chunk_shape, align,\
+    get_block_starts
+from copy import deepcopy
 import numpy as np
 import netCDF4 as nc
-from shapely.geometry.multipolygon import MultiPolygon
-from shapely.ops import cascaded_union
 from shapely.geometry.multipoint import MultiPoint
 from shapely.geometry.point import Point
 from ocgis import constants
@@ -14,6 +19,7 @@ from osgeo.ogr import CreateGeometryFromWkb
 from shapely.wkb import loads
 import ocgis
 from ocgis.util.logging_ocgis import ocgis_lh
+from ocgis.util.spatial.index import get_kdtree
 import logging
 import itertools
 
@@ -31,13 +37,17 @@ class NcDataset(base.AbstractDataset):
         super(self.__class__,self).__init__(*args,**kwds)
         self.__ds = None
         self.__dim_map = None
+        self.__header = None
         self._load_slice = {}
         
-    def __del__(self):
-        try:
-            self._ds.close()
-        finally:
-            pass
+    def __getstate__(self):
+        ## open netCDF handles and the dimension map (which references netCDF
+        ## variables) may not be pickled. they are reloaded on access.
+        state = self.__dict__.copy()
+        state['_NcDataset__ds'] = None
+        state['_NcDataset__dim_map'] = None
+        state['_NcDataset__header'] = None
+        return(state)
         
     def __getitem__(self,slc):
         if self.level is None:
@@ -66,95 +76,74 @@ class NcDataset(base.AbstractDataset):
     @property
     def metadata(self):
         if self._metadata is None:
-            self._metadata = NcMetadata(self._ds)
+            with nc_lock:
+                header = self._header
+                if isinstance(header,CachedHeader):
+                    self._metadata = deepcopy(header.metadata)
+                else:
+                    self._metadata = NcMetadata(header)
+                ## the time dimension length of multi-file datasets is updated
+                ## when the dimension map loads the time index
+                if self._is_multifile and self.__dim_map is None:
+                    self._dim_map
         return(self._metadata)
     
     @property
     def value(self):
         if self._value is None:
-            ref = self._ds.variables[self.request_dataset.variable]
-            
-            try:
-                row_start,row_stop = self._sub_range_(self.spatial.grid.row.real_idx)
-            ## NcGridMatrixDimension correction
-            except AttributeError:
-                row_start,row_stop = self._sub_range_(self.spatial.grid.real_idx_row.flatten())
-            try:
-                column_start,column_stop = self._sub_range_(self.spatial.grid.column.real_idx)
-            ## NcGridMatrixDimension correction
-            except AttributeError:
-                column_start,column_stop = self._sub_range_(self.spatial.grid.real_idx_column.flatten())
-                
-            time_start,time_stop = self._sub_range_(self.temporal.real_idx)
-            
-            if self.level is None:
-                level_start,level_stop = None,None
-            else:
-                level = self.level.real_idx
-                level_start,level_stop = level[0],level[-1]+1
-            
-            try:
-                self._value,time_indices = self._get_numpy_data_(ref,time_start,time_stop,
-                 row_start,row_stop,column_start,column_stop,level_start=level_start,
-                 level_stop=level_stop,return_time_indices=True)
-                ocgis_lh('numpy data pulled','nc.dataset',level=logging.DEBUG)
-                ## apply a temporal subset if the shapes are different. we are
-                ## probably returning more data than is needed by the time region
-                if self._value.shape[0] != self.temporal.value.shape[0]:
-                    ocgis_lh(msg='regionated subset applied',logger='nc.dataset',level=logging.DEBUG)
-                    select = np.array([(self.temporal.real_idx == time_index).sum() == 1 for time_index in time_indices])
-                    self._value = self._value[select,]
-            ## likely empty time
-            except TypeError:
-                if time_start.shape[0] == 0:
-                    raise(EmptyData(origin='time'))
-                else:
-                    raise
-            
-            if self.spatial.vector._geom is not None:
-                ## update each time and level field mask by the geometry operation
-                ## mask.
-                shp_value = self._value.shape
-                ref_value_mask = self._value.mask
-                ref_geom_mask = self.spatial.vector._geom.mask
-                ref_logical_or = np.logical_or
-                for idx_time,idx_level in itertools.product(range(shp_value[0]),range(shp_value[1])):
-                    ref_value_mask[idx_time,idx_level,:,:] = ref_logical_or(ref_value_mask[idx_time,idx_level,:,:],ref_geom_mask)
-            
-            assert(self.value.shape[0] == self.temporal.value.shape[0])
-            assert(self.value.shape[2:] == self.spatial.grid.shape)
-            try:
-                assert(self.value.shape[1] == self.level.value.shape[0])
-            ## might be a dummy level
-            except AttributeError:
-                if self.level is None:
-                    pass
-                else:
-                    raise
-            
+            self._value = self._get_value_()
         return(self._value)
     
+    def iter_value(self,chunk_size=None):
+        '''
+        Yield the value array in blocks along the time dimension. Blocks are
+        read from the source file on demand and are not stored on the dataset.
+        
+        :param chunk_size: The number of time steps per block. Defaults to
+         :attr:`ocgis.env.TIME_CHUNK_SIZE`. If neither is set or the value
+         array is already loaded, the complete value array is yielded. For
+         chunked variables, the block size is aligned to the time chunk length
+         if the chunk length has a suitable divisor (see
+         :func:`~ocgis.interface.nc.chunking.align`) and blocks start on chunk
+         boundaries of the file where possible (see
+         :func:`~ocgis.interface.nc.chunking.get_block_starts`).
+        :type chunk_size: int
+        :yields: tuple (slice,numpy.ma.MaskedArray) with the slice indexing
+         the time dimension of the dataset.
+        '''
+        chunk_size = chunk_size or ocgis.env.TIME_CHUNK_SIZE
+        if chunk_size is None or self._value is not None:
+            for ret in super(NcDataset,self).iter_value():
+                yield(ret)
+        else:
+            ntime = self.temporal.value.shape[0]
+            ## align blocks with the time chunks of the variable. block starts
+            ## follow the time indices of the file which are not contiguous for
+            ## time region subsets.
+            chunks = get_chunk_shape(self._get_variable_(self.request_dataset.variable))
+            if chunks is None:
+                starts = range(0,ntime,chunk_size)
+            else:
+                chunk_size = align(chunk_size,chunks[0])
+                starts = get_block_starts(self.temporal.real_idx,chunk_size,chunks[0])
+            for start,stop in zip(starts,starts[1:]+[ntime]):
+                time_slice = slice(start,stop)
+                ocgis_lh('reading time block {0}'.format(time_slice),'nc.dataset',
+                         level=logging.DEBUG)
+                yield(time_slice,self._get_value_(time_slice=time_slice))
+    
     def aggregate(self,new_geom_id=1,clip_geom=None):
         ## will hold the unioned geometry
         new_geometry = np.ones((1,1),dtype=object)
         new_geometry = np.ma.array(new_geometry,mask=False)
-        ## get the masked geometries
-        geoms = self.spatial.vector.geom.compressed()
         ## store the raw weights
         self.spatial.vector.raw_weights = self.spatial.vector.weights.copy()
-        ## break out the MultiPolygon objects. inextricable geometry errors
-        ## sometimes occur otherwise
+        ## the union is built from the cell bounds without the cell geometries
         if self.spatial.abstraction == 'polygon':
-            ugeom = []
-            for geom in geoms:
-                if isinstance(geom,MultiPolygon):
-                    for poly in geom:
-                        ugeom.append(poly)
-                else:
-                    ugeom.append(geom)
-            ## execute the union
-            new_geometry[0,0] = cascaded_union(ugeom)
+            new_geometry[0,0] = self.spatial.vector.get_union()
         elif self.spatial.abstraction == 'point':
+            ## get the masked geometries
+            geoms = self.spatial.vector.geom.compressed()
             if geoms.shape[0] == 0:
                 raise(EmptyData)
             else:
@@ -180,22 +169,57 @@ class NcDataset(base.AbstractDataset):
     
     @property
     def _dim_map(self):
+        ## check the handle or cached header is current
+        self._header
         if self.__dim_map is None:
             self.__dim_map = self._get_dimension_map_()
         return(self.__dim_map)
     
     @property
     def _ds(self):
-        if self.__ds is None:
-            try:
-                self.__ds = nc.Dataset(self.request_dataset.uri,'r')
-            ## likely multiple uris...
-            except TypeError:
-                self.__ds = nc.MFDataset(self.request_dataset.uri)
+        ## for multiple uris, the first file provides the metadata and
+        ## variables without a time dimension. time-varying variables are
+        ## read through a time index opening only the files needed.
+        if self._is_multifile:
+            uri = self.request_dataset.uri[0]
+        else:
+            uri = self.request_dataset.uri
+        ## handles are shared through the pool. the pool (and the modification
+        ## time of the file) is only checked on first access or once the pool
+        ## closed the handle.
+        if self.__ds is None or not self.__ds.isopen():
+            self.__ds = pool.get(uri)
+            self.__dim_map = None
         return(self.__ds)
     
+    @property
+    def _header(self):
+        '''
+        Provides the metadata and coordinate variables of the dataset. If
+        :attr:`ocgis.env.DIR_CACHE` is set, this is the cached header of the
+        file. Otherwise, it is the netCDF handle.
+        '''
+        ret = None
+        if not self._is_multifile:
+            ret = nc_cache.get(self.request_dataset.uri)
+        if ret is None:
+            ret = self._ds
+        elif ret is not self.__header:
+            self.__header = ret
+            self.__dim_map = None
+        return(ret)
+    
+    @property
+    def _is_multifile(self):
+        return(not isinstance(self.request_dataset.uri,basestring))
+    
     def get_iter_value(self,add_bounds=True,add_masked=True,value=None,
-                       temporal_group=False):        
+                       temporal_group=False,time_strings=False):
+        '''
+        :param time_strings: If True and `temporal_group` is False, times are
+         formatted as strings.
+        :type time_strings: bool
+        '''
         ## check if the reference projection is different than the dataset
         if type(self.spatial.projection) != type(ocgis.env.REFERENCE_PROJECTION) and ocgis.env.WRITE_TO_REFERENCE_PROJECTION:
             project = True
@@ -204,9 +228,13 @@ class NcDataset(base.AbstractDataset):
         else:
             project = False
         
-        ## if no external value to iterate over is passed, use the internal value
+        ## if no external value to iterate over is passed, use the internal
+        ## value. the internal value may be streamed in time blocks in which case
+        ## records are ordered by block first.
         if value is None:
-            value = self.value
+            blocks = self.iter_value()
+        else:
+            blocks = [(slice(0,value.shape[0]),value)]
         
         ## reference the mask checker
         is_masked = np.ma.is_masked
@@ -215,51 +243,57 @@ class NcDataset(base.AbstractDataset):
         ## reference the fill_value
         fill_value = constants.fill_value
         
-        ## if iteration over the temporal groups is requested, reference the
-        ## appropriate iterator.
+        ## the time attributes of the time steps (or temporal groups if
+        ## requested) of each block
         if temporal_group:
-            time_iter = self.temporal.group.get_iter
-        else:
-            time_iter = self.temporal.get_iter
+            group_rows = [dict(tret) for _,tret in self.temporal.group.get_iter(add_bounds=add_bounds)]
         
-        if self.level is None:
-            for (ridx,cidx),geom,gret in self.spatial.get_iter():
-                if project:
-                    geom = CreateGeometryFromWkb(geom.wkb)
-                    geom.AssignSpatialReference(sr)
-                    geom.TransformTo(to_sr)
-                    geom = loads(geom.ExportToWkb())
-                for tidx,tret in time_iter(add_bounds=add_bounds):
-                    gret.update(tret)
-                    gret['lid'] = None
-                    gret['level'] = None
-                    ref = value[tidx,0,ridx,cidx]
-                    masked = is_masked(ref)
-                    if add_masked and masked:
-                        ref = fill_value
-                    elif not add_masked and masked:
-                        continue
-                    gret[_name_value] = ref
-                    yield(geom,gret)
-        else:
-            for (ridx,cidx),geom,gret in self.spatial.get_iter():
-                if project:
-                    geom = CreateGeometryFromWkb(geom.wkb)
-                    geom.AssignSpatialReference(sr)
-                    geom.TransformTo(to_sr)
-                    geom = loads(geom.ExportToWkb())
-                for lidx,lret in self.level.get_iter(add_bounds=add_bounds):
-                    gret.update(lret)
-                    for tidx,tret in time_iter(add_bounds=add_bounds):
+        for time_slice,value in blocks:
+            if temporal_group:
+                rows = group_rows[time_slice]
+            else:
+                rows = self.temporal.output.get_rows(time_slice,add_bounds=add_bounds,
+                                                     time_strings=time_strings)
+            time_rows = list(enumerate(rows,start=time_slice.start))
+            offset = time_slice.start
+            if self.level is None:
+                for (ridx,cidx),geom,gret in self.spatial.get_iter():
+                    if project:
+                        geom = CreateGeometryFromWkb(geom.wkb)
+                        geom.AssignSpatialReference(sr)
+                        geom.TransformTo(to_sr)
+                        geom = loads(geom.ExportToWkb())
+                    for tidx,tret in time_rows:
                         gret.update(tret)
-                        ref = value[tidx,lidx,ridx,cidx]
-                        masked = is_masked(value)
+                        gret['lid'] = None
+                        gret['level'] = None
+                        ref = value[tidx-offset,0,ridx,cidx]
+                        masked = is_masked(ref)
                         if add_masked and masked:
-                            ref = None
+                            ref = fill_value
                         elif not add_masked and masked:
                             continue
                         gret[_name_value] = ref
                         yield(geom,gret)
+            else:
+                for (ridx,cidx),geom,gret in self.spatial.get_iter():
+                    if project:
+                        geom = CreateGeometryFromWkb(geom.wkb)
+                        geom.AssignSpatialReference(sr)
+                        geom.TransformTo(to_sr)
+                        geom = loads(geom.ExportToWkb())
+                    for lidx,lret in self.level.get_iter(add_bounds=add_bounds):
+                        gret.update(lret)
+                        for tidx,tret in time_rows:
+                            gret.update(tret)
+                            ref = value[tidx-offset,lidx,ridx,cidx]
+                            masked = is_masked(ref)
+                            if add_masked and masked:
+                                ref = None
+                            elif not add_masked and masked:
+                                continue
+                            gret[_name_value] = ref
+                            yield(geom,gret)
     
     def get_subset(self,temporal=None,level=None,spatial_operation=None,igeom=None):
         if temporal is not None:
@@ -294,15 +328,10 @@ class NcDataset(base.AbstractDataset):
                 except AttributeError:
                     _row = self.spatial.grid.row
                     _col = self.spatial.grid.column
-                    coords = np.hstack([_col.reshape(-1,1),_row.reshape(-1,1)])
-                    pt = np.array(igeom).reshape(1,2)
-                    dist = np.empty(coords.shape[0],dtype=float)
-                    norm = np.linalg.norm
-                    for idx in range(coords.shape[0]):
-                        dist[idx] = norm(coords[idx,:]-pt)
-                    sel_idx = np.argmin(dist)
-                    row_idx = _row == coords[sel_idx,1]
-                    col_idx = _col == coords[sel_idx,0]
+                    _,sel_idx = get_kdtree(_col,_row).query(igeom.x,igeom.y)
+                    sel_idx = np.unravel_index(sel_idx[0],_row.shape)
+                    row_idx = _row == _row[sel_idx]
+                    col_idx = _col == _col[sel_idx]
                 new_grid = self.spatial.grid[row_idx,col_idx]
                 new_vector = None
             else:
@@ -382,16 +411,24 @@ class NcDataset(base.AbstractDataset):
             axis = self._guess_by_location_(dims,dim)
         return(axis)
     
+    @nc_locked
     def _get_dimension_map_(self):
+        ds = self._header
+        ## cached headers may store the dimension map
+        if isinstance(ds,CachedHeader):
+            try:
+                return(ds.get_dimension_map(self.request_dataset.variable))
+            except KeyError:
+                pass
+        
         try:    
-            var = self._ds.variables[self.request_dataset.variable]
+            var = ds.variables[self.request_dataset.variable]
         ## variable likely does not exist in the target data
         except KeyError:
             raise(KeyError('The variable "{0}" was not found in the target dataset.'.\
                   format(self.request_dataset.variable)))
         dims = var.dimensions
         mp = dict.fromkeys(['T','Z','X','Y'])
-        ds = self._ds
         
         ## try to pull dimensions
         for dim in dims:
@@ -448,8 +485,119 @@ class NcDataset(base.AbstractDataset):
                         if len(intersection) == 2:
                             bounds_var = ds.variables[key2]
             value.update({'bounds':bounds_var})
+            
+        ## aggregate the time coordinate of multi-file datasets
+        if self._is_multifile and mp['T'] is not None:
+            ref = mp['T']
+            name_bounds = None if ref['bounds'] is None else ref['bounds']._name
+            index = MFTimeIndex.get(self.request_dataset.uri,ref['dimension'],
+                                    variable=ref['variable']._name,bounds=name_bounds)
+            ref['variable'] = MFVariable(index,ref['variable'],value=index.value)
+            if ref['bounds'] is not None:
+                ref['bounds'] = MFVariable(index,ref['bounds'],value=index.bounds)
+            self.metadata['dimensions'][ref['dimension']]['len'] = len(index)
+        
+        if isinstance(ds,CachedHeader):
+            nc_cache.set_dimension_map(self.request_dataset.uri,self.request_dataset.variable,mp)
         return(mp)
     
+    def _get_value_(self,time_slice=slice(None)):
+        '''
+        Read the value array from the source file.
+        
+        :param time_slice: Slice along the time dimension of the dataset.
+        :type time_slice: slice
+        :rtype: numpy.ma.MaskedArray
+        '''
+        try:
+            row_start,row_stop = self._sub_range_(self.spatial.grid.row.real_idx)
+        ## NcGridMatrixDimension correction
+        except AttributeError:
+            row_start,row_stop = self._sub_range_(self.spatial.grid.real_idx_row.flatten())
+        try:
+            column_start,column_stop = self._sub_range_(self.spatial.grid.column.real_idx)
+        ## NcGridMatrixDimension correction
+        except AttributeError:
+            column_start,column_stop = self._sub_range_(self.spatial.grid.real_idx_column.flatten())
+        
+        time_real_idx = self.temporal.real_idx[time_slice]
+        if time_real_idx.shape[0] == 0:
+            raise(EmptyData(origin='time'))
+        
+        if self.level is None:
+            level_start,level_stop = None,None
+        else:
+            level = self.level.real_idx
+            level_start,level_stop = level[0],level[-1]+1
+        
+        ## time regions are read with one hyperslab per contiguous run of time
+        ## indices. the runs are copied directly into the output array.
+        runs = self._get_time_runs_(time_real_idx)
+        
+        ## reads are serialized with other threads. the handle is not closed by
+        ## the pool during the read.
+        with nc_lock, pool.pinned(self._ds):
+            ref = self._get_variable_(self.request_dataset.variable)
+            ## size the chunk cache so runs sharing chunks decompress them once
+            bounds = [(runs[0][0],runs[-1][1]),(row_start,row_stop),(column_start,column_stop)]
+            if level_start is not None:
+                bounds.insert(1,(level_start,level_stop))
+            plan = ReadPlan(ref,bounds)
+            ocgis_lh(msg=str(plan),logger='nc.dataset',level=logging.DEBUG)
+            plan.set_chunk_cache()
+            ## the pooled handle outlives the read. its chunk cache is restored so
+            ## the cache does not hold memory between reads.
+            try:
+                if len(runs) == 1:
+                    time_start,time_stop = runs[0]
+                    value = self._get_numpy_data_(ref,time_start,time_stop,row_start,
+                     row_stop,column_start,column_stop,level_start=level_start,
+                     level_stop=level_stop)
+                else:
+                    ocgis_lh(msg='reading {0} time runs'.format(len(runs)),logger='nc.dataset',
+                             level=logging.DEBUG)
+                    value = None
+                    position = 0
+                    for time_start,time_stop in runs:
+                        block = self._get_numpy_data_(ref,time_start,time_stop,row_start,
+                         row_stop,column_start,column_stop,level_start=level_start,
+                         level_stop=level_stop)
+                        if value is None:
+                            shape = (time_real_idx.shape[0],) + block.shape[1:]
+                            value = np.ma.array(np.empty(shape,dtype=block.dtype),
+                                                mask=np.zeros(shape,dtype=bool),
+                                                fill_value=block.fill_value)
+                        stop = position + block.shape[0]
+                        value.data[position:stop] = block.data
+                        value.mask[position:stop] = np.ma.getmaskarray(block)
+                        position = stop
+            finally:
+                plan.restore_chunk_cache()
+        ocgis_lh('numpy data pulled','nc.dataset',level=logging.DEBUG)
+        
+        ref_geom_mask = self.spatial.vector.mask
+        if ref_geom_mask is not None:
+            ## update each time and level field mask by the geometry operation
+            ## mask.
+            shp_value = value.shape
+            ref_value_mask = value.mask
+            ref_logical_or = np.logical_or
+            for idx_time,idx_level in itertools.product(range(shp_value[0]),range(shp_value[1])):
+                ref_value_mask[idx_time,idx_level,:,:] = ref_logical_or(ref_value_mask[idx_time,idx_level,:,:],ref_geom_mask)
+        
+        assert(value.shape[0] == time_real_idx.shape[0])
+        assert(value.shape[2:] == self.spatial.grid.shape)
+        try:
+            assert(value.shape[1] == self.level.value.shape[0])
+        ## might be a dummy level
+        except AttributeError:
+            if self.level is None:
+                pass
+            else:
+                raise
+        
+        return(value)
+    
     def _get_numpy_data_(self,variable,time_start,time_stop,row_start,row_stop,
                          column_start,column_stop,level_start=None,level_stop=None,
                          return_time_indices=False):
@@ -471,11 +619,28 @@ class NcDataset(base.AbstractDataset):
             ret = npd
         return(ret)
             
+    @nc_locked
+    def _get_variable_(self,name):
+        '''
+        Return the netCDF variable `name`. Variables of multi-file datasets are
+        aggregated along the time dimension. If :attr:`ocgis.env.USE_MEMMAP`
+        is True, variables of classic format files are read through memory maps.
+        '''
+        ret = self._ds.variables[name]
+        if self._is_multifile:
+            ret = MFVariable(self._dim_map['T']['variable']._index,ret)
+        elif ocgis.env.USE_MEMMAP:
+            mm = get_memmap_variable(self.request_dataset.uri,ret)
+            if mm is not None:
+                ret = mm
+        return(ret)
+    
     def _guess_by_location_(self,dims,target):
         mp = {3:{0:'T',1:'Y',2:'X'},
               4:{0:'T',2:'Y',3:'X',1:'Z'}}
         return(mp[len(dims)][dims.index(target)])
     
+    @nc_locked
     def _load_axis_(self,kls):
         ref = self._dim_map[kls.axis]
         try:
@@ -505,6 +670,31 @@ class NcDataset(base.AbstractDataset):
                   dataset=self)
         return(ret)
     
+    def _reset_handle_(self):
+        '''Drop the netCDF handle and dimension map without closing the handle.
+        Used by child processes which inherit the handle of their parent.'''
+        self.__ds = None
+        self.__dim_map = None
+    
+    @staticmethod
+    def _get_time_runs_(real_idx):
+        '''
+        Coalesce time indices into contiguous runs.
+        
+        >>> NcDataset._get_time_runs_(np.array([0,1,2,5,6,9]))
+        [(0, 3), (5, 7), (9, 10)]
+        
+        :param real_idx: Increasing indices into the source time dimension.
+        :type real_idx: numpy.ndarray
+        :returns: Sequence of (start,stop) tuples.
+        :rtype: list
+        '''
+        breaks = np.flatnonzero(np.diff(real_idx) != 1) + 1
+        starts = np.concatenate(([0],breaks))
+        stops = np.concatenate((breaks,[real_idx.shape[0]]))
+        ret = [(int(real_idx[start]),int(real_idx[stop-1])+1) for start,stop in zip(starts,stops)]
+        return(ret)
+    
     @staticmethod
     def _sub_range_(arr):
         try:
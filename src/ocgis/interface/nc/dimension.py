@@ -1,21 +1,25 @@
 from ocgis.interface import base
 import numpy as np
-from ocgis.util.spatial import index as si
-from itertools import product
-from ocgis.util.helpers import make_poly, iter_array
-from shapely import prepared
+from ocgis.util.spatial.grid import classify_cells, get_coverage_fractions, OUTSIDE, BOUNDARY
+from shapely.geometry import box
+from shapely.ops import cascaded_union
+from ocgis.util.spatial.index import GeometryIndex
+from ocgis.util.spatial.geometry_array import PolygonArray, PointArray, ClippedPolygonArray
+from ocgis.util.spatial.area import get_cell_areas
+from ocgis.util.helpers import iter_array
 import netCDF4 as nc
 from ocgis.exc import DummyDimensionEncountered, EmptyData,\
     TemporalResolutionError
 import datetime
-from ocgis.interface.projection import get_projection, RotatedPole
-from shapely.geometry.point import Point
+from ocgis.interface.projection import get_projection, RotatedPole, WGS84
+from ocgis.interface.nc.pool import nc_lock
 from ocgis.util.spatial.wrap import Wrapper
 from copy import copy
 from ocgis import constants
 from ocgis.util.logging_ocgis import ocgis_lh
 import logging
 from ocgis import env
+from ocgis.util import dates
 
 
 class NcDimension(object):
@@ -71,6 +75,8 @@ class NcTemporalDimension(NcDimension,base.AbstractTemporalDimension):
         assert(self.dataset is not None)
         self._value_datetime = None
         self._bounds_datetime = None
+        self._value_date_parts = None
+        self._bounds_date_parts = None
     
     @property
     def extent(self):
@@ -83,43 +89,53 @@ class NcTemporalDimension(NcDimension,base.AbstractTemporalDimension):
     @property
     def value_datetime(self):
         if self._value_datetime is None:
-            if self._get_optimized_('_value_datetime') is False:
+            entry = self._get_cache_entry_()
+            if 'value_datetime' not in entry:
                 ocgis_lh('getting value_datetime','nc.dimension',logging.DEBUG)
-                self._value_datetime = np.atleast_1d(self.get_datetime(self.value))
+                entry['value_datetime'] = np.atleast_1d(self.get_datetime(self.value))
+            self._value_datetime = entry['value_datetime']
         return(self._value_datetime)
     
+    @property
+    def value_date_parts(self):
+        if self._value_date_parts is None:
+            entry = self._get_cache_entry_()
+            if 'value_date_parts' not in entry:
+                entry['value_date_parts'] = self.get_date_parts(self.value)
+            self._value_date_parts = entry['value_date_parts']
+        return(self._value_date_parts)
+    
+    @property
+    def bounds_date_parts(self):
+        if self.bounds is not None and self._bounds_date_parts is None:
+            entry = self._get_cache_entry_()
+            if 'bounds_date_parts' not in entry:
+                entry['bounds_date_parts'] = self.get_date_parts(self.bounds)
+            self._bounds_date_parts = entry['bounds_date_parts']
+        return(self._bounds_date_parts)
+    
     @property
     def bounds_datetime(self):
         if self.bounds is None:
             pass
         else:
             if self._bounds_datetime is None:
-                if self._get_optimized_('_bounds_datetime') is False:
-                    self._bounds_datetime = np.atleast_2d(self.get_datetime(self.bounds))
+                entry = self._get_cache_entry_()
+                if 'bounds_datetime' not in entry:
+                    entry['bounds_datetime'] = np.atleast_2d(self.get_datetime(self.bounds))
+                self._bounds_datetime = entry['bounds_datetime']
         return(self._bounds_datetime)
     
-    def _get_optimized_(self,attr):
-        if env.OPTIMIZE_FOR_CALC:
-            setattr(self,attr,env._optimize_store[self.dataset.request_dataset.alias][attr])
-            ret = True
-        else:
-            ret = False
-        return(ret)
+    def _get_cache_key_(self):
+        ## values are only comparable with the same units and calendar
+        return(super(self.__class__,self)._get_cache_key_() + (self.units,self.calendar))
     
     @property
     def resolution(self):
         ## resolution cannot be calculated from a single value
         if self.value.shape[0] == 1:
             raise(TemporalResolutionError)
-        datetimes = []
-        for ii in range(constants.resolution_limit):
-            try:
-                datetimes.append(self.get_datetime(self.value[ii])[0])
-            except IndexError:
-                if ii == self.value.shape[0]:
-                    break
-                else:
-                    raise
+        datetimes = self.get_datetime(self.value[0:constants.resolution_limit])
         ret = np.mean([dt.days for dt in np.diff(datetimes).flat])
         return(ret)
     
@@ -130,7 +146,29 @@ class NcTemporalDimension(NcDimension,base.AbstractTemporalDimension):
         ret.name_bounds = self.name_bounds
         return(ret)
     
+    def get_date_parts(self,arr):
+        '''
+        :returns: Integer date parts of the time values `arr` as returned by
+         :func:`ocgis.util.dates.decode`.
+        :rtype: numpy.ndarray
+        '''
+        arr = np.atleast_1d(np.ma.getdata(arr))
+        try:
+            ret = dates.decode(arr,self.units,calendar=self.calendar)
+        ## calendars and units not handled by the vectorized decoder
+        except NotImplementedError:
+            ret = dates.get_parts(self._num2date_(arr))
+        return(ret)
+    
     def get_datetime(self,arr):
+        arr = np.atleast_1d(np.ma.getdata(arr))
+        try:
+            ret = dates.get_datetime(dates.decode(arr,self.units,calendar=self.calendar))
+        except NotImplementedError:
+            ret = self._num2date_(arr)
+        return(ret)
+    
+    def _num2date_(self,arr):
         arr = np.atleast_1d(nc.num2date(arr,self.units,calendar=self.calendar))
         dt = datetime.datetime
         for idx,t in iter_array(arr,return_value=True):
@@ -158,47 +196,20 @@ class NcTemporalDimension(NcDimension,base.AbstractTemporalDimension):
         except:
             regions = args[0]
             assert(isinstance(regions,dict))
-            value = self.value_datetime
-            bounds = self.bounds_datetime
             
             if regions['month'] is None and regions['year'] is None:
                 ret = self
             else:
-                if bounds is None:
+                if self.bounds is None:
                     ## get years and months from dates
-                    parts = np.array([[dt.year,dt.month] for dt in value],dtype=int)
-                    ## get matching months
+                    parts = self.value_date_parts
+                    select = np.ones(parts.shape[0],dtype=bool)
                     if regions['month'] is not None:
-                        idx_months = np.zeros(parts.shape[0],dtype=bool)
-                        for month in regions['month']:
-                            idx_months = np.logical_or(idx_months,parts[:,1] == month)
-                    ## potentially return all months if none are in the region
-                    ## dictionary.
-                    else:
-                        idx_months = np.ones(parts.shape[0],dtype=bool)
-                    ## get matching years
+                        select &= np.in1d(parts[:,1],regions['month'])
                     if regions['year'] is not None:
-                        idx_years = np.zeros(parts.shape[0],dtype=bool)
-                        for year in regions['year']:
-                            idx_years = np.logical_or(idx_years,parts[:,0] == year)
-                    ## potentially return all years.
-                    else:
-                        idx_years = np.ones(parts.shape[0],dtype=bool)
-                    ## combine the index arrays
-                    idx_dates = np.logical_and(idx_months,idx_years)
-                    ret = self[idx_dates]
+                        select &= np.in1d(parts[:,0],regions['year'])
+                    ret = self[select]
                 else:
-                    
-                    def _get_parts_(start,end,day_step=29.5):
-                        parts_months = set()
-                        parts_years = set()
-                        delta = datetime.timedelta(days=day_step)
-                        while start < end:
-                            parts_months.update([start.month])
-                            parts_years.update([start.year])
-                            start += delta
-                        return(parts_months,parts_years)
-                    
                     ## get the temporal resolution
                     try:
                         res = self.resolution
@@ -209,42 +220,45 @@ class NcTemporalDimension(NcDimension,base.AbstractTemporalDimension):
                     except TemporalResolutionError:
                         res = 'day'
                     
-                    ## assemble ranges from the bounds
-                    select_years = np.zeros(bounds.shape[0],dtype=bool)
-                    select_months = np.zeros(bounds.shape[0],dtype=bool)
-                    if res == 'day':
-                        for ii in range(bounds.shape[0]):
-                            row = bounds[ii]
-                            p_months,p_years = _get_parts_(row[0],row[1])
-                            if regions['month'] is not None:
-                                if any([month in p_months for month in regions['month']]):
-                                    select_months[ii] = True
-                            else:
-                                select_months[:] = True
-                            if regions['year'] is not None:
-                                if any([year in p_years for year in regions['year']]):
-                                    select_years[ii] = True
-                            else:
-                                select_years[:] = True
-                    elif res == 'month':
-                        if regions['month'] is None:
-                            select_months[:] = True
-                        else:
-                            for ii in range(value.shape[0]):
-                                if value[ii].month in regions['month']:
-                                    select_months[ii] = True
-                        if regions['year'] is None:
-                            select_years[:] = True
+                    lower,upper = self._get_month_span_()
+                    select = np.ones(lower.shape[0],dtype=bool)
+                    if regions['month'] is not None:
+                        ## monthly bounds commonly overlap the neighboring
+                        ## months. use the month of the value instead.
+                        if res == 'month':
+                            select &= np.in1d(self.value_date_parts[:,1],regions['month'])
                         else:
-                            for ii in range(self.bounds.shape[0]):
-                                row = bounds[ii]
-                                p_months,p_years = _get_parts_(row[0],row[1])
-                                if any([year in p_years for year in regions['year']]):
-                                    select_years[ii] = True
-                    select = np.logical_and(select_years,select_months)
+                            ## months are counted from the month of the lower
+                            ## bound. a month is touched if its offset is within
+                            ## the number of months spanned by the bounds.
+                            months = np.array(regions['month']).reshape(1,-1)
+                            offsets = (months - 1 - (lower % 12).reshape(-1,1)) % 12
+                            select &= np.any(offsets <= (upper - lower).reshape(-1,1),axis=1)
+                    if regions['year'] is not None:
+                        years = np.array(regions['year']).reshape(1,-1)
+                        select &= np.any(np.logical_and(years >= (lower // 12).reshape(-1,1),
+                                                        years <= (upper // 12).reshape(-1,1)),
+                                         axis=1)
                     ret = self[select]
         return(ret)
     
+    def _get_month_span_(self):
+        '''
+        :returns: Two integer arrays with the first and last months touched by
+         each time interval of the bounds. Months are counted as
+         `year*12 + month - 1`. Intervals are half-open so an upper bound at
+         midnight of the first day of a month does not touch that month.
+        :rtype: tuple of numpy.ndarray
+        '''
+        bounds = np.ma.getdata(self.bounds)
+        parts = self.get_date_parts(np.column_stack((bounds.min(axis=1),bounds.max(axis=1))))
+        months = parts[:,:,0]*12 + parts[:,:,1] - 1
+        lower = months[:,0]
+        upper = months[:,1]
+        at_month_start = np.logical_and(parts[:,1,2] == 1,np.all(parts[:,1,3:] == 0,axis=1))
+        upper = np.where(np.logical_and(at_month_start,upper > lower),upper - 1,upper)
+        return(lower,upper)
+    
     @classmethod
     def _set_after_load_(cls,state,dataset):
         attrs = dataset.metadata['variables'][state.name]['attrs']
@@ -266,9 +280,11 @@ class NcSpatialDimension(base.AbstractSpatialDimension):
             self.grid = grid
         if vector is None:
             if self.abstraction == 'point' or self.grid.row.bounds is None:
-                self.vector = NcPointDimension(grid=self.grid,uid=self.grid.uid)
+                self.vector = NcPointDimension(grid=self.grid,uid=self.grid.uid,
+                                               projection=self.projection)
             else:
-                self.vector = NcPolygonDimension(grid=self.grid,uid=self.grid.uid)
+                self.vector = NcPolygonDimension(grid=self.grid,uid=self.grid.uid,
+                                                 projection=self.projection)
         else:
             self.vector = vector
             
@@ -328,55 +344,17 @@ class NcSpatialDimension(base.AbstractSpatialDimension):
             
             ## check for overloaded projections
             if gi._s_proj is None:
-                projection = get_projection(gi._ds)
+                with nc_lock:
+                    projection = get_projection(gi._header)
             else:
                 projection = gi._s_proj
             
             if isinstance(projection,RotatedPole):
-                import csv
-                import itertools
-                import subprocess
-                import tempfile
-                class ProjDialect(csv.excel):
-                    lineterminator = '\n'
-                    delimiter = '\t'
-                f = tempfile.NamedTemporaryFile()
-                writer = csv.writer(f,dialect=ProjDialect)
-                _row = row.value
-                _col = column.value
-                real_idx = []
                 shp = (row.shape[0],column.shape[0])
                 uid = np.arange(1,(shp[0]*shp[1])+1,dtype=int).reshape(*shp)
                 uid = np.ma.array(data=uid,mask=False)
-                for row_idx,col_idx in itertools.product(range(row.value.shape[0]),range(column.value.shape[0])):
-                    real_idx.append([col_idx,row_idx])
-                    writer.writerow([_col[col_idx],_row[row_idx]])
-                f.flush()
-                cmd = projection._trans_proj.split(' ')
-                cmd.append(f.name)
-                cmd = ['proj','-f','"%.6f"','-m','57.2957795130823'] + cmd
-                capture = subprocess.check_output(cmd)
-                f.close()
-                coords = capture.split('\n')
-                new_coords = []
-                for ii,coord in enumerate(coords):
-                    coord = coord.replace('"','')
-                    coord = coord.split('\t')
-                    try:
-                        coord = map(float,coord)
-                    ## likely empty string
-                    except ValueError:
-                        if coord[0] == '':
-                            continue
-                        else:
-                            raise
-                    new_coords.append(coord)
-                new_coords = np.array(new_coords)
-                real_idx = np.array(real_idx)
-                new_row = new_coords[:,1].reshape(*shp)
-                new_col = new_coords[:,0].reshape(*shp)
-                new_real_row_idx = real_idx[:,1].reshape(*shp)
-                new_real_column_idx = real_idx[:,0].reshape(*shp)
+                new_row,new_col = projection.get_geographic_grid(row.value,column.value)
+                new_real_row_idx,new_real_column_idx = np.indices(shp)
                 
                 grid = NcGridMatrixDimension(new_row,new_col,new_real_row_idx,new_real_column_idx,uid)
                 ret = cls(grid=grid,projection=projection,abstraction='point')
@@ -445,17 +423,18 @@ class NcGridDimension(base.AbstractSpatialGrid):
     def subset(self,polygon=None):
         if polygon is not None:
             minx,miny,maxx,maxy = polygon.bounds
-            row = self.row.subset(miny,maxy)
-            column = self.column.subset(minx,maxx)
-            try:
+            row_idx = self.row._get_subset_index_(miny,maxy)
+            column_idx = self.column._get_subset_index_(minx,maxx)
+            row = self.row._get_subset_(row_idx)
+            column = self.column._get_subset_(column_idx)
+            if len(row.value) == 0 or len(column.value) == 0:
+                raise(EmptyData)
+            ## monotonic coordinates select a window of the grid directly
+            if isinstance(row_idx,slice) and isinstance(column_idx,slice):
+                uid = self.uid[row_idx,column_idx]
+            else:
                 uid = self.uid[row.real_idx.min():row.real_idx.max()+1,
                                column.real_idx.min():column.real_idx.max()+1]
-            ## likely empty row or column data
-            except ValueError:
-                if len(row.value) == 0 or len(column.value) == 0:
-                    raise(EmptyData)
-                else:
-                    raise
             ret = self.__class__(row=row,column=column,uid=uid)
         else:
             ret = self
@@ -527,11 +506,14 @@ class NcGridMatrixDimension(base.AbstractSpatialGrid):
 
 class NcPolygonDimension(base.AbstractPolygonDimension):
     
-    def __init__(self,grid=None,geom=None,uid=None):
+    def __init__(self,grid=None,geom=None,uid=None,mask=None,fractions=None,projection=None):
         self._geom = geom
+        self._mask = mask
+        self._fractions = fractions
         self._weights = None
         self.grid = grid
         self.uid = uid
+        self.projection = projection
         
     @property
     def extent(self):
@@ -541,66 +523,86 @@ class NcPolygonDimension(base.AbstractPolygonDimension):
     def weights(self):
         if self._weights is None:
             geom = self.geom
-            weights = np.ones(geom.shape,dtype=float)
-            weights = np.ma.array(weights,mask=geom.mask)
-            for ii,jj in iter_array(geom):
-                weights[ii,jj] = geom[ii,jj].area
+            if isinstance(geom,PolygonArray):
+                row = geom.row_bounds
+                column = geom.column_bounds
+                weights = get_cell_areas(row,column,spherical=self._is_spherical_).copy()
+                ## clipped cells are weighted by the fraction of the cell covered
+                if self._fractions is not None:
+                    weights *= self._fractions
+                weights = np.ma.array(weights,mask=geom.mask.copy())
+            ## geometries replaced by an aggregation
+            else:
+                weights = np.ones(geom.shape,dtype=float)
+                weights = np.ma.array(weights,mask=geom.mask)
+                for ii,jj in iter_array(geom):
+                    weights[ii,jj] = geom[ii,jj].area
             weights = weights/weights.max()
             self._weights = weights
         return(self._weights)
     
     def clip(self,polygon):
-        ## perform an intersects operation first
-        vd = self.intersects(polygon)
-        ## prepare the geometry for intersection
-        prep_igeom = prepared.prep(polygon)
+        index = GeometryIndex(polygon)
+        grid,classes = self._classify_(polygon,index)
+        row = grid.row.bounds
+        column = grid.column.bounds
+        mask = classes == OUTSIDE
+        boundary = classes == BOUNDARY
         
-        ## loop for the intersection
-        geom = vd._geom
-        for ii,jj in iter_array(geom):
-            ref = geom[ii,jj]
-            if not prep_igeom.contains(ref):
-                new_geom = polygon.intersection(ref)
-                geom[ii,jj] = new_geom
+        ## clipped geometries are only created if requested. weights use the
+        ## covered fraction of the cells crossed by the polygon boundary.
+        geom = ClippedPolygonArray(row,column,index,boundary,mask=mask)
+        fractions = np.logical_not(mask).astype(float)
+        fractions[boundary] = get_coverage_fractions(polygon,row,column)[boundary]
         
-        ret = self.__class__(grid=vd.grid,geom=geom,uid=vd.uid)
+        ret = self.__class__(grid=grid,geom=geom,uid=grid.uid,fractions=fractions,
+                             projection=self.projection)
         return(ret)
     
     def get_iter(self):
         raise(NotImplementedError)
     
+    def get_union(self):
+        '''
+        :returns: The union of the unmasked geometries. Runs of adjacent cells
+         along each row are merged before the union, and clipped cells are
+         intersected with the selection geometry once after it.
+        :rtype: :class:`shapely.geometry.base.BaseGeometry`
+        '''
+        geom = self.geom
+        row = geom.row_bounds
+        column = geom.column_bounds
+        clower = column.min(axis=1)
+        cupper = column.max(axis=1)
+        select = np.logical_not(geom.mask)
+        ## runs start at a selected cell not adjacent to a selected cell on its
+        ## left and end likewise on the right
+        adjacent = np.logical_or(cupper[:-1] == clower[1:],clower[:-1] == cupper[1:])
+        joined = np.zeros(select.shape,dtype=bool)
+        joined[:,1:] = np.logical_and(np.logical_and(select[:,1:],select[:,:-1]),adjacent)
+        start = np.logical_and(select,np.logical_not(joined))
+        end = np.zeros(select.shape,dtype=bool)
+        end[:,:-1] = np.logical_and(select[:,:-1],np.logical_not(joined[:,1:]))
+        end[:,-1] = select[:,-1]
+        boxes = []
+        for (ii,js),je in zip(zip(*np.nonzero(start)),np.nonzero(end)[1]):
+            boxes.append(box(min(clower[js],clower[je]),row[ii].min(),
+                             max(cupper[js],cupper[je]),row[ii].max()))
+        ret = cascaded_union(boxes)
+        if isinstance(geom,ClippedPolygonArray):
+            ret = geom.index.geom.intersection(ret)
+        return(ret)
+    
     def intersects(self,polygon):
         ## reset the values to ensure mask is properly applied
         self._value = None
         ## reset the weights
         self._weights = None
-        ## do the initial grid subset
-        grid = self.grid.subset(polygon=polygon)
-        
-        ## construct the spatial index
-        index_grid = si.build_index_grid(30.0,polygon)
-        index = si.build_index(polygon,index_grid)
-        
-        ## the fill arrays
-        geom = np.ones(grid.shape,dtype=object)
-        geom = np.ma.array(geom,mask=True)
-        
-        ## loop performing the spatial operation
-        row = grid.row.bounds
-        col = grid.column.bounds
-        index_intersects = si.index_intersects
-        geom_mask = geom.mask
-        for ii,jj in product(range(row.shape[0]),range(col.shape[0])):
-            rref = row[ii,:]
-            cref = col[jj,:]
-            test_geom = make_poly(rref,cref)
-            geom[ii,jj] = test_geom
-            if index_intersects(test_geom,index):
-                geom_mask[ii,jj] = False
-            else:
-                geom_mask[ii,jj] = True
-
-        ret = self.__class__(grid=grid,geom=geom,uid=grid.uid)
+        ## cell geometries are only created if requested. the selection is
+        ## carried by the mask.
+        grid,classes = self._classify_(polygon)
+        ret = self.__class__(grid=grid,uid=grid.uid,mask=classes == OUTSIDE,
+                             projection=self.projection)
         return(ret)
     
     def unwrap(self):
@@ -612,19 +614,25 @@ class NcPolygonDimension(base.AbstractPolygonDimension):
         for (ii,jj),to_wrap in iter_array(geom,return_value=True):
             geom[ii,jj] = wrap(to_wrap)
     
+    @property
+    def _is_spherical_(self):
+        ## spherical areas are only meaningful for latitude and longitude bounds.
+        ## projected grids are weighted by their planar areas.
+        ret = env.SPHERICAL_WEIGHTS
+        if ret and type(self.projection) != WGS84:
+            ocgis_lh('spherical weights require a WGS84 grid, using planar weights',
+                     'nc.dimension',level=logging.WARNING)
+            ret = False
+        return(ret)
+    
     def _get_all_geoms_(self):
-        ## the fill arrays
-        geom = np.ones(self.grid.shape,dtype=object)
-        geom = np.ma.array(geom,mask=False)
-        ## loop performing the spatial operation
-        row = self.grid.row.bounds
-        col = self.grid.column.bounds
-        for ii,jj in product(range(row.shape[0]),range(col.shape[0])):
-            rref = row[ii,:]
-            cref = col[jj,:]
-            geom[ii,jj] = make_poly(rref,cref)
-        
-        return(geom)
+        return(PolygonArray(self.grid.row.bounds,self.grid.column.bounds))
+    
+    def _classify_(self,polygon,index=None):
+        ## do the initial grid subset
+        grid = self.grid.subset(polygon=polygon)
+        classes = classify_cells(polygon,grid.row.bounds,grid.column.bounds,index=index)
+        return(grid,classes)
     
     
 class NcPointDimension(NcPolygonDimension):
@@ -643,53 +651,25 @@ class NcPointDimension(NcPolygonDimension):
     def intersects(self,polygon):
         ## do the initial grid subset
         grid = self.grid.subset(polygon=polygon)
-        ## a prepared polygon
-        prep_polygon = prepared.prep(polygon)
-        ## the fill arrays
-        geom = np.ones(grid.shape,dtype=object)
-        geom = np.ma.array(geom,mask=True)
-        geom_mask = geom.mask
         
         try:
-            row = grid.row.value
-            col = grid.column.value
-            for ii,jj in product(range(row.shape[0]),range(col.shape[0])):
-                pt = Point(col[jj],row[ii])
-                geom[ii,jj] = pt
-                if prep_polygon.intersects(pt):
-                    geom_mask[ii,jj] = False
-                else:
-                    geom_mask[ii,jj] = True
+            col,row = np.meshgrid(grid.column.value,grid.row.value)
         ## NcGridMatrixDimension correction
         except AttributeError:
-            _row = grid.row
-            _col = grid.column
-            for ii,jj in iter_array(_row):
-                pt = Point(_col[ii,jj],_row[ii,jj])
-                geom[ii,jj] = pt
-                if prep_polygon.intersects(pt):
-                    geom_mask[ii,jj] = False
-                else:
-                    geom_mask[ii,jj] = True
+            row = grid.row
+            col = grid.column
+        index = GeometryIndex(polygon)
+        select = index.intersects_points(col,row).reshape(grid.shape)
             
-        ret = self.__class__(grid=grid,geom=geom,uid=grid.uid)
+        ret = self.__class__(grid=grid,uid=grid.uid,mask=np.logical_not(select),
+                             projection=self.projection)
 
         return(ret)
 
     def _get_all_geoms_(self):
-        ## the fill arrays
-        geom = np.ones(self.grid.shape,dtype=object)
-        geom = np.ma.array(geom,mask=False)
-        ## loop performing the spatial operation
         try:
-            row = self.grid.row.value
-            col = self.grid.column.value
-            for ii,jj in product(range(row.shape[0]),range(col.shape[0])):
-                geom[ii,jj] = Point(col[jj],row[ii])
+            ret = PointArray.from_vectors(self.grid.row.value,self.grid.column.value)
         ## NcGridMatrixDimension correction
         except AttributeError:
-            _row = self.grid.row
-            _col = self.grid.column
-            for ii,jj in iter_array(_row):
-                geom[ii,jj] = Point(_col[ii,jj],_row[ii,jj])
-        return(geom)
\ No newline at end of file
+            ret = PointArray(self.grid.column,self.grid.row)
+        return(ret)
\ No newline at end of file
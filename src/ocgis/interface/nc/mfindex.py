@@ -0,0 +1,214 @@
+import os
+import netCDF4 as nc
+import numpy as np
+from ocgis.util.logging_ocgis import ocgis_lh
+from ocgis.interface.nc.pool import pool, nc_lock, nc_locked
+from ocgis.interface.nc.cache import cache as nc_cache
+from ocgis.util.cache import mfindex_cache
+import logging
+
+
+class MFTimeIndex(object):
+    '''
+    Maps the global time indices of a dataset split across multiple files to
+    `(file,local index)` pairs. Only the length and coordinate values of the
+    time dimension are read from each file when the index is built.
+    
+    >>> index = MFTimeIndex.get(['/path/to/tas_2001.nc','/path/to/tas_2002.nc'],'time','time')
+    >>> list(index.iter_files(360,370))
+    [('/path/to/tas_2001.nc', 360, 365), ('/path/to/tas_2002.nc', 0, 5)]
+    
+    :param uris: File paths or URLs ordered along the time dimension.
+    :type uris: sequence of str
+    :param dimension: Name of the time dimension shared by the files.
+    :type dimension: str
+    :param variable: Name of the time coordinate variable.
+    :type variable: str
+    :param bounds: Name of the time bounds variable.
+    :type bounds: str
+    '''
+    
+    @nc_locked
+    def __init__(self,uris,dimension,variable=None,bounds=None):
+        self.uris = list(uris)
+        self.dimension = dimension
+        
+        sizes = []
+        values = []
+        bounds_values = []
+        for uri in self.uris:
+            ds = nc.Dataset(uri,'r')
+            try:
+                sizes.append(len(ds.dimensions[dimension]))
+                if variable is not None:
+                    values.append(np.atleast_1d(ds.variables[variable][:]))
+                if bounds is not None:
+                    bounds_values.append(ds.variables[bounds][:])
+            finally:
+                ds.close()
+        
+        ## offsets[ii] is the global index of the first time step in file ii
+        self.offsets = np.concatenate(([0],np.cumsum(sizes))).astype(int)
+        self.value = np.concatenate(values) if variable is not None else None
+        self.bounds = np.concatenate(bounds_values) if bounds is not None else None
+    
+    def __len__(self):
+        return(int(self.offsets[-1]))
+    
+    @classmethod
+    @nc_locked
+    def get(cls,uris,dimension,variable=None,bounds=None):
+        '''
+        Return a cached index for the files building it if necessary. Indices
+        are rebuilt if a local file is modified. Indices are held in memory by
+        :attr:`ocgis.util.cache.mfindex_cache` and, if :attr:`ocgis.env.DIR_CACHE`
+        is set and all files are local, written to the header cache directory
+        so other processes do not open the files again.
+        '''
+        mtimes = tuple([os.path.getmtime(uri) if os.path.exists(uri) else None for uri in uris])
+        key = (tuple(uris),dimension,variable,bounds,mtimes)
+        ret = mfindex_cache.get(key)
+        if ret is None:
+            path = nc_cache.get_path(uris,dimension,variable,bounds)
+            if path is not None:
+                ret = cls._read_(path,uris,dimension)
+            if ret is None:
+                ocgis_lh('building time index for {0} files'.format(len(uris)),
+                         'nc.mfindex',level=logging.DEBUG)
+                ret = cls(uris,dimension,variable=variable,bounds=bounds)
+                if path is not None:
+                    nc_cache.misses += 1
+                    ret._write_(path)
+            mfindex_cache[key] = ret
+        return(ret)
+    
+    def get_local_index(self,idx):
+        '''
+        :param idx: Global time indices.
+        :type idx: int or numpy.ndarray
+        :returns: Tuple of file indices and local time indices.
+        '''
+        file_idx = np.searchsorted(self.offsets,idx,side='right') - 1
+        return(file_idx,idx - self.offsets[file_idx])
+    
+    def iter_files(self,start,stop):
+        '''
+        Yield the files overlapping the global time range `[start,stop)`.
+        
+        :rtype: tuple (uri,local start,local stop)
+        '''
+        first = max(int(np.searchsorted(self.offsets,start,side='right')) - 1,0)
+        for file_idx in range(first,len(self.uris)):
+            lower,upper = self.offsets[file_idx],self.offsets[file_idx+1]
+            if lower >= stop:
+                break
+            if upper <= start:
+                continue
+            yield(self.uris[file_idx],int(max(start,lower)-lower),int(min(stop,upper)-lower))
+    
+    @classmethod
+    def _read_(cls,path,uris,dimension):
+        '''
+        :returns: The index stored in the cache entry at `path` or None if the
+         entry is missing or unreadable.
+        '''
+        try:
+            _,arrays = nc_cache.load(path)
+        except IOError:
+            return(None)
+        except Exception as e:
+            ocgis_lh('unreadable time index cache entry ({0}), rebuilding'.format(e),
+                     'nc.mfindex',level=logging.WARNING)
+            return(None)
+        nc_cache.hits += 1
+        ret = cls.__new__(cls)
+        ret.uris = list(uris)
+        ret.dimension = dimension
+        ret.offsets = arrays['offsets']
+        ret.value = arrays.get('value')
+        ret.bounds = arrays.get('bounds')
+        return(ret)
+    
+    def _write_(self,path):
+        arrays = {'offsets':self.offsets}
+        for name in ['value','bounds']:
+            if getattr(self,name) is not None:
+                arrays[name] = getattr(self,name)
+        nc_cache.save(path,arrays,{})
+
+
+class MFVariable(object):
+    '''
+    Read-only view of a netCDF variable aggregated along the time dimension
+    of a :class:`~ocgis.interface.nc.mfindex.MFTimeIndex`. The time dimension
+    must be the first dimension of the variable. Reads open only the files
+    overlapping the requested time range. Attributes are taken from the
+    variable in the first file. Other properties and methods are forwarded to
+    that variable through the file pool, so no handle is held between reads.
+    
+    :param index: The time index of the files.
+    :type index: :class:`~ocgis.interface.nc.mfindex.MFTimeIndex`
+    :param template: The variable in the first file.
+    :type template: :class:`netCDF4.Variable`
+    :param value: Values of the aggregated variable if already in memory.
+    :type value: numpy.ndarray
+    '''
+    
+    def __init__(self,index,template,value=None):
+        self._index = index
+        self._value = value
+        self._name = template._name
+        self._attrs = dict([(k,template.getncattr(k)) for k in template.ncattrs()])
+        self.dimensions = template.dimensions
+        self.dtype = template.dtype
+        self.shape = (len(index),) + tuple(template.shape[1:])
+    
+    def __getattr__(self,name):
+        ## only called for names not set on the instance
+        if name.startswith('__') or name in ('_index','_attrs','_name'):
+            raise(AttributeError(name))
+        try:
+            return(self._attrs[name])
+        except KeyError:
+            with nc_lock:
+                return(getattr(self._get_template_(),name))
+    
+    def ncattrs(self):
+        return(self._attrs.keys())
+    
+    def getncattr(self,name):
+        return(self._attrs[name])
+    
+    @nc_locked
+    def __getitem__(self,slc):
+        if self._value is not None:
+            return(self._value[slc])
+        if not isinstance(slc,tuple):
+            slc = (slc,)
+        start,stop,step = slc[0].indices(self.shape[0])
+        if step != 1:
+            raise(NotImplementedError('Strided time reads are not supported for multi-file datasets.'))
+        
+        parts = []
+        for uri,local_start,local_stop in self._index.iter_files(start,stop):
+            ocgis_lh('reading {0}[{1}:{2}]'.format(uri,local_start,local_stop),
+                     'nc.mfindex',level=logging.DEBUG)
+            ds = pool.get(uri)
+            parts.append(ds.variables[self._name][(slice(local_start,local_stop),)+slc[1:]])
+        
+        if len(parts) == 0:
+            ret = self._get_template_()[(slice(0,0),)+slc[1:]]
+        elif len(parts) == 1:
+            ret = parts[0]
+        else:
+            data = np.concatenate([np.ma.getdata(part) for part in parts],axis=0)
+            if any([isinstance(part,np.ma.MaskedArray) for part in parts]):
+                mask = np.concatenate([np.ma.getmaskarray(part) for part in parts],axis=0)
+                ret = np.ma.array(data,mask=mask)
+            else:
+                ret = data
+        return(ret)
+    
+    @nc_locked
+    def _get_template_(self):
+        return(pool.get(self._index.uris[0]).variables[self._name])
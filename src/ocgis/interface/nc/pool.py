@@ -0,0 +1,173 @@
+import os
+import threading
+import functools
+from collections import OrderedDict
+from contextlib import contextmanager
+import netCDF4 as nc
+from ocgis import env
+from ocgis.util.logging_ocgis import ocgis_lh
+import logging
+
+
+## the netCDF and HDF5 libraries are not thread-safe. calls into them (opening,
+## reading, and writing files) are serialized by this lock so a prefetch
+## thread may read while the main thread calculates.
+nc_lock = threading.RLock()
+
+
+def nc_locked(func):
+    '''Decorate `func` to hold :data:`nc_lock` while it is called.'''
+    @functools.wraps(func)
+    def _locked_(*args,**kwds):
+        with nc_lock:
+            return(func(*args,**kwds))
+    return(_locked_)
+
+
+class NcFilePool(object):
+    '''
+    Least recently used pool of read-only netCDF handles keyed by URI. A handle
+    is reopened if the modification time of its local file changes. Once the
+    number of open handles exceeds the pool size, the least recently used
+    handle is closed. Holders of a handle check it is still open before use.
+    
+    Handles are pinned for the duration of a read and are not closed by the
+    pool while pinned, so the pool may temporarily exceed its size. A pinned
+    handle replaced because its file changed is closed once the read finishes.
+    
+    >>> ds = pool.get('/path/to/tas.nc')
+    >>> with pool.pinned(ds):
+    ...     value = ds.variables['tas'][:]
+    
+    :param maxsize: Maximum number of open handles. Defaults to :attr:`ocgis.env.MAX_OPEN_FILES`.
+    :type maxsize: int
+    '''
+    
+    def __init__(self,maxsize=None):
+        self.maxsize = maxsize
+        ## maps uri to (handle,modification time) tuples in order of use
+        self._handles = OrderedDict()
+        ## number of reads in progress by handle identifier
+        self._pins = {}
+        ## pinned handles replaced by a newer handle of their file
+        self._retired = {}
+        ## handles may be requested by prefetch threads
+        self._lock = nc_lock
+    
+    def __contains__(self,uri):
+        return(uri in self._handles)
+    
+    def __len__(self):
+        return(len(self._handles))
+    
+    def clear(self,close=True):
+        '''
+        Remove all handles from the pool.
+        
+        :param close: If False, handles are dropped without closing. Used by
+         child processes which inherit the handles of their parent.
+        :type close: bool
+        '''
+        with self._lock:
+            handles = self._handles.items() + self._retired.values()
+            self._handles = OrderedDict()
+            self._pins = {}
+            self._retired = {}
+            if close:
+                for uri,handle in handles:
+                    self._close_(uri,handle[0])
+    
+    def get(self,uri):
+        '''
+        :param uri: Path or URL of the netCDF file.
+        :type uri: str
+        :rtype: :class:`netCDF4.Dataset`
+        '''
+        mtime = self._get_mtime_(uri)
+        with self._lock:
+            try:
+                ds,ds_mtime = self._handles.pop(uri)
+                if ds_mtime != mtime:
+                    ocgis_lh('file modified, reopening: {0}'.format(uri),'nc.pool',
+                             level=logging.DEBUG)
+                    ## pinned handles are closed when their reads finish
+                    if id(ds) in self._pins:
+                        self._retired[id(ds)] = (uri,(ds,ds_mtime))
+                    else:
+                        self._close_(uri,ds)
+                    ds = None
+            except KeyError:
+                ds = None
+            if ds is None:
+                ds = nc.Dataset(uri,'r')
+            self._handles[uri] = (ds,mtime)
+            
+            ## close the least recently used unpinned handles other than the
+            ## requested handle
+            maxsize = self.maxsize or env.MAX_OPEN_FILES
+            excess = len(self._handles) - maxsize
+            for old_uri in self._handles.keys()[:-1]:
+                if excess <= 0:
+                    break
+                old_ds = self._handles[old_uri][0]
+                if id(old_ds) not in self._pins:
+                    del self._handles[old_uri]
+                    self._close_(old_uri,old_ds)
+                    excess -= 1
+        return(ds)
+    
+    def is_pinned(self,uri):
+        '''
+        :returns: True if a read of the pooled handle of `uri` is in progress.
+        :rtype: bool
+        '''
+        with self._lock:
+            try:
+                ret = id(self._handles[uri][0]) in self._pins
+            except KeyError:
+                ret = False
+        return(ret)
+    
+    @contextmanager
+    def pinned(self,ds):
+        '''
+        Keep the handle `ds` open while the context is entered.
+        
+        :type ds: :class:`netCDF4.Dataset`
+        '''
+        key = id(ds)
+        with self._lock:
+            self._pins[key] = self._pins.get(key,0) + 1
+        try:
+            yield(ds)
+        finally:
+            with self._lock:
+                ## the pool may have been cleared during the read
+                count = self._pins.pop(key,1) - 1
+                if count > 0:
+                    self._pins[key] = count
+                elif key in self._retired:
+                    uri,(ds,_) = self._retired.pop(key)
+                    self._close_(uri,ds)
+    
+    @staticmethod
+    def _close_(uri,ds):
+        ocgis_lh('closing: {0}'.format(uri),'nc.pool',level=logging.DEBUG)
+        try:
+            ds.close()
+        ## the handle may already be closed
+        except RuntimeError:
+            pass
+    
+    @staticmethod
+    def _get_mtime_(uri):
+        try:
+            ret = os.path.getmtime(uri)
+        ## remote data has no modification time
+        except OSError:
+            ret = None
+        return(ret)
+
+
+## the handle pool shared by all datasets in the process
+pool = NcFilePool()
@@ -4,6 +4,8 @@ from osgeo.ogr import CreateGeometryFromWkb
 from shapely.geometry.point import Point
 import abc
 from ocgis.util.logging_ocgis import ocgis_lh
+from ocgis.util.cache import projection_cache, get_array_digest
+import numpy as np
 import logging
 
 
@@ -28,6 +30,12 @@ def get_projection(dataset):
     else:
         raise(MultipleProjectionsFound)
     return(ret)
+
+def _adjlon_(lon):
+    ## wrap longitudes in radians to [-pi,pi] as with proj's adjlon
+    lon = np.asarray(lon,dtype=float)
+    wrapped = lon - 2*np.pi*np.floor((lon + np.pi)/(2*np.pi))
+    return(np.where(np.abs(lon) <= np.pi,lon,wrapped))
     
 
 class NoProjectionFound(Exception):
@@ -308,6 +316,60 @@ class RotatedPole(DatasetSpatialReference):
             self._proj4_str = WGS84().sr.ExportToProj4()
         return(self._proj4_str)
     
+    def get_geographic_grid(self,row,column):
+        '''
+        Transform every combination of rotated coordinates to geographic
+        coordinates. Grids are cached by the coordinate values and the pole
+        and are read-only.
+        
+        :param row: Rotated latitudes in degrees.
+        :type row: numpy.ndarray
+        :param column: Rotated longitudes in degrees.
+        :type column: numpy.ndarray
+        :returns: Geographic latitudes and longitudes in degrees each with
+         shape `(row.shape[0],column.shape[0])`.
+        :rtype: tuple of numpy.ndarray
+        '''
+        key = (get_array_digest(row),get_array_digest(column),self._trans_proj)
+        ret = projection_cache.get(key)
+        if ret is None:
+            rlat,rlon = np.meshgrid(np.ma.getdata(row).astype(float),
+                                    np.ma.getdata(column).astype(float),indexing='ij')
+            lon,lat = self.transform(rlon,rlat)
+            lat.flags.writeable = False
+            lon.flags.writeable = False
+            ret = (lat,lon)
+            projection_cache[key] = ret
+        return(ret)
+    
+    def transform(self,x,y):
+        '''
+        Apply the oblique transformation of :attr:`_trans_proj` (i.e. proj's
+        `ob_tran` forward transformation) to arrays of coordinates.
+        
+        >>> RotatedPole(-162.,39.25).transform(np.array([0.]),np.array([90.]))
+        (array([-162.]), array([ 39.25]))
+        
+        :param x: Rotated longitudes in degrees.
+        :type x: numpy.ndarray
+        :param y: Rotated latitudes in degrees.
+        :type y: numpy.ndarray
+        :returns: Geographic longitudes and latitudes in degrees.
+        :rtype: tuple of numpy.ndarray
+        '''
+        lamp = np.radians(float(self.grid_north_pole_longitude))
+        phip = np.radians(float(self.grid_north_pole_latitude))
+        ## remove the central meridian of 180 degrees
+        lam = _adjlon_(np.radians(np.asarray(x,dtype=float)) - np.pi)
+        phi = np.radians(np.asarray(y,dtype=float))
+        coslam = np.cos(lam)
+        sinphi = np.sin(phi)
+        cosphi = np.cos(phi)
+        lon = np.arctan2(cosphi*np.sin(lam),np.sin(phip)*cosphi*coslam + np.cos(phip)*sinphi)
+        lon = _adjlon_(lon + lamp)
+        lat = np.arcsin(np.clip(np.sin(phip)*sinphi - np.cos(phip)*cosphi*coslam,-1.,1.))
+        return(np.degrees(lon),np.degrees(lat))
+    
     @classmethod
     def _init_from_variable_(cls,var):
         ret = cls(var.grid_north_pole_longitude,var.grid_north_pole_latitude)
@@ -99,6 +99,17 @@ class Test(TestBase):
         self.assertEqual(cg.value,('day','month'))
         with self.assertRaises(DefinitionValidationError):
             cg.value = ['d','foo']
+        cg.value = ['season','year']
+        self.assertEqual(cg.value,('season','year'))
+        for value in [['season','month'],['water_year','year'],['pentad','day']]:
+            with self.assertRaises(DefinitionValidationError):
+                cg.value = value
+        ## sequences of months are custom seasons
+        cg.value = [[12,1,2],[6,7,8,9],'year']
+        self.assertEqual(cg.value,((12,1,2),(6,7,8,9),'year'))
+        for value in [[[12,1,2],'season'],[[6,7],'month'],[[0,1]],[[1,2],[2,3]]]:
+            with self.assertRaises(DefinitionValidationError):
+                cg.value = value
             
     def test_dataset(self):
         rd = self.test_data.get_rd('cancm4_tas')
@@ -15,6 +15,7 @@ from shapely.geometry.multipolygon import MultiPolygon
 from ocgis.interface.geometry import GeometryDataset
 from ocgis import env
 import os.path
+from ocgis.exc import EmptyData
 
 
 class TestNcDataset(TestBase):
@@ -33,7 +34,9 @@ class TestNcDataset(TestBase):
         self.assertEqual(len(sri.value),len(sri.uid))
         self.assertTrue(np.all(sri.value >= 35))
         self.assertTrue(np.all(sri.value <= 38))
-        self.assertEqual(id(ri.value.base),id(sri.value.base))
+        ## monotonic subsets are views of the parent values
+        self.assertEqual(ri.monotonic,-1)
+        self.assertTrue(np.may_share_memory(ri.value,sri.value))
         
         ri = NcRowDimension(value=value,bounds=bounds)
         self.assertTrue(np.all(bounds == ri.bounds))
@@ -52,6 +55,38 @@ class TestNcDataset(TestBase):
         self.assertTrue(np.all(ri.uid == np.arange(1,21)))
         self.assertEqual(ri.resolution,0.5)
         
+    def test_row_dimension_monotonic(self):
+        value = np.arange(30,40,step=0.5)
+        for flip in [False,True]:
+            ordered = np.flipud(value).copy() if flip else value
+            for bounds in [None,np.column_stack((ordered - 0.25,ordered + 0.25)),
+                           np.column_stack((ordered + 0.25,ordered - 0.25))]:
+                ri = NcRowDimension(value=ordered,bounds=bounds)
+                self.assertEqual(ri.monotonic,-1 if flip else 1)
+                ## force the boolean selection on an identical dimension
+                scan = NcRowDimension(value=ordered,bounds=bounds)
+                scan._monotonic = 0
+                for lower,upper in [(35,38),(30.8,38.7),(29,45),(35.25,35.25),(31.1,31.2)]:
+                    ## a point on a shared bound selects nothing
+                    if bounds is not None and lower == 35.25:
+                        for dim in [ri,scan]:
+                            with self.assertRaises(EmptyData):
+                                dim.subset(lower,upper)
+                        continue
+                    self.assertIsInstance(ri._get_subset_index_(lower,upper),slice)
+                    sub = ri.subset(lower,upper)
+                    target = scan.subset(lower,upper)
+                    self.assertNumpyAll(sub.value,target.value)
+                    self.assertNumpyAll(sub.real_idx,target.real_idx)
+                    if bounds is not None:
+                        self.assertNumpyAll(sub.bounds,target.bounds)
+                    self.assertEqual(sub.monotonic,ri.monotonic)
+        
+        ## unordered values use the boolean selection
+        ri = NcRowDimension(value=np.array([3.,1.,2.]))
+        self.assertEqual(ri.monotonic,0)
+        self.assertNumpyAll(ri.subset(1.5,3).value,np.array([3.,2.]))
+        
     def test_spatial_dimension(self):
         rd = self.test_data.get_rd('cancm4_tas')
         ds = nc.Dataset(rd.uri,'r')
@@ -5,6 +5,7 @@ from ocgis import Inspect
 from ocgis.api.operations import OcgOperations
 from ocgis.api.request import RequestDataset
 from ocgis.test.base import TestBase
+import numpy as np
 
 
 class Test(TestBase):
@@ -65,6 +66,24 @@ class Test(TestBase):
         lc2 = projection.LambertConformalConic.init_from_dataset(ds)
 
 
+class TestRotatedPole(TestBase):
+    
+    def test_rotated_pole(self):
+        ## the cordex europe pole and the corners of its 0.44 degree grid
+        rp = projection.RotatedPole(-162.,39.25)
+        lon,lat = rp.transform(np.array([0.,-28.375,0.]),np.array([90.,-23.375,0.]))
+        self.assertTrue(np.allclose(lon,[-162.,-10.063880,18.]))
+        self.assertTrue(np.allclose(lat,[39.25,21.987829,50.75]))
+        
+        row = np.array([-23.375,0.,21.835])
+        column = np.array([-28.375,0.,18.155])
+        new_row,new_col = rp.get_geographic_grid(row,column)
+        self.assertEqual(new_row.shape,(3,3))
+        self.assertTrue(np.allclose([new_col[0,0],new_row[0,0]],[-10.063880,21.987829]))
+        self.assertTrue(np.allclose([new_col[1,1],new_row[1,1]],[18.,50.75]))
+        self.assertTrue(rp.get_geographic_grid(row.copy(),column.copy())[0] is new_row)
+
+
 if __name__ == "__main__":
 #    import sys;sys.argv = ['', 'TestSimpleMultiCalc01.test']
     unittest.main()
\ No newline at end of file
@@ -5,7 +5,11 @@ from ocgis.api.interpreter import OcgInterpreter
 import itertools
 import numpy as np
 import datetime
-from ocgis.util.helpers import make_poly
+from ocgis.util.helpers import make_poly, iter_array
+from ocgis.util.spatial.geometry_array import PolygonArray, PointArray
+from ocgis.interface.nc.dimension import NcPointDimension
+from ocgis.util.spatial.area import get_cell_areas
+from ocgis.util.spatial.grid import get_coverage_fractions
 from ocgis import exc, env
 import os.path
 from ocgis.util.inspect import Inspect
@@ -18,6 +22,13 @@ from shapely.geometry.point import Point
 import ocgis
 from ocgis.exc import ExtentError
 from shapely.geometry.polygon import Polygon
+from ocgis.interface.shp import ShpDataset, ShpSpatialDimension
+from copy import deepcopy
+import shutil
+import gc
+from ocgis.calc.library import Mean, Max, Min, SampleSize, Median
+import threading
+from ocgis.interface.nc.pool import nc_lock
 
 
 class TestSimpleBase(TestBase):
@@ -64,6 +75,29 @@ class TestSimpleBase(TestBase):
         
         return(ret)
     
+    def write_copy(self,path,format='NETCDF4',**kwds):
+        '''
+        Copy the test data to `path`. Keyword arguments are passed to
+        :meth:`netCDF4.Dataset.createVariable` for the data variable.
+        '''
+        src = nc.Dataset(self.get_dataset()['uri'],'r')
+        dst = nc.Dataset(path,'w',format=format)
+        try:
+            for name,dim in src.dimensions.iteritems():
+                dst.createDimension(name,None if dim.isunlimited() else len(dim))
+            for name,var in src.variables.iteritems():
+                attrs = dict([(attr,var.getncattr(attr)) for attr in var.ncattrs()])
+                create_kwds = {'fill_value':attrs.pop('_FillValue',None)}
+                if name == self.var:
+                    create_kwds.update(kwds)
+                new = dst.createVariable(name,var.dtype,var.dimensions,**create_kwds)
+                new.setncatts(attrs)
+                new[:] = var[:]
+        finally:
+            src.close()
+            dst.close()
+        return(path)
+    
     def make_shp(self):
         ops = OcgOperations(dataset=self.dataset,
                             output_format='shp')
@@ -286,6 +320,856 @@ class TestSimple(TestSimpleBase):
             self.assertEqual(ref['my_mean'].shape,(2,2,1,1))
             self.assertEqual(ref['my_mean'].flatten().mean(),2.5)
             
+    def get_shp_dataset(self):
+        geoms = np.empty(4,dtype=object)
+        geoms[0] = make_poly((37.5,39.5),(-104.5,-102.5))
+        geoms[1] = make_poly((38,39),(-104,-103))
+        geoms[2] = make_poly((20,25),(-90,-80))
+        geoms[3] = make_poly((36,41),(-106,-101))
+        uid = np.array([4,3,2,1])
+        spatial = ShpSpatialDimension(uid,geoms)
+        return(ShpDataset(spatial=spatial))
+            
+    def test_parallel(self):
+        for output_format in ['numpy','csv']:
+            rets = []
+            for serial in [True,False]:
+                env.SERIAL = serial
+                env.CORES = 2
+                ops = OcgOperations(dataset=self.get_dataset(),geom=self.get_shp_dataset(),
+                                    output_format=output_format,allow_empty=True,
+                                    prefix=str(serial),calc=[{'func':'mean','name':'my_mean'}],
+                                    calc_grouping=['month'])
+                rets.append(ops.execute())
+            if output_format == 'numpy':
+                self.assertEqual(set(rets[0].keys()),set(rets[1].keys()))
+                for ugid,coll in rets[0].iteritems():
+                    for alias,calc in coll.calc.iteritems():
+                        self.assertNumpyAll(calc['my_mean'],rets[1][ugid].calc[alias]['my_mean'])
+            else:
+                with open(rets[0]) as f1, open(rets[1]) as f2:
+                    self.assertEqual(f1.read(),f2.read())
+    
+    def test_parallel_clip(self):
+        ## clipped geometry arrays are pickled to and from the worker processes
+        rets = []
+        for serial in [True,False]:
+            env.SERIAL = serial
+            env.CORES = 2
+            ops = OcgOperations(dataset=self.get_dataset(),geom=self.get_shp_dataset(),
+                                spatial_operation='clip',allow_empty=True)
+            rets.append(ops.execute())
+        self.assertEqual(set(rets[0].keys()),set(rets[1].keys()))
+        for ugid,coll in rets[0].iteritems():
+            for alias,var in coll.variables.iteritems():
+                other = rets[1][ugid].variables[alias]
+                self.assertEqual(var.value.shape,other.value.shape)
+                self.assertNumpyAll(var.value,other.value)
+                for geom,other_geom in zip(var.spatial.vector.geom.flat,other.spatial.vector.geom.flat):
+                    self.assertTrue(geom.equals(other_geom))
+                    
+    def test_prefetch(self):
+        for output_format in ['numpy','csv']:
+            rets = []
+            for prefetch in [0,2]:
+                env.PREFETCH = prefetch
+                ops = OcgOperations(dataset=self.get_dataset(),geom=self.get_shp_dataset(),
+                                    output_format=output_format,allow_empty=True,
+                                    prefix='prefetch_{0}'.format(prefetch),
+                                    calc=[{'func':'mean','name':'my_mean'}],calc_grouping=['month'])
+                rets.append(ops.execute())
+            if output_format == 'numpy':
+                self.assertEqual(rets[0].keys(),rets[1].keys())
+                for ugid,coll in rets[0].iteritems():
+                    for alias,calc in coll.calc.iteritems():
+                        self.assertNumpyAll(calc['my_mean'],rets[1][ugid].calc[alias]['my_mean'])
+            else:
+                with open(rets[0]) as f1, open(rets[1]) as f2:
+                    self.assertEqual(f1.read(),f2.read())
+        
+        ## subset exceptions are raised in the calling thread
+        ops = OcgOperations(dataset=self.get_dataset(),geom=self.get_shp_dataset())
+        with self.assertRaises(ExtentError):
+            ops.execute()
+        
+        ## netCDF reads wait while another thread holds the library lock
+        ds = ocgis.RequestDataset(**self.get_dataset()).ds
+        ds.spatial
+        ret = []
+        with nc_lock:
+            thread = threading.Thread(target=lambda: ret.append(ds.value))
+            thread.start()
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(ret,[])
+        thread.join()
+        self.assertEqual(ret[0].shape,(61,2,4,4))
+        
+        ## netCDF output is written once the prefetch thread stops reading. the
+        ## operation runs in a thread so a deadlock fails the test.
+        rets = []
+        for prefetch in [0,2]:
+            env.PREFETCH = prefetch
+            ops = OcgOperations(dataset=self.get_dataset(),output_format='nc',
+                                prefix='prefetch_nc_{0}'.format(prefetch))
+            ret = []
+            thread = threading.Thread(target=lambda: ret.append(ops.execute()))
+            thread.daemon = True
+            thread.start()
+            thread.join(60)
+            self.assertFalse(thread.is_alive())
+            ds = nc.Dataset(ret[0])
+            try:
+                rets.append(ds.variables[self.var][:])
+            finally:
+                ds.close()
+        self.assertNumpyAll(rets[0],rets[1])
+                    
+    def test_parallel_exception(self):
+        env.SERIAL = False
+        env.CORES = 2
+        ops = OcgOperations(dataset=self.get_dataset(),geom=self.get_shp_dataset())
+        with self.assertRaises(ExtentError):
+            ops.execute()
+        
+    def test_estimate(self):
+        ops = self.get_ops()
+        est = ops.estimate()
+        ref = est['datasets']['foo']
+        self.assertEqual((ref['cells'],ref['time_steps'],ref['levels']),(16,61,2))
+        self.assertEqual(est['bytes_read'],61*2*16*8)
+        ret = ops.execute()
+        value = ret[1].variables['foo'].value
+        self.assertEqual(est['bytes_read'],value.data.nbytes)
+        self.assertEqual(est['peak_bytes'],value.data.nbytes+value.mask.nbytes)
+        
+        ops = self.get_ops(kwds={'geom':make_poly((37.5,39.5),(-104.5,-102.5))},
+                           time_range=[datetime.datetime(2000,3,1),datetime.datetime(2000,3,31,23)],
+                           level_range=[1,1])
+        ref = ops.estimate()['datasets']['foo']
+        self.assertEqual((ref['cells'],ref['time_steps'],ref['levels']),(4,31,1))
+        
+        ops = self.get_ops(kwds={'geom':self.get_shp_dataset(),'allow_empty':True})
+        ref = ops.estimate()['datasets']['foo']
+        self.assertEqual(ref['cells'],4+4+0+16)
+        
+    def test_memory_limit(self):
+        env.MEMORY_LIMIT = 1000
+        with self.assertRaises(exc.RequestSizeError):
+            self.get_ret()
+        
+        ## netCDF calculation requests are tiled
+        env.MEMORY_LIMIT = None
+        ops = self.get_ops(kwds={'output_format':'nc','calc':[{'func':'mean','name':'my_mean'}],
+                                 'calc_grouping':['month'],'prefix':'std'})
+        std_file = ops.execute()
+        env.MEMORY_LIMIT = 5000
+        ops = self.get_ops(kwds={'output_format':'nc','calc':[{'func':'mean','name':'my_mean'}],
+                                 'calc_grouping':['month'],'prefix':'tiled'})
+        tiled_file = ops.execute()
+        self.assertNotEqual(std_file,tiled_file)
+        ds_std,ds_tiled = nc.Dataset(std_file,'r'),nc.Dataset(tiled_file,'r')
+        try:
+            self.assertNumpyAll(ds_std.variables['my_mean'][:],ds_tiled.variables['my_mean'][:])
+        finally:
+            ds_std.close()
+            ds_tiled.close()
+        
+        ## tiles carry the time and level subsets of the request datasets
+        time_range = [datetime.datetime(2000,3,1),datetime.datetime(2000,3,31,23)]
+        for prefix,limit in [('std_subset',None),('tiled_subset',5000)]:
+            env.MEMORY_LIMIT = limit
+            ops = self.get_ops(kwds={'output_format':'nc','calc':[{'func':'mean','name':'my_mean'}],
+                                     'calc_grouping':['month'],'prefix':prefix},
+                               time_range=time_range)
+            if limit is None:
+                std_file = ops.execute()
+            else:
+                tiled_file = ops.execute()
+        ds_std,ds_tiled = nc.Dataset(std_file,'r'),nc.Dataset(tiled_file,'r')
+        try:
+            self.assertEqual(ds_std.variables['my_mean'].shape[0],1)
+            self.assertEqual(ds_std.variables['my_mean'].shape,ds_tiled.variables['my_mean'].shape)
+            self.assertNumpyAll(ds_std.variables['my_mean'][:],ds_tiled.variables['my_mean'][:])
+        finally:
+            ds_std.close()
+            ds_tiled.close()
+        
+    def test_time_chunk(self):
+        geom = make_poly((37.5,39.5),(-104.5,-102.5))
+        
+        ## blocks read from file match the complete value array
+        env.TIME_CHUNK_SIZE = 7
+        ret = self.get_ret(kwds={'geom':geom})
+        ds = ret[1].variables[self.var]
+        self.assertIsNone(ds._value)
+        blocks = list(ds.iter_value())
+        self.assertEqual(len(blocks),9)
+        self.assertEqual(blocks[-1][0],slice(56,61))
+        self.assertIsNone(ds._value)
+        self.assertNumpyAll(np.ma.concatenate([b[1] for b in blocks]),ds.value)
+        
+        ## streamed records carry the time attributes of their block
+        records = []
+        for chunk_size in [None,7]:
+            env.TIME_CHUNK_SIZE = chunk_size
+            rd = ocgis.RequestDataset(**self.get_dataset())
+            itr = rd.ds.get_iter_value(add_masked=False)
+            records.append(sorted([(gret['tid'],gret['lid'],gret['gid'],gret['value'],gret['time'])
+                                   for _,gret in itr]))
+        self.assertEqual(len(records[0]),61*2*4*4)
+        self.assertEqual(records[0],records[1])
+        self.assertIsNone(rd.ds._value)
+        ## masked values of leveled variables are skipped individually
+        value = rd.ds.value.copy()
+        value.mask = np.ma.getmaskarray(value)
+        value.mask[3,1,0,0] = True
+        self.assertEqual(len(list(rd.ds.get_iter_value(add_masked=False,value=value))),61*2*4*4-1)
+        
+        ## groups interleaved across blocks are reduced or assembled by block
+        rs = np.random.RandomState(1)
+        values = np.ma.array(rs.randint(0,10,size=(20,1,2,2)).astype(float),mask=False)
+        values.mask[3,0,1,1] = True
+        groups = [np.arange(20) % 3 == ii for ii in range(3)]
+        for Function in [Mean,Max,Min,SampleSize,Median]:
+            desired = Function(values=values,groups=groups).calculate()
+            blocks = ((slice(ii,ii+7),values[ii:ii+7]) for ii in range(0,20,7))
+            actual = Function(values=blocks,groups=groups).calculate()
+            self.assertNumpyAll(actual,desired)
+        
+        ## streamed calculations and conversions match the standard request
+        calc = [{'func':'mean','name':'my_mean'},{'func':'max','name':'my_max'},
+                {'func':'median','name':'my_median'}]
+        for group in [['month'],['month','year']]:
+            rets = []
+            for chunk_size in [None,7,100]:
+                env.TIME_CHUNK_SIZE = chunk_size
+                ret = self.get_ret(kwds={'calc':deepcopy(calc),'calc_grouping':group,'geom':geom})
+                rets.append(ret[1].calc[self.var])
+            for ret in rets[1:]:
+                for key,value in ret.iteritems():
+                    self.assertNumpyAll(value,rets[0][key])
+        
+        for output_format in ['nc','csv']:
+            paths = []
+            for chunk_size in [None,7]:
+                env.TIME_CHUNK_SIZE = chunk_size
+                ops = self.get_ops(kwds={'output_format':output_format,'geom':geom,
+                                         'prefix':'{0}_{1}'.format(output_format,chunk_size)})
+                paths.append(ops.execute())
+            if output_format == 'nc':
+                ds_std,ds_chunk = nc.Dataset(paths[0],'r'),nc.Dataset(paths[1],'r')
+                try:
+                    self.assertNumpyAll(ds_std.variables[self.var][:],ds_chunk.variables[self.var][:])
+                finally:
+                    ds_std.close()
+                    ds_chunk.close()
+            else:
+                ## csv records are ordered by time block when streamed
+                lines = []
+                for path in paths:
+                    with open(path,'r') as f:
+                        lines.append(f.readlines())
+                self.assertEqual(lines[0][0],lines[1][0])
+                self.assertNotEqual(lines[0],lines[1])
+                self.assertEqual(sorted(lines[0]),sorted(lines[1]))
+        
+    def test_time_runs(self):
+        rd = ocgis.RequestDataset(**self.get_dataset())
+        ds = rd.ds
+        self.assertEqual(ds._get_time_runs_(np.array([4])),[(4,5)])
+        self.assertEqual(ds._get_time_runs_(np.arange(61)),[(0,61)])
+        
+        ## non-contiguous time indices are read by run
+        tidx = [0,1,2,10,11,40,60]
+        sub = ds[tidx,:,:,:]
+        self.assertEqual(ds._get_time_runs_(sub.temporal.real_idx),[(0,3),(10,12),(40,41),(60,61)])
+        self.assertNumpyAll(sub.value,ds.value[tidx,:,:,:])
+        
+        ## time region subsets by run in time blocks
+        env.TIME_CHUNK_SIZE = 2
+        sub = ds[tidx,:,:,:]
+        blocks = list(sub.iter_value())
+        self.assertEqual(len(blocks),4)
+        self.assertNumpyAll(np.ma.concatenate([b[1] for b in blocks]),ds.value[tidx,:,:,:])
+        
+    def test_multifile(self):
+        ## split the time dimension of the test file across three files
+        rd = ocgis.RequestDataset(**self.get_dataset())
+        src = nc.Dataset(rd.uri,'r')
+        uris = []
+        try:
+            for ii,(start,stop) in enumerate([(0,20),(20,40),(40,61)]):
+                uri = os.path.join(env.DIR_OUTPUT,'multifile_{0}.nc'.format(ii))
+                dst = nc.Dataset(uri,'w')
+                try:
+                    for name,dim in src.dimensions.iteritems():
+                        dst.createDimension(name,stop-start if name == 'time' else len(dim))
+                    for name,var in src.variables.iteritems():
+                        new = dst.createVariable(name,var.dtype,var.dimensions)
+                        new.setncatts(dict([(attr,var.getncattr(attr)) for attr in var.ncattrs()]))
+                        if var.dimensions[0] == 'time':
+                            new[:] = var[start:stop]
+                        else:
+                            new[:] = var[:]
+                finally:
+                    dst.close()
+                os.utime(uri,(1e9,1e9))
+                uris.append(uri)
+        finally:
+            src.close()
+        
+        mrd = ocgis.RequestDataset(uris,self.var)
+        self.assertEqual(mrd.ds.metadata['dimensions']['time']['len'],61)
+        self.assertNumpyAll(mrd.ds.temporal.value,rd.ds.temporal.value)
+        self.assertNumpyAll(mrd.ds.temporal.bounds,rd.ds.temporal.bounds)
+        self.assertNumpyAll(mrd.ds.value,rd.ds.value)
+        ## reads beyond the pool size leave the first file's variable readable
+        env.MAX_OPEN_FILES = 1
+        mrd = ocgis.RequestDataset(uris,self.var)
+        variable = mrd.ds._get_variable_(self.var)
+        self.assertNumpyAll(variable[:],rd.ds.value.reshape(variable.shape))
+        self.assertEqual(sorted(variable.ncattrs()),sorted(rd.ds._ds.variables[self.var].ncattrs()))
+        self.assertTrue(variable.chunking() is not None)
+        index = mrd.ds._dim_map['T']['variable']._index
+        self.assertEqual(list(index.iter_files(15,45)),[(uris[0],15,20),(uris[1],0,20),(uris[2],0,5)])
+        self.assertNumpyAll(index.get_local_index(np.array([0,19,20,60]))[1],np.array([0,19,0,20]))
+        
+        ## indices are persisted in the cache directory and read by processes
+        ## without an index in memory
+        from ocgis.interface.nc.cache import cache
+        from ocgis.util.cache import mfindex_cache
+        env.DIR_CACHE = os.path.join(env.DIR_OUTPUT,'cache')
+        cache.clear()
+        mfindex_cache.clear()
+        mrd = ocgis.RequestDataset(uris,self.var)
+        mrd.ds.temporal
+        self.assertEqual(cache.stats,{'hits':0,'misses':1})
+        self.assertEqual(len(mfindex_cache),1)
+        mfindex_cache.clear()
+        mrd = ocgis.RequestDataset(uris,self.var)
+        self.assertNumpyAll(mrd.ds.temporal.value,rd.ds.temporal.value)
+        self.assertNumpyAll(mrd.ds.temporal.bounds,rd.ds.temporal.bounds)
+        self.assertEqual(cache.stats,{'hits':1,'misses':1})
+        index = mrd.ds._dim_map['T']['variable']._index
+        self.assertEqual(list(index.iter_files(15,45)),[(uris[0],15,20),(uris[1],0,20),(uris[2],0,5)])
+        env.DIR_CACHE = None
+        
+        ## only files overlapping the time range are opened. the last file is
+        ## made unreadable keeping its modification time so the cached index is
+        ## still used.
+        os.rename(uris[2],uris[2]+'.moved')
+        with open(uris[2],'w') as f:
+            f.write('not a netCDF file')
+        os.utime(uris[2],(1e9,1e9))
+        time_range = [datetime.datetime(2000,3,5),datetime.datetime(2000,4,5)]
+        ops = OcgOperations(dataset={'uri':uris,'variable':self.var,'time_range':time_range},
+                            calc=[{'func':'mean','name':'my_mean'}],calc_grouping=['month'])
+        ret = ops.execute()
+        ops = self.get_ops(kwds={'calc':[{'func':'mean','name':'my_mean'}],'calc_grouping':['month']},
+                           time_range=time_range)
+        self.assertNumpyAll(ret[1].calc[self.var]['my_mean'],ops.execute()[1].calc[self.var]['my_mean'])
+        
+    def test_file_pool(self):
+        from ocgis.interface.nc.pool import pool
+        pool.clear()
+        
+        ## handles are shared between datasets
+        rd1 = ocgis.RequestDataset(**self.get_dataset())
+        rd2 = ocgis.RequestDataset(**self.get_dataset())
+        self.assertTrue(rd1.ds._ds is rd2.ds._ds)
+        self.assertTrue(rd1.uri in pool)
+        value = rd1.ds.value.copy()
+        
+        ## the pool size holds while more datasets are alive. datasets reopen
+        ## handles closed by the pool.
+        env.MAX_OPEN_FILES = 2
+        handle = rd1.ds._ds
+        rds = []
+        for ii in range(4):
+            other = os.path.join(env.DIR_OUTPUT,'other_{0}.nc'.format(ii))
+            shutil.copy(rd1.uri,other)
+            rd = ocgis.RequestDataset(uri=other,variable=self.var)
+            self.assertNumpyAll(rd.ds.value,value)
+            rds.append(rd)
+        self.assertEqual(len(pool),2)
+        self.assertFalse(rd1.uri in pool)
+        self.assertFalse(handle.isopen())
+        for rd in [rd1,rd2] + rds:
+            self.assertNumpyAll(rd.ds._get_value_(),value)
+            self.assertEqual(len(pool),2)
+        
+        ## handles are not closed during a read
+        handle = rd1.ds._ds
+        with pool.pinned(handle):
+            self.assertTrue(pool.is_pinned(rd1.uri))
+            for rd in rds:
+                rd.ds._ds
+            self.assertTrue(rd1.uri in pool)
+            self.assertTrue(handle.isopen())
+            self.assertNumpyAll(handle.variables[self.var][:],value)
+        self.assertFalse(pool.is_pinned(rd1.uri))
+        
+        ## modified files are reopened. a handle replaced during a read is
+        ## closed once the read finishes.
+        rd = rds[-1]
+        handle = rd.ds._ds
+        with pool.pinned(handle):
+            os.utime(rd.uri,(1e9,1e9))
+            rd_new = ocgis.RequestDataset(uri=rd.uri,variable=self.var)
+            self.assertFalse(rd_new.ds._ds is handle)
+            self.assertTrue(handle.isopen())
+        self.assertFalse(handle.isopen())
+        self.assertTrue(rd.ds._ds is rd_new.ds._ds)
+        self.assertNumpyAll(rd.ds._get_value_(),value)
+        
+    def test_header_cache(self):
+        from ocgis.interface.nc.cache import cache, CachedHeader
+        from ocgis.interface.nc.pool import pool
+        
+        geom = make_poly((37.5,39.5),(-104.5,-102.5))
+        time_range = [datetime.datetime(2000,3,5),datetime.datetime(2000,4,5)]
+        ops = self.get_ops(kwds={'geom':geom,'calc':[{'func':'mean','name':'my_mean'}],
+                                 'calc_grouping':['month']},time_range=time_range)
+        std = ops.execute()[1]
+        
+        env.DIR_CACHE = os.path.join(env.DIR_OUTPUT,'cache')
+        cache.clear()
+        rd = ocgis.RequestDataset(**self.get_dataset())
+        self.assertTrue(isinstance(rd.ds._header,CachedHeader))
+        self.assertEqual(rd.ds.temporal.value.shape[0],61)
+        self.assertEqual(cache.stats,{'hits':0,'misses':1})
+        self.assertEqual(len(os.listdir(env.DIR_CACHE)),1)
+        self.assertTrue(self.var in rd.ds._header.dimension_maps)
+        ## only coordinate and bounds values are cached
+        self.assertFalse(self.var in rd.ds._header.arrays)
+        self.assertTrue('time_bnds' in rd.ds._header.arrays)
+        
+        ## a warm dataset is constructed and subset from the cache files without
+        ## opening the source file
+        cache._headers = {}
+        pool.clear()
+        rd = ocgis.RequestDataset(**self.get_dataset())
+        ds = rd.ds.get_subset(temporal=time_range,spatial_operation='intersects',igeom=geom)
+        self.assertEqual(ds.spatial.grid.shape,(2,2))
+        self.assertFalse(rd.uri in pool)
+        self.assertEqual(cache.stats,{'hits':1,'misses':1})
+        
+        ops = self.get_ops(kwds={'geom':geom,'calc':[{'func':'mean','name':'my_mean'}],
+                                 'calc_grouping':['month']},time_range=time_range)
+        ret = ops.execute()[1]
+        self.assertEqual(ret.variables[self.var].metadata,std.variables[self.var].metadata)
+        self.assertNumpyAll(ret.variables[self.var].value,std.variables[self.var].value)
+        self.assertNumpyAll(ret.calc[self.var]['my_mean'],std.calc[self.var]['my_mean'])
+        
+        ## modified files are cached again
+        os.utime(rd.uri,(1e9,1e9))
+        rd = ocgis.RequestDataset(**self.get_dataset())
+        rd.ds.temporal
+        self.assertEqual(cache.stats,{'hits':1,'misses':2})
+        
+        ## truncated entries are misses and are rewritten
+        path = cache._get_path_(rd.uri)+'.npz'
+        with open(path,'r+b') as f:
+            f.truncate(os.path.getsize(path)//2)
+        cache._headers = {}
+        rd = ocgis.RequestDataset(**self.get_dataset())
+        self.assertEqual(rd.ds.temporal.value.shape[0],61)
+        self.assertEqual(cache.stats,{'hits':1,'misses':3})
+        cache._headers = {}
+        rd = ocgis.RequestDataset(**self.get_dataset())
+        self.assertEqual(rd.ds.temporal.value.shape[0],61)
+        self.assertEqual(cache.stats,{'hits':2,'misses':3})
+        
+    def test_memmap(self):
+        from ocgis.interface.nc.classic import MemmapVariable
+        
+        ## write a classic format copy of the test data with a masked value
+        classic_uri = self.write_copy(os.path.join(env.DIR_OUTPUT,'classic.nc'),
+                                      format='NETCDF3_CLASSIC',fill_value=1e20)
+        ds = nc.Dataset(classic_uri,'a')
+        try:
+            ds.variables[self.var][10,1,2,2] = 1e20
+        finally:
+            ds.close()
+        
+        time_range = [datetime.datetime(2000,3,5),datetime.datetime(2000,4,5)]
+        def _get_value_():
+            rd = ocgis.RequestDataset(uri=classic_uri,variable=self.var,time_range=time_range)
+            ds = rd.ds.get_subset(temporal=time_range)
+            return(ds._get_variable_(self.var),ds.value)
+        
+        variable,std = _get_value_()
+        self.assertFalse(isinstance(variable,MemmapVariable))
+        self.assertEqual(std.mask.sum(),1)
+        env.USE_MEMMAP = True
+        variable,value = _get_value_()
+        self.assertTrue(isinstance(variable,MemmapVariable))
+        self.assertNumpyAll(value,std)
+        self.assertNumpyAll(value.mask,std.mask)
+        self.assertEqual(value.dtype,std.dtype)
+        
+        ## netCDF-4 files are read with the netCDF library
+        rd = ocgis.RequestDataset(**self.get_dataset())
+        self.assertFalse(isinstance(rd.ds._get_variable_(self.var),MemmapVariable))
+        
+    def test_chunk_plan(self):
+        from ocgis.interface.nc.chunking import ReadPlan, align, get_block_starts
+        from ocgis.calc.tile import get_tile_schema
+        
+        self.assertEqual(align(7,10),5)
+        self.assertEqual(align(25,10),20)
+        self.assertEqual(align(3,1),3)
+        self.assertEqual(align(100,181),100)
+        self.assertEqual(align(10,7),7)
+        self.assertEqual(align(6,7),6)
+        
+        uri = self.write_copy(os.path.join(env.DIR_OUTPUT,'chunked.nc'),
+                              chunksizes=(10,1,2,2),zlib=True)
+        ds = nc.Dataset(uri,'r')
+        try:
+            variable = ds.variables[self.var]
+            plan = ReadPlan(variable,[(5,25),(0,2),(1,3),(0,4)])
+            self.assertEqual(plan.counts,[3,2,2,2])
+            self.assertEqual(plan.nchunks,24)
+            self.assertEqual(plan.working_set,8*40*8)
+            size = variable.get_var_chunk_cache()[0]
+            ## the default cache already holds the working set
+            self.assertFalse(plan.set_chunk_cache())
+            env.MEMORY_LIMIT = 2*size
+            plan.working_set = 4*size
+            self.assertTrue(plan.set_chunk_cache())
+            self.assertEqual(variable.get_var_chunk_cache()[0],2*size)
+            self.assertFalse(plan.set_chunk_cache())
+            ## the cache is restored following the read
+            self.assertTrue(plan.restore_chunk_cache())
+            self.assertEqual(variable.get_var_chunk_cache()[0],size)
+            self.assertFalse(plan.restore_chunk_cache())
+        finally:
+            ds.close()
+        
+        ## tile edges fall on chunk boundaries
+        schema = get_tile_schema(4,4,3,chunks=(2,2))
+        self.assertEqual([v['row'] for v in schema.itervalues()],[[0,2],[0,2],[2,4],[2,4]])
+        
+        ## time blocks start on chunk boundaries of the file
+        env.MEMORY_LIMIT = None
+        time_range = [datetime.datetime(2000,3,5),datetime.datetime(2000,4,5)]
+        rd = ocgis.RequestDataset(uri=uri,variable=self.var,time_range=time_range)
+        ds = rd.ds.get_subset(temporal=time_range)
+        self.assertEqual(ds.temporal.real_idx[0],4)
+        blocks = list(ds.iter_value(chunk_size=7))
+        self.assertEqual([b[0] for b in blocks],[slice(0,1),slice(1,6),slice(6,11),
+                                                 slice(11,16),slice(16,21),slice(21,26),
+                                                 slice(26,31)])
+        self.assertNumpyAll(np.ma.concatenate([b[1] for b in blocks]),ds.value)
+        
+        std = ocgis.RequestDataset(**self.get_dataset(time_range=time_range)).ds
+        self.assertNumpyAll(ds.value,std.get_subset(temporal=time_range).value)
+        
+        ## blocks of non-contiguous time indices start on chunk boundaries
+        tidx = [0,1,2,10,11,40,60]
+        sub = ocgis.RequestDataset(uri=uri,variable=self.var).ds[tidx,:,:,:]
+        blocks = list(sub.iter_value(chunk_size=2))
+        self.assertEqual([b[0] for b in blocks],[slice(0,2),slice(2,3),slice(3,5),slice(5,7)])
+        self.assertNumpyAll(np.ma.concatenate([b[1] for b in blocks]),std.value[tidx,:,:,:])
+        self.assertEqual(get_block_starts(np.arange(0,400),100,181),[0,100,181,281,362])
+        
+    def test_group_labels(self):
+        ds = ocgis.RequestDataset(**self.get_dataset()).ds
+        for grouping in [['month'],['year'],['month','year'],['day'],['day','month'],
+                         ['day','month','year']]:
+            ds.temporal.set_grouping(grouping)
+            group = ds.temporal.group
+            self.assertEqual(group.labels.shape,(61,))
+            self.assertEqual(group.offsets[-1],61)
+            
+            ## groups are ordered by date parts and match a brute force grouping
+            keys = [tuple([getattr(dt,g) for g in ds.temporal._date_parts if g in grouping])
+                    for dt in ds.temporal.value_datetime]
+            unique = sorted(set(keys))
+            self.assertEqual(len(group),len(unique))
+            for idx,key in enumerate(unique):
+                indices = [ii for ii,k in enumerate(keys) if k == key]
+                self.assertEqual(list(group.get_indices(idx)),indices)
+                self.assertEqual(tuple([group.value[idx][g] for g in ds.temporal._date_parts if g in grouping]),key)
+                bounds = ds.temporal.bounds_datetime[indices]
+                self.assertEqual(list(group.bounds[idx]),[bounds.min(),bounds.max()])
+                self.assertNumpyAll(group.dgroups[idx],np.array([k == key for k in keys]))
+        
+        ## boolean groups are still accepted by calculations
+        from ocgis.calc import library
+        values = np.ma.array(np.arange(61*2*4*4,dtype=float).reshape(61,2,4,4),mask=False)
+        ds.temporal.set_grouping(['month'])
+        means = [library.Mean(values=values,groups=groups).calculate()
+                 for groups in [ds.temporal.group,list(ds.temporal.group.dgroups)]]
+        self.assertNumpyAll(means[0],means[1])
+        self.assertNumpyAll(means[0][1],values[31:].mean(axis=0))
+        
+    def test_time_region_bounds(self):
+        ds = ocgis.RequestDataset(**self.get_dataset()).ds
+        
+        def get_temporal(value,bounds):
+            ret = ds._dtemporal(value=value,bounds=bounds,uid=np.arange(1,value.shape[0]+1),
+                                real_idx=np.arange(value.shape[0]),dataset=ds)
+            ret.units = 'days since 2000-01-01 00:00:00'
+            ret.calendar = '365_day'
+            return(ret)
+        
+        ## monthly values with bounds on month boundaries
+        edges = np.array([0,31,59,90,120,151,181,212,243,273,304,334])
+        edges = np.concatenate([edges + 365*ii for ii in range(3)] + [[365*3]])
+        bounds = np.column_stack((edges[:-1],edges[1:])).astype(float)
+        monthly = get_temporal(bounds.mean(axis=1),bounds)
+        ret = monthly.subset({'month':[2],'year':None})
+        self.assertEqual(list(ret.real_idx),[1,13,25])
+        ret = monthly.subset({'month':None,'year':[2001]})
+        self.assertEqual(list(ret.real_idx),range(12,24))
+        ret = monthly.subset({'month':[12,1],'year':[2001]})
+        self.assertEqual(list(ret.real_idx),[12,23])
+        
+        ## pentads touch every month their bounds overlap
+        bounds = np.column_stack((np.arange(0,365*2,5),np.arange(5,365*2+5,5))).astype(float)
+        pentads = get_temporal(bounds.mean(axis=1),bounds)
+        ret = pentads.subset({'month':[2],'year':None})
+        self.assertEqual(list(ret.bounds[[0,-1]].flat),[30.,35.,420.,425.])
+        ret = pentads.subset({'month':[1],'year':[2001]})
+        self.assertEqual(list(ret.bounds[[0,-1]].flat),[365.,370.,395.,400.])
+        ret = pentads.subset({'month':[12],'year':None})
+        self.assertEqual(list(ret.bounds[[0,-1]].flat),[330.,335.,725.,730.])
+        
+        ## bounds on the daily test data select whole days
+        for month,count in [([3],31),([4],30)]:
+            ret = ds.temporal.subset({'month':month,'year':[2000]})
+            self.assertEqual(ret.value.shape[0],count)
+        
+    def test_temporal_cache(self):
+        from ocgis.util.cache import temporal_cache
+        temporal_cache.clear()
+        
+        ## time axes of separate requests share decoded values and groupings
+        temporal = [ocgis.RequestDataset(**self.get_dataset()).ds.temporal for ii in range(2)]
+        for attr in ['value_datetime','bounds_datetime','value_date_parts']:
+            self.assertIs(getattr(temporal[0],attr),getattr(temporal[1],attr))
+        for t in temporal:
+            t.set_grouping(['month'])
+        self.assertIs(temporal[0].group,temporal[1].group)
+        temporal[1].set_grouping(['year'])
+        self.assertEqual(len(temporal[1].group),1)
+        self.assertEqual(len(temporal[0].group),2)
+        self.assertEqual(len(temporal_cache),1)
+        
+        ## subsets and other calendars are separate entries
+        sub = temporal[0][0:10]
+        self.assertNumpyAll(sub.value_datetime,temporal[0].value_datetime[0:10])
+        sub.calendar = '360_day'
+        sub._value_datetime = None
+        self.assertEqual(sub.value_datetime[-1],datetime.datetime(2000,3,10,12))
+        self.assertEqual(len(temporal_cache),3)
+        
+    def test_group_custom(self):
+        ds = ocgis.RequestDataset(**self.get_dataset()).ds
+        
+        ## daily values from november through march cross a year
+        value = np.arange(304,304+151) + 0.5
+        temporal = ds._dtemporal(value=value,bounds=np.column_stack((value-0.5,value+0.5)),
+                                 uid=np.arange(1,value.shape[0]+1),
+                                 real_idx=np.arange(value.shape[0]),dataset=ds)
+        temporal.units = 'days since 2000-01-01 00:00:00'
+        temporal.calendar = '365_day'
+        
+        temporal.set_grouping(['season','year'])
+        group = temporal.group
+        self.assertEqual([(v['year'],v['season'],v['month']) for v in group.value],
+                         [(2000,4,None),(2001,1,None),(2001,2,None)])
+        self.assertEqual([len(group.get_indices(idx)) for idx in range(3)],[30,90,31])
+        dt = datetime.datetime
+        self.assertEqual(list(group.bounds[1]),[dt(2000,12,1),dt(2001,3,1)])
+        self.assertEqual(list(group.representative_datetime),
+                         [dt(2000,10,16),dt(2001,1,16),dt(2001,4,16)])
+        
+        temporal.set_grouping(['season'])
+        self.assertEqual(list(temporal.group.representative_datetime),
+                         [dt(2001,1,16),dt(2001,4,16),dt(2000,10,16)])
+        
+        temporal.set_grouping(['water_year'])
+        self.assertEqual(list(temporal.group.value['water_year']),[2001])
+        self.assertEqual(list(temporal.group.representative_datetime),[dt(2001,4,1)])
+        
+        temporal.set_grouping(['pentad','year'])
+        group = temporal.group
+        self.assertEqual(len(group),31)
+        self.assertEqual((group.value[0]['year'],group.value[0]['pentad']),(2000,61))
+        self.assertEqual(group.representative_datetime[0],dt(2000,10,30,12))
+        self.assertEqual(list(group.bounds[0]),[dt(2000,11,1),dt(2000,11,2)])
+        
+        ## custom seasons are numbered in order. months outside of the seasons
+        ## are not grouped.
+        temporal.set_grouping([(6,7,8,9),(11,12,1),'year'])
+        group = temporal.group
+        self.assertEqual([(v['year'],v['season']) for v in group.value],[(2001,2)])
+        self.assertEqual(group.get_indices(0).tolist(),range(92))
+        self.assertEqual(list(group.bounds[0]),[dt(2000,11,1),dt(2001,2,1)])
+        self.assertEqual(list(group.representative_datetime),[dt(2000,12,16)])
+        temporal.set_grouping([(11,12,1),(2,3)])
+        group = temporal.group
+        self.assertEqual([len(group.get_indices(idx)) for idx in range(2)],[92,59])
+        self.assertEqual(list(group.representative_datetime),[dt(2000,12,16),dt(2001,3,16)])
+        with self.assertRaises(exc.EmptyData):
+            temporal.set_grouping([(6,7,8)])
+        
+        ## calculations and outputs carry the custom group
+        ops = OcgOperations(dataset=self.get_dataset(),calc=[{'func':'mean','name':'mean'}],
+                            calc_grouping=['season','year'],output_format='numpy')
+        ret = ops.execute()
+        self.assertEqual(ret[1].calc[self.var]['mean'].shape[0],1)
+        ref = ret[1].variables[self.var]
+        self.assertEqual(ref.temporal.group.representative_datetime[0],dt(2000,4,16))
+        ops = OcgOperations(dataset=self.get_dataset(),calc=[{'func':'mean','name':'mean'}],
+                            calc_grouping=['season','year'],output_format='csv')
+        with open(ops.execute(),'r') as f:
+            header = f.readline().strip().split(',')
+        self.assertEqual(header[header.index('DAY')+1],'SEASON')
+        
+        ## custom seasons from a list of months
+        ops = OcgOperations(dataset=self.get_dataset(),calc=[{'func':'mean','name':'mean'}],
+                            calc_grouping=[[3],[4,5]],output_format='numpy')
+        ret = ops.execute()[1]
+        ref = ret.variables[self.var].temporal.group
+        self.assertEqual(list(ref.value['season']),[1,2])
+        self.assertEqual(list(ref.representative_datetime),[dt(2000,3,16),dt(2000,5,16)])
+        std = self.get_ret(kwds={'calc':[{'func':'mean','name':'mean'}],'calc_grouping':['month']})
+        self.assertNumpyAll(ret.calc[self.var]['mean'],std[1].calc[self.var]['mean'])
+        
+    def test_temporal_output(self):
+        temporal = ocgis.RequestDataset(**self.get_dataset()).ds.temporal
+        rows = temporal.output.get_rows()
+        self.assertEqual(len(rows),61)
+        ## rows are built from the date parts without decoding datetime objects
+        ## for the complete dimension
+        self.assertIsNone(temporal._value_datetime)
+        self.assertIsNone(temporal._bounds_datetime)
+        self.assertEqual(temporal.output.get_rows(slice(59,61)),rows[59:61])
+        dt = datetime.datetime
+        for idx in [0,60]:
+            self.assertEqual(rows[idx]['time'],temporal.value_datetime[idx])
+            self.assertEqual(rows[idx]['bnd_left_time'],temporal.bounds_datetime[idx,0])
+            self.assertEqual(rows[idx]['tid'],idx+1)
+            self.assertEqual([rows[idx][part] for part in ['year','month','day']],
+                             [getattr(temporal.value_datetime[idx],part) for part in ['year','month','day']])
+        self.assertEqual(type(rows[0]['year']),int)
+        self.assertNotIn('bnd_left_time',temporal.output.get_rows(add_bounds=False)[0])
+        self.assertEqual([r for ii,r in temporal.get_iter()],rows)
+        
+        ## strings are formatted once and written as is
+        rows = temporal.output.get_rows(time_strings=True)
+        self.assertEqual(rows[0]['time'],str(dt(2000,3,1,12)))
+        self.assertEqual(rows[60]['bnd_right_time'],str(temporal.bounds_datetime[60,1]))
+        self.assertEqual(type(rows[0]['time']),str)
+        ops = OcgOperations(dataset=self.get_dataset(),output_format='csv',
+                            headers=['gid','time','year','month','day','value'])
+        with open(ops.execute(),'r') as f:
+            lines = f.readlines()
+        self.assertEqual(lines[0].strip(),'GID,TIME,YEAR,MONTH,DAY,VALUE')
+        self.assertEqual(lines[1].strip(),'1,2000-03-01 12:00:00,2000,3,1,1.0')
+        
+    def test_intersects_cells(self):
+        vector = ocgis.RequestDataset(**self.get_dataset()).ds.spatial.vector
+        minx,miny,maxx,maxy = vector.grid.extent
+        polygons = [Point((minx+maxx)/2.,(miny+maxy)/2.).buffer(1.3),
+                    make_poly((miny+0.5,maxy-1),(minx+1,maxx-1)),
+                    Point(minx+0.5,miny+0.5).buffer(0.2)]
+        for polygon in polygons:
+            ## cell geometries are not created by the selection
+            ret = vector.intersects(polygon)
+            self.assertIsNone(ret._geom)
+            for ii,jj in itertools.product(*[range(s) for s in ret.shape]):
+                cell = make_poly(ret.grid.row.bounds[ii],ret.grid.column.bounds[jj])
+                keep = cell.intersects(polygon) and not cell.touches(polygon)
+                self.assertEqual(ret.mask[ii,jj],not keep)
+            self.assertTrue(np.all(ret.geom.mask == ret.mask))
+            
+            clipped = vector.clip(polygon)
+            self.assertTrue(np.all(clipped.geom.mask == ret.mask))
+            for ii,jj in zip(*np.nonzero(np.logical_not(ret.mask))):
+                self.assertAlmostEqual(clipped.geom[ii,jj].area,ret.geom[ii,jj].intersection(polygon).area)
+        
+    def test_geometry_array(self):
+        ds = ocgis.RequestDataset(**self.get_dataset()).ds
+        geom = ds.spatial.vector.geom
+        self.assertIsInstance(geom,PolygonArray)
+        self.assertEqual(geom.shape,(4,4))
+        row,column = ds.spatial.grid.row.bounds,ds.spatial.grid.column.bounds
+        self.assertTrue(geom[1,2].equals(make_poly(row[1],column[2])))
+        ## slices share the bounds and carry the mask and assigned geometries
+        geom.mask[0,1] = True
+        geom[1,1] = Point(0,0)
+        sub = geom[0:2,1:3]
+        self.assertTrue(np.may_share_memory(sub.row_bounds,row))
+        self.assertIs(sub[0,0],np.ma.masked)
+        self.assertEqual(sub[1,0],Point(0,0))
+        self.assertEqual(len(sub.compressed()),3)
+        self.assertEqual(len(list(iter_array(sub))),3)
+        self.assertTrue(np.all(geom[1,:].mask == [False,False,False,False]))
+        self.assertEqual(geom[1,:][1],Point(0,0))
+        
+        ## points are built from the coordinate vectors
+        ds = ocgis.RequestDataset(**self.get_dataset()).ds
+        ds.spatial.vector = NcPointDimension(grid=ds.spatial.grid,uid=ds.spatial.grid.uid)
+        geom = ds.spatial.vector.geom
+        self.assertIsInstance(geom,PointArray)
+        self.assertEqual(geom[3,0],Point(ds.spatial.grid.column.value[0],ds.spatial.grid.row.value[3]))
+        
+    def test_weights(self):
+        vector = ocgis.RequestDataset(**self.get_dataset()).ds.spatial.vector
+        row,column = vector.grid.row.bounds,vector.grid.column.bounds
+        self.assertTrue(np.all(vector.weights == 1))
+        self.assertIs(get_cell_areas(row,column),get_cell_areas(row.copy(),column.copy()))
+        
+        ## clipped cells are weighted by their covered fraction
+        clipped = vector.clip(make_poly((38,39),(-104,-103)))
+        self.assertTrue(np.all(clipped.weights.compressed() == 1))
+        clipped = vector.clip(make_poly((38,39),(-104,-103.25)))
+        self.assertEqual(clipped.weights.compressed().tolist(),[1,0.5,1,0.5])
+        
+        ## spherical areas shrink toward the poles
+        env.SPHERICAL_WEIGHTS = True
+        vector = ocgis.RequestDataset(**self.get_dataset()).ds.spatial.vector
+        weights = vector.weights
+        lat = np.radians(row)
+        desired = np.abs(np.sin(lat[:,1])-np.sin(lat[:,0]))
+        desired = desired/desired.max()
+        for jj in range(weights.shape[1]):
+            self.assertTrue(np.allclose(weights[:,jj],desired))
+        
+        ## projected grids fall back to planar areas
+        from ocgis.interface.nc.dimension import NcSpatialDimension
+        from ocgis.interface.projection import LambertConformalConic
+        projection = LambertConformalConic([30,60],-97,47.5,0,0)
+        spatial = NcSpatialDimension(grid=vector.grid,projection=projection)
+        self.assertTrue(np.all(spatial.vector.weights == 1))
+        clipped = spatial.vector.clip(make_poly((38,39),(-104,-103.25)))
+        self.assertIs(clipped.projection,projection)
+        self.assertEqual(clipped.weights.compressed().tolist(),[1,0.5,1,0.5])
+        
+    def test_coverage_fractions(self):
+        ds = ocgis.RequestDataset(**self.get_dataset()).ds
+        row,column = ds.spatial.grid.row.bounds,ds.spatial.grid.column.bounds
+        polygon = Point(-102.6,38.3).buffer(1.1)
+        fractions = get_coverage_fractions(polygon,row,column)
+        for ii,jj in itertools.product(range(4),range(4)):
+            cell = make_poly(row[ii],column[jj])
+            self.assertAlmostEqual(fractions[ii,jj],cell.intersection(polygon).area/cell.area)
+        
+        ## area-weighted aggregation of clipped cells
+        ret = self.get_ret(kwds={'geom':polygon,'spatial_operation':'clip','aggregate':True})
+        ref = ret[1].variables[self.var]
+        self.assertAlmostEqual(ref.spatial.vector.geom[0,0].area,polygon.area)
+        sub = ds.get_subset(spatial_operation='clip',igeom=polygon)
+        areas = [g.area for g in sub.spatial.vector.geom.compressed()]
+        desired = np.ma.average(sub.value[0,0].compressed(),weights=areas)
+        self.assertAlmostEqual(ref.value[0,0,0,0],desired)
+        
     def test_inspect(self):
         uri = self.get_dataset()['uri']
         for variable in [self.get_dataset()['variable'],None]:
@@ -1,10 +1,19 @@
 from ocgis.interface.shp import ShpDataset
 import numpy as np
-from ocgis.util.helpers import format_bool, iter_array, validate_time_subset
+from ocgis.util.helpers import format_bool, iter_array, validate_time_subset,\
+    make_poly
 import itertools
 from ocgis.test.base import TestBase
 from ocgis.util.spatial.wrap import Wrapper
 from datetime import datetime as dt
+from ocgis.util.prefetch import prefetch
+from ocgis.util import dates
+from ocgis.util.cache import LRUCache, get_array_digest
+from ocgis.util.spatial.index import SpatialIndex, GeometryIndex, get_points_in_polygon, get_segments,\
+    KDTree, get_kdtree
+from shapely.geometry import Point, box
+import netCDF4 as nc
+import time
 
 
 class TestHelpers(TestBase):
@@ -70,6 +79,92 @@ class TestHelpers(TestBase):
         for key,value in mmap.iteritems():
             ret = format_bool(key)
             self.assertEqual(ret,value)
+            
+    def test_dates_decode(self):
+        values = np.concatenate((np.arange(-400,800,0.25),[59.5,365.75,36524.0]))
+        for calendar in ['standard','gregorian','proleptic_gregorian']:
+            for units in ['days since 2000-01-01','days since 1850-1-1 06:00:00',
+                          'hours since 1970-01-01T00:00:00Z']:
+                parts = dates.decode(values,units,calendar)
+                self.assertEqual(parts.shape,(values.shape[0],7))
+                ref = nc.num2date(values,units,calendar=calendar)
+                ref = np.array([[d.year,d.month,d.day,d.hour,d.minute,d.second,0] for d in ref])
+                self.assertTrue(np.all(parts == ref))
+        
+        ## netcdftime loses seconds for the other calendars so dates are
+        ## compared to known values
+        for calendar,value,desired in [['noleap',59.25,[2000,3,1,6]],
+                                       ['365_day',-306,[1999,3,1,0]],
+                                       ['all_leap',365.5,[2000,12,31,12]],
+                                       ['366_day',-1,[1999,12,31,0]],
+                                       ['360_day',59.75,[2000,2,30,18]],
+                                       ['360_day',360*3+0.5,[2003,1,1,12]]]:
+            parts = dates.decode([value],'days since 2000-01-01',calendar)
+            self.assertEqual(list(parts[0]),desired+[0,0,0])
+        
+        ## bounds keep their shape
+        parts = dates.decode(np.array([[0,1],[1,2]]),'days since 2000-01-01','noleap')
+        self.assertEqual(parts.shape,(2,2,7))
+        
+        dts = dates.get_datetime(dates.decode([0.5,59],'days since 2000-01-01','standard'))
+        self.assertEqual(list(dts),[dt(2000,1,1,12),dt(2000,2,29)])
+        self.assertNumpyAll(dates.get_parts(dts),dates.decode([0.5,59],'days since 2000-01-01'))
+        ## 360_day dates missing from the gregorian calendar have no datetime
+        with self.assertRaises(ValueError):
+            dates.get_datetime(dates.decode([59],'days since 2000-01-01','360_day'))
+        
+        for units,calendar in [('months since 2000-01-01','360_day'),
+                               ('days since 1500-01-01','standard'),
+                               ('days since 2000-01-01','julian')]:
+            with self.assertRaises(NotImplementedError):
+                dates.decode([0],units,calendar)
+            
+    def test_prefetch(self):
+        consumed = []
+        def _iter_():
+            for ii in range(10):
+                consumed.append(ii)
+                yield(ii)
+        for n in [None,0,1,3]:
+            self.assertEqual(list(prefetch(_iter_(),n)),range(10))
+        
+        ## the producer runs at most n elements ahead of the consumer
+        del consumed[:]
+        it = prefetch(_iter_(),2)
+        self.assertEqual(it.next(),0)
+        time.sleep(0.3)
+        self.assertTrue(len(consumed) <= 4)
+        it.close()
+        
+        ## exceptions are raised in the consumer
+        def _raise_():
+            yield(1)
+            raise(ValueError('producer'))
+        it = prefetch(_raise_(),2)
+        self.assertEqual(it.next(),1)
+        with self.assertRaises(ValueError):
+            it.next()
+            
+    def test_lru_cache(self):
+        cache = LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        self.assertEqual(cache['a'],1)
+        ## the least recently used item is evicted
+        cache['c'] = 3
+        self.assertEqual(len(cache),2)
+        self.assertNotIn('b',cache)
+        self.assertEqual(cache.get('b'),None)
+        self.assertEqual(cache.setdefault('a',4),1)
+        self.assertEqual(cache.setdefault('d',4),4)
+        self.assertNotIn('c',cache)
+        cache.clear()
+        self.assertEqual(len(cache),0)
+        
+        arr = np.arange(4.)
+        self.assertEqual(get_array_digest(arr),get_array_digest(arr.copy()))
+        self.assertNotEqual(get_array_digest(arr),get_array_digest(arr.astype(np.float32)))
+        self.assertNotEqual(get_array_digest(arr),get_array_digest(arr.reshape(2,2)))
 
 class TestSpatial(TestBase):
     axes = [-10.0,-5.0,0.0,5.0,10]
@@ -92,3 +187,64 @@ class TestSpatial(TestBase):
                 new_geom = w.wrap(unwrapped_geom)
                 self.assertFalse(unwrapped_geom.equals(new_geom))
                 self.assertTrue(sd.spatial.geom[idx].almost_equals(new_geom))
+                
+    def test_spatial_index(self):
+        rs = np.random.RandomState(1)
+        for n in [0,1,50,1000]:
+            bounds = rs.rand(n,2)*100
+            bounds = np.column_stack((bounds,bounds+rs.rand(n,2)*5))
+            index = SpatialIndex(bounds,node_capacity=4)
+            query = rs.rand(50,2)*100
+            query = np.column_stack((query,query+1))
+            qidx,iidx = index.query_boxes(query)
+            actual = set(zip(qidx,iidx))
+            desired = set([(ii,jj) for ii,jj in itertools.product(range(50),range(n))
+                           if query[ii,0] <= bounds[jj,2] and bounds[jj,0] <= query[ii,2]
+                           and query[ii,1] <= bounds[jj,3] and bounds[jj,1] <= query[ii,3]])
+            self.assertEqual(actual,desired)
+            
+    def test_geometry_index(self):
+        polygon = Point(0,0).buffer(10,resolution=500).difference(Point(3,3).buffer(2))
+        index = GeometryIndex(polygon,vertices=100)
+        self.assertTrue(len(index.pieces) > 1)
+        self.assertAlmostEqual(sum([p.area for p in index.pieces]),polygon.area)
+        
+        rs = np.random.RandomState(1)
+        xy = rs.rand(500,2)*24 - 12
+        bounds = np.column_stack((xy,xy+rs.rand(500,2)))
+        boxes = [box(*b) for b in bounds]
+        desired = [b.intersects(polygon) and not b.touches(polygon) for b in boxes]
+        self.assertEqual(index.intersects_boxes(bounds).tolist(),desired)
+        desired = [polygon.intersects(Point(x,y)) for x,y in xy]
+        self.assertEqual(index.intersects_points(xy[:,0],xy[:,1]).tolist(),desired)
+        for b in boxes[0:50]:
+            self.assertAlmostEqual(index.intersection(b).area,polygon.intersection(b).area)
+            
+    def test_points_in_polygon(self):
+        polygon = Point(0,0).buffer(10).difference(make_poly((-2,2),(-2,2)))
+        rs = np.random.RandomState(1)
+        x = np.concatenate((rs.rand(1000)*24 - 12,[2,0,-2,10,0]))
+        y = np.concatenate((rs.rand(1000)*24 - 12,[0,2,-2,0,0]))
+        desired = [polygon.intersects(Point(xx,yy)) for xx,yy in zip(x,y)]
+        start,end = get_segments(polygon)
+        ## points level with horizontal edges have undefined crossings
+        with np.errstate(all='raise'):
+            self.assertEqual(get_points_in_polygon(start,end,x,y).tolist(),desired)
+        index = GeometryIndex(polygon,vertices=20)
+        self.assertEqual(index.intersects_points(x,y).tolist(),desired)
+        
+    def test_kdtree(self):
+        rs = np.random.RandomState(1)
+        ## a curvilinear grid with repeated coordinates
+        y,x = np.meshgrid(np.arange(20.),np.arange(30.),indexing='ij')
+        x = x + np.sin(y)
+        qx = np.concatenate((rs.rand(500)*40 - 5,x[0:3,0]))
+        qy = np.concatenate((rs.rand(500)*30 - 5,y[0:3,0]))
+        dist = np.sqrt((qx.reshape(-1,1) - x.reshape(1,-1))**2 + (qy.reshape(-1,1) - y.reshape(1,-1))**2)
+        for leaf_size in [1,4,None]:
+            tree = KDTree(x,y,leaf_size=leaf_size)
+            ret_dist,ret_idx = tree.query(qx,qy)
+            self.assertEqual(ret_idx.tolist(),np.argmin(dist,axis=1).tolist())
+            self.assertTrue(np.allclose(ret_dist,dist.min(axis=1)))
+        self.assertEqual(tree.query(x[4,5],y[4,5])[1].tolist(),[4*30+5])
+        self.assertTrue(get_kdtree(x,y) is get_kdtree(x.copy(),y.copy()))
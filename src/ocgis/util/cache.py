@@ -0,0 +1,110 @@
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+from ocgis import constants
+
+
+class LRUCache(object):
+    '''
+    A mapping holding at most `maxsize` items. When full, the least recently
+    used item is evicted. Access is thread-safe.
+    
+    >>> cache = LRUCache(2)
+    >>> cache['a'] = 1
+    >>> cache['b'] = 2
+    >>> cache['a']
+    1
+    >>> cache['c'] = 3
+    >>> 'b' in cache
+    False
+    
+    :param maxsize: The maximum number of items.
+    :type maxsize: int
+    '''
+    
+    def __init__(self,maxsize):
+        self.maxsize = maxsize
+        self._store = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __contains__(self,key):
+        with self._lock:
+            return(key in self._store)
+    
+    def __getitem__(self,key):
+        with self._lock:
+            ## move the item to the most recently used position
+            value = self._store.pop(key)
+            self._store[key] = value
+            return(value)
+    
+    def __len__(self):
+        with self._lock:
+            return(len(self._store))
+    
+    def __setitem__(self,key,value):
+        with self._lock:
+            self._store.pop(key,None)
+            self._store[key] = value
+            while len(self._store) > self.maxsize:
+                self._store.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._store.clear()
+    
+    def get(self,key,default=None):
+        try:
+            ret = self[key]
+        except KeyError:
+            ret = default
+        return(ret)
+    
+    def setdefault(self,key,default):
+        '''
+        :returns: The item at `key`, first setting it to `default` if it is not
+         present.
+        '''
+        with self._lock:
+            try:
+                value = self._store.pop(key)
+            except KeyError:
+                value = default
+            self._store[key] = value
+            while len(self._store) > self.maxsize:
+                self._store.popitem(last=False)
+            return(value)
+
+
+## decoded time values, bounds, and groupings shared by time dimensions with
+## identical raw values, units, and calendars
+temporal_cache = LRUCache(constants.temporal_cache_size)
+
+## cell areas shared by grids with identical bounds
+area_cache = LRUCache(constants.area_cache_size)
+
+## nearest-neighbour trees shared by grids with identical coordinates
+neighbor_cache = LRUCache(constants.neighbor_cache_size)
+
+## geographic coordinates shared by projected grids with identical coordinates
+## and projection parameters
+projection_cache = LRUCache(constants.projection_cache_size)
+
+## time indices of multi-file datasets keyed by uris, dimension and variable
+## names, and modification times
+mfindex_cache = LRUCache(constants.mfindex_cache_size)
+
+
+def get_array_digest(arr):
+    '''
+    :returns: A hash of the shape, data type, and values of `arr`. Masks are
+     ignored.
+    :rtype: str
+    '''
+    if arr is None:
+        return(None)
+    data = np.ascontiguousarray(np.ma.getdata(arr))
+    sha = hashlib.sha1(str((data.shape,data.dtype.str)))
+    sha.update(data.view(np.uint8))
+    return(sha.hexdigest())
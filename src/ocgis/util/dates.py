@@ -0,0 +1,312 @@
+import re
+import datetime
+import numpy as np
+
+
+## columns of a date parts array
+date_parts = ('year','month','day','hour','minute','second','microsecond')
+
+## groupings computed from date parts. seasons are numbered DJF, MAM, JJA, and
+## SON. water years run from October through September.
+custom_parts = ('season','water_year','pentad')
+
+## the months of the seasons used by the season grouping
+default_seasons = ((12,1,2),(3,4,5),(6,7,8),(9,10,11))
+
+## the order in which grouped parts sort groups
+group_parts = ('year','water_year','season','month','pentad','day','hour','minute','second','microsecond')
+
+## microseconds per time unit
+_unit_factors = {}
+for _names,_factor in [(('microseconds','microsecond','us'),1),
+                       (('milliseconds','millisecond','msec','msecs','ms'),1000),
+                       (('seconds','second','sec','secs','s'),1000000),
+                       (('minutes','minute','min','mins'),60*1000000),
+                       (('hours','hour','hr','hrs','h'),3600*1000000),
+                       (('days','day','d'),86400*1000000)]:
+    for _name in _names:
+        _unit_factors[_name] = _factor
+_day = 86400*1000000
+
+_re_units = re.compile(r'^\s*(\w+)\s+since\s+(-?\d+)-(\d+)-(\d+)'
+                       r'(?:[ T]+(\d+):(\d+)(?::(\d+(?:\.\d*)?))?)?\s*(?:Z|UTC|[+-]0+(?::?0+)?)?\s*$',
+                       re.IGNORECASE)
+
+## cumulative days before each month for calendars with fixed year lengths
+_fixed_calendars = {}
+for _names,_lengths in [(('noleap','365_day'),[31,28,31,30,31,30,31,31,30,31,30,31]),
+                        (('all_leap','366_day'),[31,29,31,30,31,30,31,31,30,31,30,31]),
+                        (('360_day',),[30]*12)]:
+    for _name in _names:
+        _fixed_calendars[_name] = np.concatenate(([0],np.cumsum(_lengths)))
+
+## the first day of the gregorian calendar. earlier dates of the standard
+## calendar are julian dates.
+_gregorian_start = np.datetime64('1582-10-15','D')
+
+
+def decode(values,units,calendar='standard'):
+    '''
+    Decode numeric time values into integer date parts without creating Python
+    date objects. Microseconds are truncated as with :meth:`~ocgis.interface.nc.dimension.NcTemporalDimension.get_datetime`.
+    
+    >>> decode([0.5,31],'days since 2000-01-01','noleap')
+    array([[2000,    1,    1,   12,    0,    0,    0],
+           [2000,    2,    1,    0,    0,    0,    0]])
+    
+    :param values: Time values with any shape.
+    :type values: numpy.ndarray
+    :param units: CF time units (i.e. "days since 2000-01-01 00:00:00").
+    :type units: str
+    :param calendar: A CF calendar name. Supported calendars are `standard`,
+     `gregorian`, `proleptic_gregorian`, `noleap`, `365_day`, `all_leap`,
+     `366_day`, and `360_day`.
+    :type calendar: str
+    :returns: Integer array with shape `values.shape + (7,)`. The last axis
+     follows :attr:`ocgis.util.dates.date_parts`.
+    :rtype: numpy.ndarray
+    :raises: NotImplementedError
+    '''
+    calendar = (calendar or 'standard').lower()
+    factor,ref = _parse_units_(units)
+    values = np.asarray(values)
+    if values.dtype.kind not in 'iuf':
+        raise(NotImplementedError('time values must be numeric'))
+    ## offsets from the reference date in microseconds. offsets are rounded to
+    ## the millisecond to absorb floating point error in the time values.
+    offsets = (np.round(values.astype(np.float64)*(factor/1000.))*1000).astype(np.int64)
+    
+    ret = np.empty(values.shape+(len(date_parts),),dtype=int)
+    if calendar in ('standard','gregorian','proleptic_gregorian'):
+        ref = np.datetime64('{0:04d}-{1:02d}-{2:02d}'.format(*ref[0:3]),'us') + \
+              np.timedelta64(ref[3]*3600*1000000+ref[4]*60*1000000+ref[5],'us')
+        dt = ref + offsets.astype('m8[us]')
+        if calendar != 'proleptic_gregorian' and dt.size > 0 and \
+           (min(ref,dt.min()) < _gregorian_start):
+            raise(NotImplementedError('mixed julian/gregorian dates are not supported'))
+        days = dt.astype('M8[D]')
+        months = dt.astype('M8[M]')
+        ret[...,0] = months.astype(np.int64)//12 + 1970
+        ret[...,1] = months.astype(np.int64)%12 + 1
+        ret[...,2] = (days - months.astype('M8[D]')).astype(np.int64) + 1
+        remainder = (dt - days).astype(np.int64)
+    elif calendar in _fixed_calendars:
+        cum = _fixed_calendars[calendar]
+        ndays = cum[-1]
+        year,month,day = ref[0:3]
+        if month < 1 or month > 12 or day < 1 or day > cum[month] - cum[month-1]:
+            raise(NotImplementedError('invalid reference date for calendar {0}: {1}'.format(calendar,units)))
+        ordinal = year*ndays + cum[month-1] + day - 1
+        total = offsets + ref[3]*3600*1000000 + ref[4]*60*1000000 + ref[5]
+        days = ordinal + total//_day
+        ret[...,0] = days//ndays
+        day_of_year = days%ndays
+        month_idx = np.searchsorted(cum,day_of_year,side='right')
+        ret[...,1] = month_idx
+        ret[...,2] = day_of_year - cum[month_idx-1] + 1
+        remainder = total%_day
+    else:
+        raise(NotImplementedError('calendar not supported: {0}'.format(calendar)))
+    seconds = remainder//1000000
+    ret[...,3] = seconds//3600
+    ret[...,4] = (seconds%3600)//60
+    ret[...,5] = seconds%60
+    ret[...,6] = 0
+    return(ret)
+
+def get_datetime(parts):
+    '''
+    Convert date parts to :class:`datetime.datetime` objects.
+    
+    :param parts: Date parts as returned by :func:`~ocgis.util.dates.decode`.
+    :type parts: numpy.ndarray
+    :rtype: numpy.ndarray of objects
+    :raises: ValueError
+    '''
+    dt = _get_datetime64_(parts)
+    ret = np.empty(dt.shape,dtype=object)
+    ret[...] = dt.astype(datetime.datetime)
+    return(ret)
+
+def get_strings(parts):
+    '''
+    Format date parts as :func:`str` formats the :class:`datetime.datetime`
+    objects returned by :func:`get_datetime` without creating them.
+    
+    >>> get_strings(decode([0.5],'days since 2000-01-01'))
+    array(['2000-01-01 12:00:00'], dtype='|S19')
+    
+    :param parts: Date parts as returned by :func:`~ocgis.util.dates.decode`.
+    :type parts: numpy.ndarray
+    :rtype: numpy.ndarray of strings
+    :raises: ValueError
+    '''
+    ret = np.datetime_as_string(_get_datetime64_(parts),unit='s').astype(str)
+    return(np.char.replace(ret,'T',' '))
+
+def _get_datetime64_(parts):
+    parts = np.asarray(parts)
+    months = (parts[...,0]-1970)*12 + parts[...,1] - 1
+    dt = months.astype('M8[M]').astype('M8[D]') + (parts[...,2]-1).astype('m8[D]')
+    ## days not in the gregorian calendar (i.e. February 30) roll into the next
+    ## month and are rejected as datetime does
+    invalid = dt.astype('M8[M]').astype(np.int64) != months
+    if np.any(invalid):
+        bad = parts[invalid][0]
+        raise(ValueError('day is out of range for month: {0}'.format(tuple(bad[0:3]))))
+    seconds = parts[...,3]*3600 + parts[...,4]*60 + parts[...,5]
+    return(dt.astype('M8[s]') + seconds.astype('m8[s]'))
+
+def get_parts(datetimes):
+    '''
+    :param datetimes: Array of :class:`datetime.datetime` objects.
+    :type datetimes: numpy.ndarray
+    :returns: Date parts as returned by :func:`~ocgis.util.dates.decode`.
+    :rtype: numpy.ndarray
+    '''
+    datetimes = np.asarray(datetimes)
+    ret = np.empty(datetimes.shape+(len(date_parts),),dtype=int)
+    for idx in np.ndindex(*datetimes.shape):
+        dt = datetimes[idx]
+        ret[idx] = [getattr(dt,part) for part in date_parts]
+    return(ret)
+
+def get_group_names(grouping):
+    '''
+    :param grouping: The grouped parts. Sequences of months are custom seasons.
+    :type grouping: sequence
+    :returns: The names of the grouped parts with custom seasons named `season`.
+    :rtype: set
+    '''
+    ret = set([part for part in grouping if isinstance(part,basestring)])
+    if len(ret) < len(grouping):
+        ret.add('season')
+    return(ret)
+
+def get_seasons(grouping):
+    '''
+    >>> get_seasons([[6,7,8,9],[12,1,2],'year'])
+    ((6, 7, 8, 9), (12, 1, 2))
+    
+    :param grouping: The grouped parts. Sequences of months are custom seasons.
+    :type grouping: sequence
+    :returns: The months of each season in `grouping` or None if seasons are
+     not grouped. The `season` grouping is :attr:`~ocgis.util.dates.default_seasons`.
+    :rtype: tuple of tuples
+    '''
+    ret = tuple([tuple(part) for part in grouping if not isinstance(part,basestring)])
+    if len(ret) == 0:
+        ret = default_seasons if 'season' in grouping else None
+    return(ret)
+
+def get_season_tables(seasons):
+    '''
+    >>> number,offset = get_season_tables([[11,12,1],[6,7,8]])
+    >>> number.tolist()
+    [0, 1, 0, 0, 0, 0, 2, 2, 2, 0, 0, 1, 1]
+    
+    :param seasons: The months of each season as returned by :func:`~ocgis.util.dates.get_seasons`.
+    :type seasons: sequence of sequences
+    :returns: Arrays indexed by month holding the season number of each month
+     (zero if the month is not in a season) and one for months counted
+     toward the next year's season.
+    :rtype: tuple of numpy.ndarray
+    '''
+    number = np.zeros(13,dtype=int)
+    offset = np.zeros(13,dtype=int)
+    for idx,months in enumerate(seasons,start=1):
+        number[list(months)] = idx
+        ## seasons crossing the year are labeled by the year they end
+        for pos in range(1,len(months)):
+            if months[pos] < months[pos-1]:
+                offset[list(months[:pos])] = 1
+                break
+    return(number,offset)
+
+def get_group_columns(parts,grouping):
+    '''
+    Compute the integer value of each grouped part for each time step. In
+    addition to :attr:`~ocgis.util.dates.date_parts`, `grouping` may contain:
+    
+    * `season`: DJF, MAM, JJA, and SON are seasons 1 through 4. When grouped
+      with `year`, December counts toward the next year's DJF.
+    * Sequences of months: Custom seasons numbered in order starting at 1,
+      e.g. `[[12,1,2],[6,7,8,9]]`. Seasons crossing the year are labeled by
+      the year they end. Months not in a season are season 0.
+    * `water_year`: October through September labeled by the ending year.
+    * `pentad`: Five-day periods of the year numbered 1 through 73. February
+      29 falls in pentad 12.
+    
+    >>> parts = decode([0,31,334],'days since 2000-12-01','noleap')
+    >>> get_group_columns(parts,['season','year'])
+    (['year', 'season'], array([[2001,    1],
+           [2001,    1],
+           [2001,    4]]))
+    
+    :param parts: Date parts as returned by :func:`~ocgis.util.dates.decode`.
+    :type parts: numpy.ndarray
+    :param grouping: The grouped parts.
+    :type grouping: sequence of str or sequences of int
+    :returns: The grouped parts ordered by :attr:`~ocgis.util.dates.group_parts`
+     and an integer array with a column for each part.
+    :rtype: tuple
+    :raises: ValueError
+    '''
+    seasons = get_seasons(grouping)
+    grouping = get_group_names(grouping)
+    unknown = grouping.difference(group_parts)
+    if len(unknown) > 0:
+        raise(ValueError('grouping not supported: {0}'.format(sorted(unknown))))
+    year = parts[:,0]
+    month = parts[:,1]
+    if seasons is not None:
+        season_number,season_offset = get_season_tables(seasons)
+    names = [name for name in group_parts if name in grouping]
+    columns = np.empty((parts.shape[0],len(names)),dtype=int)
+    for idx,name in enumerate(names):
+        if name == 'year':
+            if seasons is not None:
+                columns[:,idx] = year + season_offset[month]
+            else:
+                columns[:,idx] = year
+        elif name == 'water_year':
+            columns[:,idx] = year + (month >= 10)
+        elif name == 'season':
+            columns[:,idx] = season_number[month]
+        elif name == 'pentad':
+            ## the leap day shares the pentad of February 28
+            cum = _fixed_calendars['noleap']
+            day = np.where(month == 2,np.minimum(parts[:,2],28),parts[:,2])
+            columns[:,idx] = (cum[month-1] + day - 1)//5 + 1
+        else:
+            columns[:,idx] = parts[:,date_parts.index(name)]
+    return(names,columns)
+
+def get_pentad_center(pentad):
+    '''
+    :param pentad: Pentad numbers as returned by :func:`~ocgis.util.dates.get_group_columns`.
+    :type pentad: numpy.ndarray
+    :returns: The month and day of the third day of each pentad.
+    :rtype: tuple of numpy.ndarray
+    '''
+    cum = _fixed_calendars['noleap']
+    day_of_year = (np.asarray(pentad)-1)*5 + 2
+    month = np.searchsorted(cum,day_of_year,side='right')
+    day = day_of_year - cum[month-1] + 1
+    return(month,day)
+
+def _parse_units_(units):
+    match = _re_units.match(units)
+    if match is None:
+        raise(NotImplementedError('time units not supported: {0}'.format(units)))
+    groups = match.groups()
+    try:
+        factor = _unit_factors[groups[0].lower()]
+    except KeyError:
+        raise(NotImplementedError('time units not supported: {0}'.format(units)))
+    year,month,day = [int(g) for g in groups[1:4]]
+    hour = int(groups[4] or 0)
+    minute = int(groups[5] or 0)
+    ## seconds of the reference date are kept in microseconds
+    microseconds = int(round(float(groups[6] or 0)*1000000))
+    return(factor,(year,month,day,hour,minute,microseconds))
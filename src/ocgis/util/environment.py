@@ -3,6 +3,8 @@ import os
 from ocgis.interface.projection import WGS84
 from ocgis.exc import OcgisEnvironmentError
 from ocgis.util.logging_ocgis import ocgis_lh
+from ocgis.util.cache import temporal_cache, area_cache, neighbor_cache,\
+    projection_cache, mfindex_cache
 
 
 class Environment(object):
@@ -25,9 +27,15 @@ class Environment(object):
         self.DEBUG = EnvParm('DEBUG',False,formatter=self._format_bool_)
         self.REFERENCE_PROJECTION = ReferenceProjection()
         self.DIR_BIN = EnvParm('DIR_BIN',None)
+        self.DIR_CACHE = EnvParm('DIR_CACHE',None)
+        self.MEMORY_LIMIT = EnvParm('MEMORY_LIMIT',None,formatter=int)
+        self.TIME_CHUNK_SIZE = EnvParm('TIME_CHUNK_SIZE',None,formatter=int)
+        self.MAX_OPEN_FILES = EnvParm('MAX_OPEN_FILES',32,formatter=int)
+        self.USE_MEMMAP = EnvParm('USE_MEMMAP',False,formatter=self._format_bool_)
+        self.PREFETCH = EnvParm('PREFETCH',0,formatter=int)
+        self.SPHERICAL_WEIGHTS = EnvParm('SPHERICAL_WEIGHTS',False,formatter=self._format_bool_)
         
         self.ops = None
-        self._optimize_store = {}
         
     def __str__(self):
         msg = []
@@ -46,7 +54,7 @@ class Environment(object):
         return(ret)
     
     def __setattr__(self,name,value):
-        if isinstance(value,EnvParm) or name in ['ops','_optimize_store']:
+        if isinstance(value,EnvParm) or name in ['ops']:
             object.__setattr__(self,name,value)
         else:
             attr = object.__getattribute__(self,name)
@@ -60,7 +68,11 @@ class Environment(object):
                 value._value = 'use_env'
                 getattr(value,'value')
         env.ops = None
-        self._optimize_store = {}
+        temporal_cache.clear()
+        area_cache.clear()
+        neighbor_cache.clear()
+        projection_cache.clear()
+        mfindex_cache.clear()
                 
     def _format_bool_(self,value):
         '''Format a string to boolean.
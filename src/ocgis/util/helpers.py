@@ -246,7 +246,8 @@ def iter_array(arr,use_mask=True,return_value=False):
         arr = np.array(arr,ndmin=1)
         shp = arr.shape
     iter_args = [range(0,ii) for ii in shp]
-    if use_mask and not np.ma.isMaskedArray(arr):
+    ## geometry arrays of spatial vectors are masked but are not numpy arrays
+    if use_mask and not np.ma.isMaskedArray(arr) and not hasattr(arr,'mask'):
         use_mask = False
     else:
         try:
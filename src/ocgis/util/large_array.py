@@ -3,11 +3,15 @@ from ocgis.calc import tile
 import netCDF4 as nc
 from ocgis.util.helpers import ProgressBar
 from ocgis.interface.nc.dataset import NcDataset
+from ocgis.interface.nc.chunking import get_chunk_shape
+from ocgis.util.prefetch import prefetch
+from ocgis.interface.nc.pool import nc_lock
 from ocgis.api.collection import CalcCollection, MultivariateCalcCollection
 from ocgis.api.request import RequestDatasetCollection
 
 
-def compute(dataset,calc,calc_grouping,tile_dimension,verbose=False,prefix=None):
+def compute(dataset,calc,calc_grouping,tile_dimension,verbose=False,prefix=None,
+            dir_output=None):
     '''
     :type dataset: RequestDatasetCollection
     '''
@@ -22,16 +26,14 @@ def compute(dataset,calc,calc_grouping,tile_dimension,verbose=False,prefix=None)
     ocgis.env.OPTIMIZE_FOR_CALC = False
     
     try:
-        ## load some data into the optimize store
-        print('loading into optimize store...')
+        ## decode the time axes once. tiles read them from the temporal cache.
+        if verbose: print('loading into temporal cache...')
         for rd in dataset:
             if verbose: print('request dataset',rd.alias)
-            ocgis.env._optimize_store[rd.alias] = {}
-            ocgis.env._optimize_store[rd.alias]['_value_datetime'] = rd.ds.temporal.value_datetime
-            ocgis.env._optimize_store[rd.alias]['_bounds_datetime'] = rd.ds.temporal.bounds_datetime
+            rd.ds.temporal.value_datetime
+            rd.ds.temporal.bounds_datetime
             if calc_grouping is not None:
                 rd.ds.temporal.set_grouping(calc_grouping)
-                ocgis.env._optimize_store[rd.alias]['group'] = rd.ds.temporal.group
             rd._ds = None
         
         ## tell the software we are optimizing for calculations   
@@ -39,12 +41,18 @@ def compute(dataset,calc,calc_grouping,tile_dimension,verbose=False,prefix=None)
         ods = NcDataset(request_dataset=dataset[0])
         shp = ods.spatial.grid.shape
 
+        ## align tiles with the spatial chunks of the first variable
+        chunks = get_chunk_shape(ods._get_variable_(dataset[0].variable))
+        if chunks is not None:
+            chunks = chunks[-2:]
+        
         if verbose: print('getting schema...')
-        schema = tile.get_tile_schema(shp[0],shp[1],tile_dimension)
+        schema = tile.get_tile_schema(shp[0],shp[1],tile_dimension,chunks=chunks)
         if verbose: print('getting fill file...')
         fill_file = ocgis.OcgOperations(dataset=dataset,file_only=True,
                                       calc=calc,calc_grouping=calc_grouping,
-                                      output_format='nc',prefix=prefix).execute()
+                                      output_format='nc',prefix=prefix,
+                                      dir_output=dir_output).execute()
         if verbose: print('output file is: {0}'.format(fill_file))
         if verbose:
             lschema = len(schema)
@@ -52,26 +60,39 @@ def compute(dataset,calc,calc_grouping,tile_dimension,verbose=False,prefix=None)
         fds = nc.Dataset(fill_file,'a')
         if verbose:
             progress = ProgressBar('tiles progress')
-        for ctr,indices in enumerate(schema.itervalues(),start=1):
-            row = indices['row']
-            col = indices['col']
-            ret = ocgis.OcgOperations(dataset=dataset,slice=[None,row,col],
-                                calc=calc,calc_grouping=calc_grouping).execute()
-            for vref,v in iter_variable_values(ret[1],fds):
-                if len(vref.shape) == 3:
-                    vref[:,row[0]:row[1],col[0]:col[1]] = v
-                elif len(vref.shape) == 4:
-                    vref[:,:,row[0]:row[1],col[0]:col[1]] = v
+        
+        def _iter_tiles_():
+            for indices in schema.itervalues():
+                row = indices['row']
+                col = indices['col']
+                ## leveled datasets require a level slice
+                if ods.level is None:
+                    slc = [None,row,col]
                 else:
-                    raise(NotImplementedError(vref.shape))
-                fds.sync()
+                    slc = [None,None,row,col]
+                ret = ocgis.OcgOperations(dataset=dataset,slice=slc,
+                                    calc=calc,calc_grouping=calc_grouping).execute()
+                yield(row,col,ret)
+        
+        ## the next tiles are read and calculated in the background while the
+        ## current tile is written
+        for ctr,(row,col,ret) in enumerate(prefetch(_iter_tiles_(),ocgis.env.PREFETCH),start=1):
+            ## writes are serialized with reads in the prefetch thread
+            with nc_lock:
+                for vref,v in iter_variable_values(ret[1],fds):
+                    if len(vref.shape) == 3:
+                        vref[:,row[0]:row[1],col[0]:col[1]] = v
+                    elif len(vref.shape) == 4:
+                        vref[:,:,row[0]:row[1],col[0]:col[1]] = v
+                    else:
+                        raise(NotImplementedError(vref.shape))
+                    fds.sync()
             if verbose:
                 progress.progress(int((float(ctr)/lschema)*100))
                 
         fds.close()
     finally:
         ocgis.env.OPTIMIZE_FOR_CALC = orig_oc
-        ocgis.env._optimize_store = {}
     if verbose:
         progress.endProgress()
         print('complete.')
@@ -0,0 +1,71 @@
+import sys
+import threading
+from Queue import Queue, Full, Empty
+
+
+## marks the end of the background iteration
+_done = object()
+
+
+def prefetch(iterable,n):
+    '''
+    Yield the elements of `iterable` while a background thread computes up to
+    `n` elements ahead of the consumer. Exceptions raised by `iterable` are
+    re-raised in the consuming thread with their original traceback.
+    
+    >>> list(prefetch(iter([1,2,3]),2))
+    [1, 2, 3]
+    
+    :param iterable: The elements to compute in the background.
+    :type iterable: iterable
+    :param n: The maximum number of computed elements waiting for the consumer.
+     If less than one, `iterable` is consumed in the calling thread.
+    :type n: int
+    '''
+    if n is None or n < 1:
+        for element in iterable:
+            yield(element)
+        return
+    
+    queue = Queue(maxsize=n)
+    stop = threading.Event()
+    
+    def _put_(item):
+        ## wake periodically to exit if the consumer stopped iterating
+        while not stop.is_set():
+            try:
+                queue.put(item,timeout=0.1)
+                return(True)
+            except Full:
+                continue
+        return(False)
+    
+    def _worker_():
+        try:
+            for element in iterable:
+                if not _put_((True,element)):
+                    return
+        except:
+            _put_((False,sys.exc_info()))
+        else:
+            _put_((True,_done))
+    
+    thread = threading.Thread(target=_worker_,name='ocgis-prefetch')
+    thread.daemon = True
+    thread.start()
+    try:
+        while True:
+            try:
+                ok,element = queue.get(timeout=0.1)
+            except Empty:
+                if not thread.is_alive() and queue.empty():
+                    raise(RuntimeError('prefetch thread exited unexpectedly'))
+                continue
+            if not ok:
+                raise element[0],element[1],element[2]
+            if element is _done:
+                break
+            yield(element)
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,40 @@
+import numpy as np
+from ocgis.util.cache import area_cache, get_array_digest
+
+
+def get_cell_areas(row_bounds,column_bounds,spherical=False):
+    '''
+    Compute the area of each cell of a rectilinear grid from its bounds. Results
+    are cached by the values of the bounds and are read-only.
+    
+    >>> get_cell_areas(np.array([[0.,1.],[1.,3.]]),np.array([[0.,2.]]))
+    array([[2.],
+           [4.]])
+    
+    :param row_bounds: Row bounds with shape `(nrow,2)`. Latitudes in degrees if
+     `spherical` is True.
+    :type row_bounds: numpy.ndarray
+    :param column_bounds: Column bounds with shape `(ncol,2)`. Longitudes in
+     degrees if `spherical` is True.
+    :type column_bounds: numpy.ndarray
+    :param spherical: If True, return areas on the unit sphere in steradians.
+     Otherwise, return planar areas in squared coordinate units.
+    :type spherical: bool
+    :rtype: numpy.ndarray
+    '''
+    key = (get_array_digest(row_bounds),get_array_digest(column_bounds),bool(spherical))
+    ret = area_cache.get(key)
+    if ret is None:
+        row_bounds = np.asarray(row_bounds,dtype=float)
+        column_bounds = np.asarray(column_bounds,dtype=float)
+        width = np.abs(column_bounds[:,1] - column_bounds[:,0])
+        if spherical:
+            lat = np.radians(np.clip(row_bounds,-90.,90.))
+            height = np.abs(np.sin(lat[:,1]) - np.sin(lat[:,0]))
+            width = np.radians(width)
+        else:
+            height = np.abs(row_bounds[:,1] - row_bounds[:,0])
+        ret = np.outer(height,width)
+        ret.flags.writeable = False
+        area_cache[key] = ret
+    return(ret)
@@ -0,0 +1,257 @@
+from abc import ABCMeta, abstractmethod, abstractproperty
+import numpy as np
+from shapely.geometry.point import Point
+from ocgis.util.helpers import make_poly
+
+
+class GeometryArray(object):
+    '''
+    A two-dimensional masked array of grid geometries. Geometries are built
+    from the grid coordinates when an element is accessed and are not stored
+    unless assigned. Slicing returns a new array sharing the coordinates.
+    
+    The array follows :class:`numpy.ma.MaskedArray` for the operations used on
+    spatial vectors: element access returns :attr:`numpy.ma.masked` for masked
+    elements, :attr:`mask` is a boolean array, and :meth:`compressed` returns
+    the unmasked geometries.
+    
+    :param mask: The initial mask. Defaults to no masked elements.
+    :type mask: numpy.ndarray
+    '''
+    __metaclass__ = ABCMeta
+    
+    def __init__(self,mask=None):
+        self._mask = np.zeros(self.shape,dtype=bool)
+        if mask is not None:
+            self._mask[:] = mask
+        ## geometries assigned to elements (i.e. clipped or wrapped geometries)
+        self._assigned = {}
+    
+    def __getitem__(self,idx):
+        rslc,cslc = self._get_index_(idx)
+        if isinstance(rslc,int) and isinstance(cslc,int):
+            if self._mask[rslc,cslc]:
+                ret = np.ma.masked
+            else:
+                ret = self._get_element_(rslc,cslc)
+        else:
+            ret = self._get_slice_(self._as_slice_(rslc),self._as_slice_(cslc))
+            ## an integer index removes a dimension as with numpy
+            if isinstance(rslc,int):
+                ret = ret.to_masked_array()[0,:]
+            elif isinstance(cslc,int):
+                ret = ret.to_masked_array()[:,0]
+        return(ret)
+    
+    def __iter__(self):
+        for ii in range(self.shape[0]):
+            yield(self[ii])
+    
+    def __len__(self):
+        return(self.shape[0])
+    
+    def __setitem__(self,idx,geom):
+        rslc,cslc = self._get_index_(idx)
+        if not isinstance(rslc,int) or not isinstance(cslc,int):
+            raise(NotImplementedError('Only single elements may be assigned.'))
+        self._assigned[(rslc,cslc)] = geom
+    
+    @property
+    def flat(self):
+        for ii in range(self.shape[0]):
+            for jj in range(self.shape[1]):
+                yield(self[ii,jj])
+    
+    @property
+    def mask(self):
+        return(self._mask)
+    @mask.setter
+    def mask(self,value):
+        self._mask[:] = value
+    
+    @property
+    def ndim(self):
+        return(2)
+    
+    @abstractproperty
+    def shape(self): tuple
+    
+    @property
+    def size(self):
+        return(self.shape[0]*self.shape[1])
+    
+    def compressed(self):
+        '''
+        :returns: The unmasked geometries in row-major order.
+        :rtype: numpy.ndarray of objects
+        '''
+        ii,jj = np.nonzero(np.logical_not(self._mask))
+        ret = np.empty(ii.shape[0],dtype=object)
+        for idx in range(ii.shape[0]):
+            ret[idx] = self._get_element_(ii[idx],jj[idx])
+        return(ret)
+    
+    def flatten(self):
+        return(self.to_masked_array().flatten())
+    
+    def to_masked_array(self):
+        '''
+        :returns: A masked object array holding a geometry for every element.
+        :rtype: :class:`numpy.ma.MaskedArray`
+        '''
+        ret = np.empty(self.shape,dtype=object)
+        for ii in range(self.shape[0]):
+            for jj in range(self.shape[1]):
+                ret[ii,jj] = self._get_element_(ii,jj)
+        return(np.ma.array(ret,mask=self._mask.copy()))
+    
+    @abstractmethod
+    def _build_(self,ii,jj):
+        '''Build the geometry of a single element.'''
+    
+    def _get_element_(self,ii,jj):
+        try:
+            ret = self._assigned[(ii,jj)]
+        except KeyError:
+            ret = self._build_(ii,jj)
+        return(ret)
+    
+    def _get_index_(self,idx):
+        if not isinstance(idx,tuple):
+            idx = (idx,)
+        if len(idx) > 2:
+            raise(IndexError('too many indices'))
+        idx = idx + (slice(None),)*(2-len(idx))
+        ret = []
+        for ii,size in zip(idx,self.shape):
+            if isinstance(ii,slice):
+                ret.append(ii)
+            elif isinstance(ii,(int,long,np.integer)):
+                ii = int(ii)
+                if ii < 0:
+                    ii += size
+                if ii < 0 or ii >= size:
+                    raise(IndexError('index out of bounds'))
+                ret.append(ii)
+            else:
+                raise(NotImplementedError('Geometry arrays are indexed by integers and slices.'))
+        return(ret)
+    
+    def _as_slice_(self,idx):
+        if isinstance(idx,int):
+            idx = slice(idx,idx+1)
+        return(idx)
+    
+    def _get_slice_(self,rslc,cslc):
+        ret = self._slice_(rslc,cslc)
+        ret._mask = self._mask[rslc,cslc].copy()
+        ## carry the assigned geometries to their new positions
+        if len(self._assigned) > 0:
+            rmap = dict([(old,new) for new,old in enumerate(np.arange(self.shape[0])[rslc])])
+            cmap = dict([(old,new) for new,old in enumerate(np.arange(self.shape[1])[cslc])])
+            for (ii,jj),geom in self._assigned.iteritems():
+                if ii in rmap and jj in cmap:
+                    ret._assigned[(rmap[ii],cmap[jj])] = geom
+        return(ret)
+    
+    @abstractmethod
+    def _slice_(self,rslc,cslc):
+        '''Return a new array of the same type over the sliced coordinates.'''
+
+
+class PolygonArray(GeometryArray):
+    '''
+    Grid cell polygons backed by row and column bounds.
+    
+    :param row_bounds: Row bounds with shape `(nrow,2)`.
+    :type row_bounds: numpy.ndarray
+    :param column_bounds: Column bounds with shape `(ncol,2)`.
+    :type column_bounds: numpy.ndarray
+    :param mask: See :class:`GeometryArray`.
+    '''
+    
+    def __init__(self,row_bounds,column_bounds,mask=None):
+        self.row_bounds = row_bounds
+        self.column_bounds = column_bounds
+        super(PolygonArray,self).__init__(mask=mask)
+    
+    @property
+    def shape(self):
+        return(self.row_bounds.shape[0],self.column_bounds.shape[0])
+    
+    def _build_(self,ii,jj):
+        return(make_poly(self.row_bounds[ii,:],self.column_bounds[jj,:]))
+    
+    def _slice_(self,rslc,cslc):
+        return(self.__class__(self.row_bounds[rslc],self.column_bounds[cslc]))
+
+
+class ClippedPolygonArray(PolygonArray):
+    '''
+    Grid cell polygons intersected with a selection geometry. Only cells crossed
+    by the boundary of the selection geometry are intersected.
+    
+    :param row_bounds: See :class:`PolygonArray`.
+    :param column_bounds: See :class:`PolygonArray`.
+    :param index: The indexed selection geometry.
+    :type index: :class:`~ocgis.util.spatial.index.GeometryIndex`
+    :param clipped: True for cells to intersect with the selection geometry.
+    :type clipped: numpy.ndarray
+    :param mask: See :class:`GeometryArray`.
+    '''
+    
+    def __init__(self,row_bounds,column_bounds,index,clipped,mask=None):
+        self.index = index
+        self.clipped = clipped
+        super(ClippedPolygonArray,self).__init__(row_bounds,column_bounds,mask=mask)
+    
+    def _build_(self,ii,jj):
+        ret = super(ClippedPolygonArray,self)._build_(ii,jj)
+        if self.clipped[ii,jj]:
+            ret = self.index.intersection(ret)
+        return(ret)
+    
+    def _slice_(self,rslc,cslc):
+        return(self.__class__(self.row_bounds[rslc],self.column_bounds[cslc],
+                              self.index,self.clipped[rslc,cslc]))
+
+
+class PointArray(GeometryArray):
+    '''
+    Grid points backed by two-dimensional coordinate arrays.
+    
+    :param x: The x-coordinate of each point.
+    :type x: numpy.ndarray
+    :param y: The y-coordinate of each point with the shape of `x`.
+    :type y: numpy.ndarray
+    :param mask: See :class:`GeometryArray`.
+    '''
+    
+    def __init__(self,x,y,mask=None):
+        self.x = x
+        self.y = y
+        super(PointArray,self).__init__(mask=mask)
+    
+    @classmethod
+    def from_vectors(cls,row,column,mask=None):
+        '''
+        :param row: Row coordinates.
+        :type row: numpy.ndarray
+        :param column: Column coordinates.
+        :type column: numpy.ndarray
+        :returns: Points at every combination of `row` and `column`. The
+         coordinates are broadcast views of the vectors.
+        :rtype: :class:`PointArray`
+        '''
+        y,x = np.broadcast_arrays(np.asarray(row).reshape(-1,1),np.asarray(column).reshape(1,-1))
+        return(cls(x,y,mask=mask))
+    
+    @property
+    def shape(self):
+        return(self.x.shape)
+    
+    def _build_(self,ii,jj):
+        return(Point(self.x[ii,jj],self.y[ii,jj]))
+    
+    def _slice_(self,rslc,cslc):
+        return(self.__class__(self.x[rslc,cslc],self.y[rslc,cslc]))
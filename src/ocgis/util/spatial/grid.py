@@ -0,0 +1,273 @@
+import itertools
+import numpy as np
+from shapely.geometry import Polygon, MultiPolygon, box
+from shapely.geometry.polygon import orient
+from ocgis.util.spatial.index import GeometryIndex, get_segments
+
+
+## cell classes returned by classify_cells
+OUTSIDE = 0
+INSIDE = 1
+BOUNDARY = 2
+
+
+def classify_cells(polygon,row_bounds,column_bounds,index=None):
+    '''
+    Classify the cells of a rectilinear grid against a selection geometry. A
+    cell is selected if its interior intersects the interior of `polygon`.
+    
+    The boundary of a polygonal selection geometry is rasterized onto the grid
+    by cutting its segments into pieces shorter than the smallest cell. Cells
+    not touched by the boundary are entirely inside or outside the polygon and
+    share the state of their neighbors along a row. One point is tested per
+    run of such cells and exact shapely tests are performed only for the cells
+    touched by the boundary. No geometry objects are created for the other
+    cells.
+    
+    >>> classify_cells(make_poly((0,2),(0,2)),np.array([[0,1],[1,2],[2,3]]),np.array([[0,1],[1,2]]))
+    array([[1, 1],
+           [1, 1],
+           [0, 0]], dtype=int8)
+    
+    :param polygon: The selection geometry.
+    :type polygon: :class:`shapely.geometry.Polygon` or :class:`shapely.geometry.MultiPolygon`
+    :param row_bounds: Row bounds with shape `(nrow,2)`.
+    :type row_bounds: numpy.ndarray
+    :param column_bounds: Column bounds with shape `(ncol,2)`.
+    :type column_bounds: numpy.ndarray
+    :param index: An index of `polygon` to use for the exact tests.
+    :type index: :class:`~ocgis.util.spatial.index.GeometryIndex`
+    :returns: An array with shape `(nrow,ncol)` holding :attr:`OUTSIDE`,
+     :attr:`INSIDE`, or :attr:`BOUNDARY` for each cell. Selected cells not
+     entirely covered by `polygon` are :attr:`BOUNDARY`.
+    :rtype: numpy.ndarray
+    '''
+    row_bounds = np.asarray(row_bounds,dtype=float)
+    column_bounds = np.asarray(column_bounds,dtype=float)
+    ## order the cells along each axis by their lower bounds
+    rlower,rupper,rorder,rcontiguous = _get_axis_(row_bounds)
+    clower,cupper,corder,ccontiguous = _get_axis_(column_bounds)
+    shape = (rlower.shape[0],clower.shape[0])
+    classes = np.empty(shape,dtype=np.int8)
+    if classes.size == 0:
+        return(classes)
+    
+    if index is None:
+        index = GeometryIndex(polygon)
+    ordered = rcontiguous is not None and ccontiguous is not None
+    boundary = _get_boundary_(polygon,rlower,rupper,clower,cupper,ordered)
+    if ccontiguous is None:
+        ccontiguous = np.zeros(shape[1],dtype=bool)
+    
+    ## runs of cells along a row not touching the boundary. runs break at
+    ## boundary cells and at gaps between columns.
+    interior = np.logical_not(boundary)
+    start = interior.copy()
+    if shape[1] > 1:
+        start[:,1:] = np.logical_and(interior[:,1:],
+                       np.logical_or(boundary[:,:-1],np.logical_not(ccontiguous[1:])))
+    run_ii,run_jj = np.nonzero(start)
+    run_x = (clower[run_jj] + cupper[run_jj])/2.
+    run_y = (rlower[run_ii] + rupper[run_ii])/2.
+    run_inside = index.intersects_points(run_x,run_y)
+    run_id = np.cumsum(start).reshape(shape) - 1
+    classes[interior] = np.where(run_inside[run_id[interior]],INSIDE,OUTSIDE)
+    
+    ## exact tests for the boundary cells
+    ii,jj = np.nonzero(boundary)
+    bounds = np.column_stack((clower[jj],rlower[ii],cupper[jj],rupper[ii]))
+    select = index.intersects_boxes(bounds)
+    classes[ii,jj] = np.where(select,BOUNDARY,OUTSIDE)
+    for idx in np.flatnonzero(select):
+        if index.prepared.contains(box(*bounds[idx])):
+            classes[ii[idx],jj[idx]] = INSIDE
+    
+    ## return to the original cell order
+    ret = np.empty_like(classes)
+    ret[np.ix_(rorder,corder)] = classes
+    return(ret)
+
+def get_coverage_fractions(polygon,row_bounds,column_bounds):
+    '''
+    Compute the fraction of each cell of a rectilinear grid covered by a
+    polygon without intersecting geometries.
+    
+    The polygon's edges are cut at every row and column edge they cross. The
+    covered area of a cell is the integral of its edge pieces above the cell
+    bottom (Green's theorem) plus the full height of the cell for each edge
+    piece above it in the same column, accumulated by a cumulative sum down
+    each column.
+    
+    >>> get_coverage_fractions(make_poly((0,1.5),(0,1)),np.array([[0,1],[1,2]]),np.array([[0,1]]))
+    array([[1. ],
+           [0.5]])
+    
+    :param polygon: The covering geometry. Geometries without area cover
+     nothing.
+    :type polygon: :class:`shapely.geometry.Polygon` or :class:`shapely.geometry.MultiPolygon`
+    :param row_bounds: Row bounds with shape `(nrow,2)`.
+    :type row_bounds: numpy.ndarray
+    :param column_bounds: Column bounds with shape `(ncol,2)`.
+    :type column_bounds: numpy.ndarray
+    :returns: Fractions between 0 and 1 with shape `(nrow,ncol)`. Cells without
+     area have a fraction of 0.
+    :rtype: numpy.ndarray
+    '''
+    row_bounds = np.asarray(row_bounds,dtype=float)
+    column_bounds = np.asarray(column_bounds,dtype=float)
+    rlower,rupper,rorder,rcontiguous = _get_axis_(row_bounds)
+    clower,cupper,corder,ccontiguous = _get_axis_(column_bounds)
+    shape = (rlower.shape[0],clower.shape[0])
+    height = rupper - rlower
+    width = cupper - clower
+    area = np.zeros(shape,dtype=float)
+    
+    if not isinstance(polygon,(Polygon,MultiPolygon)) or area.size == 0:
+        pass
+    ## overlapping cells are intersected directly
+    elif rcontiguous is None or ccontiguous is None:
+        for ii,jj in itertools.product(range(shape[0]),range(shape[1])):
+            area[ii,jj] = polygon.intersection(box(clower[jj],rlower[ii],cupper[jj],rupper[ii])).area
+    else:
+        ## counterclockwise exteriors and clockwise interiors
+        if isinstance(polygon,MultiPolygon):
+            polygon = MultiPolygon([orient(part) for part in polygon])
+        else:
+            polygon = orient(polygon)
+        start,end = get_segments(polygon)
+        ## vertical segments enclose no area and segments below or beside the
+        ## grid do not cover any cell
+        select = np.logical_and.reduce([start[:,0] != end[:,0],
+                                        np.maximum(start[:,0],end[:,0]) > clower[0],
+                                        np.minimum(start[:,0],end[:,0]) < cupper[-1],
+                                        np.maximum(start[:,1],end[:,1]) > rlower[0]])
+        start = start[select]
+        end = end[select]
+        delta = end - start
+        
+        ## the parameters of each segment's crossings of the grid edges
+        nseg = start.shape[0]
+        seg = [np.arange(nseg),np.arange(nseg)]
+        param = [np.zeros(nseg),np.ones(nseg)]
+        for dim,edges in [(0,np.unique(np.concatenate((clower,cupper)))),
+                          (1,np.unique(np.concatenate((rlower,rupper))))]:
+            low = np.minimum(start[:,dim],end[:,dim])
+            high = np.maximum(start[:,dim],end[:,dim])
+            first = np.searchsorted(edges,low,side='right')
+            count = np.searchsorted(edges,high,side='left') - first
+            count = np.maximum(count,0)
+            crossing_seg = np.repeat(np.arange(nseg),count)
+            crossing = np.arange(crossing_seg.shape[0]) - np.repeat(np.cumsum(count)-count,count)
+            crossing = edges[np.repeat(first,count) + crossing]
+            seg.append(crossing_seg)
+            param.append((crossing - start[crossing_seg,dim])/delta[crossing_seg,dim])
+        seg = np.concatenate(seg)
+        param = np.concatenate(param)
+        order = np.lexsort((param,seg))
+        seg = seg[order]
+        param = param[order]
+        
+        ## pieces between consecutive crossings of each segment
+        same = seg[1:] == seg[:-1]
+        seg = seg[1:][same]
+        pa = param[:-1][same].reshape(-1,1)
+        pb = param[1:][same].reshape(-1,1)
+        a = start[seg] + delta[seg]*pa
+        b = start[seg] + delta[seg]*pb
+        dx = b[:,0] - a[:,0]
+        xm = (a[:,0] + b[:,0])/2.
+        ym = (a[:,1] + b[:,1])/2.
+        jj = np.searchsorted(clower,xm,side='right') - 1
+        ii = np.searchsorted(rlower,ym,side='right') - 1
+        valid = np.logical_and.reduce([dx != 0,jj >= 0,ii >= 0])
+        valid[valid] = xm[valid] <= cupper[jj[valid]]
+        dx,xm,ym,ii,jj = [arr[valid] for arr in [dx,xm,ym,ii,jj]]
+        in_row = ym <= rupper[ii]
+        
+        ## area between each piece and the bottom of its cell
+        flat = ii[in_row]*shape[1] + jj[in_row]
+        local = -dx[in_row]*(ym[in_row] - rlower[ii[in_row]])
+        area += np.bincount(flat,weights=local,minlength=area.size).reshape(shape)
+        ## pieces cover the full height of the cells below them. pieces in a
+        ## gap above a row are counted from the row above the gap.
+        position = np.where(in_row,ii,ii+1)
+        above = np.bincount(position*shape[1] + jj,weights=-dx,
+                            minlength=(shape[0]+1)*shape[1]).reshape(shape[0]+1,shape[1])
+        above = np.cumsum(above[::-1],axis=0)[::-1]
+        area += height.reshape(-1,1)*above[1:]
+    
+    cell_area = np.outer(height,width)
+    fractions = np.zeros(shape,dtype=float)
+    select = cell_area > 0
+    fractions[select] = np.clip(area[select]/cell_area[select],0.,1.)
+    ret = np.empty_like(fractions)
+    ret[np.ix_(rorder,corder)] = fractions
+    return(ret)
+
+def _get_axis_(bounds):
+    ## returns sorted lower and upper bounds, the sort order, and whether each
+    ## cell abuts the previous cell. contiguity is None if cells overlap.
+    lower = bounds.min(axis=1)
+    upper = bounds.max(axis=1)
+    order = np.argsort(lower,kind='mergesort')
+    lower = lower[order]
+    upper = upper[order]
+    contiguous = np.ones(lower.shape[0],dtype=bool)
+    if lower.shape[0] > 1:
+        if np.any(lower[1:] < upper[:-1]):
+            contiguous = None
+        else:
+            contiguous[1:] = lower[1:] == upper[:-1]
+    return(lower,upper,order,contiguous)
+
+def _get_boundary_(polygon,rlower,rupper,clower,cupper,ordered):
+    ## flags cells whose closed extent touches the boundary of the polygon
+    ret = np.zeros((rlower.shape[0],clower.shape[0]),dtype=bool)
+    rstep = (rupper - rlower).min()/2.
+    cstep = (cupper - clower).min()/2.
+    ## overlapping or degenerate cells and non-polygonal geometries are tested
+    ## exactly within the bounding box of the selection geometry
+    if not ordered or rstep <= 0 or cstep <= 0 or \
+       not isinstance(polygon,(Polygon,MultiPolygon)):
+        minx,miny,maxx,maxy = polygon.bounds
+        ridx = np.logical_and(rupper >= miny,rlower <= maxy)
+        cidx = np.logical_and(cupper >= minx,clower <= maxx)
+        ret[np.ix_(ridx,cidx)] = True
+        return(ret)
+    
+    start,end = get_segments(polygon)
+    ## segments outside the grid do not touch any cell
+    select = np.logical_and.reduce([np.maximum(start[:,0],end[:,0]) >= clower[0],
+                                    np.minimum(start[:,0],end[:,0]) <= cupper[-1],
+                                    np.maximum(start[:,1],end[:,1]) >= rlower[0],
+                                    np.minimum(start[:,1],end[:,1]) <= rupper[-1]])
+    start = start[select]
+    end = end[select]
+    if start.shape[0] == 0:
+        return(ret)
+    
+    ## cut the segments into pieces spanning at most two cells along each axis
+    delta = end - start
+    npieces = np.maximum(np.ceil(np.maximum(np.abs(delta[:,0])/cstep,
+                                            np.abs(delta[:,1])/rstep)),1).astype(int)
+    seg = np.repeat(np.arange(start.shape[0]),npieces)
+    piece = np.arange(seg.shape[0]) - np.repeat(np.cumsum(npieces) - npieces,npieces)
+    frac = (piece/npieces[seg].astype(float)).reshape(-1,1)
+    frac_next = ((piece+1)/npieces[seg].astype(float)).reshape(-1,1)
+    p0 = start[seg] + delta[seg]*frac
+    p1 = start[seg] + delta[seg]*frac_next
+    
+    ## the first and last cell overlapped by each piece
+    def _get_range_(lower,upper,low,high):
+        first = np.searchsorted(upper,low,side='left')
+        last = np.searchsorted(lower,high,side='right') - 1
+        return(first,last)
+    cfirst,clast = _get_range_(clower,cupper,np.minimum(p0[:,0],p1[:,0]),np.maximum(p0[:,0],p1[:,0]))
+    rfirst,rlast = _get_range_(rlower,rupper,np.minimum(p0[:,1],p1[:,1]),np.maximum(p0[:,1],p1[:,1]))
+    for roffset in (0,1):
+        for coffset in (0,1):
+            ii = rfirst + roffset
+            jj = cfirst + coffset
+            valid = np.logical_and(ii <= rlast,jj <= clast)
+            ret[ii[valid],jj[valid]] = True
+    return(ret)
@@ -1,138 +1,496 @@
 import numpy as np
-from shapely.geometry.multipolygon import MultiPolygon
-from ocgis.util.helpers import make_poly
+from shapely import prepared
+from shapely.geometry import Point, Polygon, box
+from shapely.ops import unary_union
+from ocgis import constants
+from ocgis.util.cache import neighbor_cache, get_array_digest
 
-    
-def shapely_grid(dim,rtup,ctup,target=None):
-    row_bounds = np.arange(rtup[0],rtup[1]+dim,dim)
-    min_row = row_bounds[0:-1]
-    max_row = row_bounds[1:]
-    row_bounds = np.hstack((min_row.reshape(-1,1),max_row.reshape(-1,1)))
-    col_bounds = np.arange(ctup[0],ctup[1]+dim,dim)
-    min_col = col_bounds[0:-1]
-    max_col = col_bounds[1:]
-    col_bounds = np.hstack((min_col.reshape(-1,1),max_col.reshape(-1,1)))
-    polygons = []
-    for ii in range(row_bounds.shape[0]):
-        rtup = (row_bounds[ii,0],row_bounds[ii,1])
-        for jj in range(col_bounds.shape[0]):
-            ctup = (col_bounds[jj,0],col_bounds[jj,1])
-            polygon = make_poly(rtup,ctup)
-            if target is not None and keep(target,polygon):
-                polygons.append(polygon)
-            elif target is None:
-                polygons.append(polygon)
-    return(MultiPolygon(polygons))
-
-
-def build_index_grid(dim,target):
-    bounds = target.bounds
-    rtup = (bounds[1],bounds[3])
-    ctup = (bounds[0],bounds[2])
-    grid = shapely_grid(float(dim),rtup,ctup,target=target)
-    return(grid)
 
-def build_index(target,grid):
-    tree = {}
-    for ii,polygon in enumerate(grid):
-        if keep(target,polygon):
-            tree.update({ii:{'box':polygon,'geom':target.intersection(polygon)}})
-    return(tree)
+class SpatialIndex(object):
+    '''
+    A packed STR (sort-tile-recursive) tree over bounding boxes. Queries are
+    performed for arrays of boxes or points at once, descending the tree one
+    level at a time for all queries.
+    
+    >>> index = SpatialIndex([[0,0,1,1],[2,2,3,3]])
+    >>> index.query_points([0.5,2.5,5],[0.5,2.5,5])
+    (array([0, 1]), array([0, 1]))
+    
+    :param bounds: Item bounding boxes with shape `(n,4)` ordered as
+     `(minx,miny,maxx,maxy)`.
+    :type bounds: numpy.ndarray
+    :param node_capacity: The maximum number of children of a node.
+    :type node_capacity: int
+    '''
+    
+    def __init__(self,bounds,node_capacity=None):
+        self.node_capacity = node_capacity or constants.spatial_index_node_capacity
+        bounds = np.asarray(bounds,dtype=float).reshape(-1,4)
+        self.bounds = bounds
+        
+        ## levels ordered from the root to the items. each level holds the
+        ## bounds of its nodes and the range of their children in the next
+        ## level.
+        self._order = self._get_str_order_(bounds)
+        level_bounds = bounds[self._order]
+        levels = [(level_bounds,None,None)]
+        while level_bounds.shape[0] > 1:
+            ## group consecutive nodes into parents and order the parents for
+            ## grouping at the next level
+            start = np.arange(0,level_bounds.shape[0],self.node_capacity)
+            count = np.minimum(self.node_capacity,level_bounds.shape[0]-start)
+            level_bounds = np.column_stack([np.minimum.reduceat(level_bounds[:,0],start),
+                                            np.minimum.reduceat(level_bounds[:,1],start),
+                                            np.maximum.reduceat(level_bounds[:,2],start),
+                                            np.maximum.reduceat(level_bounds[:,3],start)])
+            order = self._get_str_order_(level_bounds)
+            level_bounds = level_bounds[order]
+            levels.insert(0,(level_bounds,start[order],count[order]))
+        self._levels = levels
+    
+    def __len__(self):
+        return(self.bounds.shape[0])
+    
+    def query_boxes(self,bounds):
+        '''
+        :param bounds: Query boxes with shape `(n,4)`.
+        :type bounds: numpy.ndarray
+        :returns: Index arrays of the queries and the items with overlapping
+         bounding boxes. Boxes sharing only an edge overlap.
+        :rtype: tuple of numpy.ndarray
+        '''
+        bounds = np.asarray(bounds,dtype=float).reshape(-1,4)
+        if len(self) == 0:
+            empty = np.array([],dtype=int)
+            return(empty,empty)
+        
+        qidx = np.arange(bounds.shape[0])
+        nidx = np.zeros(bounds.shape[0],dtype=int)
+        for level_bounds,start,count in self._levels:
+            ref = level_bounds[nidx]
+            query = bounds[qidx]
+            hit = np.logical_and.reduce([query[:,0] <= ref[:,2],ref[:,0] <= query[:,2],
+                                         query[:,1] <= ref[:,3],ref[:,1] <= query[:,3]])
+            qidx = qidx[hit]
+            nidx = nidx[hit]
+            ## expand the overlapping nodes to their children
+            if start is not None:
+                count = count[nidx]
+                total = count.sum()
+                offsets = np.arange(total) - np.repeat(np.cumsum(count)-count,count)
+                qidx = np.repeat(qidx,count)
+                nidx = np.repeat(start[nidx],count) + offsets
+        return(qidx,self._order[nidx])
+    
+    def query_points(self,x,y):
+        '''
+        :param x: Point x-coordinates.
+        :type x: numpy.ndarray
+        :param y: Point y-coordinates.
+        :type y: numpy.ndarray
+        :returns: Index arrays of the points and the items with bounding boxes
+         covering the points.
+        :rtype: tuple of numpy.ndarray
+        '''
+        x = np.asarray(x,dtype=float).reshape(-1)
+        y = np.asarray(y,dtype=float).reshape(-1)
+        return(self.query_boxes(np.column_stack((x,y,x,y))))
+    
+    def _get_str_order_(self,bounds):
+        ## sort by the x-center into vertical slices and then by the y-center
+        ## within each slice
+        n = bounds.shape[0]
+        nnodes = int(np.ceil(n/float(self.node_capacity)))
+        nslices = max(int(np.ceil(np.sqrt(nnodes))),1)
+        slice_size = nslices*self.node_capacity
+        x = bounds[:,0] + bounds[:,2]
+        y = bounds[:,1] + bounds[:,3]
+        order = np.argsort(x,kind='mergesort')
+        slice_id = np.empty(n,dtype=int)
+        slice_id[order] = np.arange(n)//slice_size
+        return(np.lexsort((y,slice_id)))
 
-def keep(target,selection):
-    if selection.intersects(target) and not selection.touches(target):
-        ret = True
-    else:
-        ret = False
-    return(ret)
 
-def index_intersects(target,index):
-    ret = False
-    for value in index.itervalues():
-        if keep(target,value['box']):
-            if keep(target,value['geom']):
-                ret = True
-                break
-    return(ret)
+class GeometryIndex(object):
+    '''
+    A selection geometry cut into tiles indexed by a :class:`SpatialIndex`.
+    Each part of a multi-part geometry is tiled separately with a tile size
+    chosen so each tile holds roughly `vertices` vertices. Simple geometries are
+    not cut. Spatial predicates are evaluated against the few tiles near each
+    query.
+    
+    :param geom: The selection geometry.
+    :type geom: :class:`shapely.geometry.base.BaseGeometry`
+    :param vertices: The target number of vertices per tile.
+    :type vertices: int
+    '''
+    
+    def __init__(self,geom,vertices=None):
+        self.geom = geom
+        self.vertices = vertices or constants.spatial_index_vertices
+        self.pieces = []
+        for part in _get_parts_(geom):
+            self.pieces += self._get_tiles_(part)
+        self.tree = SpatialIndex([piece.bounds for piece in self.pieces])
+        self._prepared = None
+        self._prepared_pieces = None
+    
+    def __getstate__(self):
+        ## prepared geometries cannot be pickled. they are rebuilt on first use
+        ## after unpickling (i.e. in parallel worker processes).
+        state = self.__dict__.copy()
+        state['_prepared'] = None
+        state['_prepared_pieces'] = None
+        return(state)
+    
+    def __setstate__(self,state):
+        self.__dict__.update(state)
+    
+    @property
+    def prepared(self):
+        ''':rtype: :class:`shapely.prepared.PreparedGeometry`'''
+        if self._prepared is None:
+            self._prepared = prepared.prep(self.geom)
+        return(self._prepared)
+    
+    @property
+    def prepared_pieces(self):
+        ''':rtype: list of :class:`shapely.prepared.PreparedGeometry`'''
+        if self._prepared_pieces is None:
+            self._prepared_pieces = [prepared.prep(piece) for piece in self.pieces]
+        return(self._prepared_pieces)
+    
+    def intersection(self,geom):
+        '''
+        :returns: The intersection of `geom` and the selection geometry.
+        :rtype: :class:`shapely.geometry.base.BaseGeometry`
+        '''
+        _,iidx = self.tree.query_boxes(geom.bounds)
+        parts = [self.pieces[ii].intersection(geom) for ii in iidx]
+        parts = [part for part in parts if not part.is_empty]
+        if len(parts) == 1:
+            ret = parts[0]
+        elif len(parts) == 0:
+            ret = self.geom.intersection(geom)
+        else:
+            ret = unary_union(parts)
+        return(ret)
+    
+    def intersects_boxes(self,bounds):
+        '''
+        :param bounds: Boxes with shape `(n,4)`.
+        :type bounds: numpy.ndarray
+        :returns: True for each box with an interior intersecting the interior
+         of the selection geometry (i.e. intersecting and not touching).
+        :rtype: numpy.ndarray
+        '''
+        bounds = np.asarray(bounds,dtype=float).reshape(-1,4)
+        ret = np.zeros(bounds.shape[0],dtype=bool)
+        qidx,iidx = self.tree.query_boxes(bounds)
+        order = np.argsort(qidx,kind='mergesort')
+        cell = None
+        for q,ii in zip(qidx[order],iidx[order]):
+            if ret[q]:
+                continue
+            if cell is None or cell_idx != q:
+                cell = box(*bounds[q])
+                cell_idx = q
+            ref = self.prepared_pieces[ii]
+            if ref.intersects(cell) and not ref.touches(cell):
+                ret[q] = True
+        return(ret)
+    
+    def intersects_points(self,x,y):
+        '''
+        :param x: Point x-coordinates.
+        :type x: numpy.ndarray
+        :param y: Point y-coordinates.
+        :type y: numpy.ndarray
+        :returns: True for each point intersecting the selection geometry.
+        :rtype: numpy.ndarray
+        '''
+        x = np.asarray(x,dtype=float).reshape(-1)
+        y = np.asarray(y,dtype=float).reshape(-1)
+        ret = np.zeros(x.shape[0],dtype=bool)
+        qidx,iidx = self.tree.query_points(x,y)
+        ## test the candidate points of each tile together
+        order = np.argsort(iidx,kind='mergesort')
+        qidx = qidx[order]
+        iidx = iidx[order]
+        splits = np.flatnonzero(np.diff(iidx)) + 1
+        for q,ii in zip(np.split(qidx,splits),np.split(iidx,splits)):
+            if q.shape[0] == 0:
+                continue
+            piece = self.pieces[ii[0]]
+            q = q[np.logical_not(ret[q])]
+            if isinstance(piece,Polygon):
+                start,end = get_segments(piece)
+                ret[q] = get_points_in_polygon(start,end,x[q],y[q])
+            else:
+                ref = self.prepared_pieces[ii[0]]
+                ret[q] = [ref.intersects(Point(x[idx],y[idx])) for idx in q]
+        return(ret)
+    
+    def _get_tiles_(self,part):
+        if not isinstance(part,Polygon):
+            return([part])
+        nvertices = len(part.exterior.coords) + sum([len(r.coords) for r in part.interiors])
+        ntiles = int(np.ceil(np.sqrt(nvertices/float(self.vertices))))
+        if ntiles <= 1:
+            return([part])
+        minx,miny,maxx,maxy = part.bounds
+        xedges = np.linspace(minx,maxx,ntiles+1)
+        yedges = np.linspace(miny,maxy,ntiles+1)
+        ret = []
+        for ii in range(ntiles):
+            for jj in range(ntiles):
+                tile = box(xedges[jj],yedges[ii],xedges[jj+1],yedges[ii+1])
+                ret += [p for p in _get_parts_(part.intersection(tile)) if isinstance(p,Polygon)]
+        return(ret)
 
-################################################################################
 
-#sc = ShpCabinet()
+class KDTree(object):
+    '''
+    A balanced k-d tree over two-dimensional points for nearest neighbour
+    queries. Queries are performed for arrays of points at once: each query is
+    first descended to the leaf holding it, and the distance to the nearest
+    point of that leaf bounds the search of the remaining leaves through a
+    :class:`SpatialIndex` of the leaf bounding boxes.
+    
+    >>> tree = KDTree([0,1,2],[0,1,2])
+    >>> tree.query([0.9,5],[1.2,5])
+    (array([ 0.2236068 ,  4.24264069]), array([1, 2]))
+    
+    :param x: Point x-coordinates.
+    :type x: numpy.ndarray
+    :param y: Point y-coordinates.
+    :type y: numpy.ndarray
+    :param leaf_size: The maximum number of points in a leaf.
+    :type leaf_size: int
+    '''
+    
+    def __init__(self,x,y,leaf_size=None):
+        self.leaf_size = leaf_size or constants.spatial_index_leaf_size
+        self.coords = np.column_stack((np.asarray(np.ma.getdata(x),dtype=float).reshape(-1),
+                                       np.asarray(np.ma.getdata(y),dtype=float).reshape(-1)))
+        n = self.coords.shape[0]
+        depth = 0
+        while n > self.leaf_size*2**depth:
+            depth += 1
+        self.depth = depth
+        
+        ## split the points at the median of their widest axis. nodes are
+        ## numbered by level with the children of node i at 2i+1 and 2i+2.
+        order = np.arange(n)
+        starts = np.array([0])
+        ends = np.array([n])
+        split_axis = np.zeros(2**depth-1,dtype=int)
+        split_value = np.zeros(2**depth-1,dtype=float)
+        for level in range(depth):
+            mids = (starts + ends)//2
+            for idx in range(starts.shape[0]):
+                lower,mid,upper = starts[idx],mids[idx],ends[idx]
+                node = 2**level - 1 + idx
+                if upper - lower == 0:
+                    continue
+                seg = self.coords[order[lower:upper]]
+                axis = int(np.argmax(seg.max(axis=0) - seg.min(axis=0)))
+                part = np.argpartition(seg[:,axis],mid-lower)
+                order[lower:upper] = order[lower:upper][part]
+                split_axis[node] = axis
+                split_value[node] = self.coords[order[mid],axis]
+            starts = np.column_stack((starts,mids)).reshape(-1)
+            ends = np.column_stack((mids,ends)).reshape(-1)
+        self._order = order
+        self._split_axis = split_axis
+        self._split_value = split_value
+        self._leaf_start = starts
+        self._leaf_count = ends - starts
+        
+        ## bounding boxes of the leaves. empty leaves are never intersected.
+        bounds = np.empty((starts.shape[0],4),dtype=float)
+        bounds[:,0:2] = np.inf
+        bounds[:,2:4] = -np.inf
+        full = self._leaf_count > 0
+        if full.any():
+            leaf_coords = self.coords[order]
+            bounds[full,0] = np.minimum.reduceat(leaf_coords[:,0],starts[full])
+            bounds[full,1] = np.minimum.reduceat(leaf_coords[:,1],starts[full])
+            bounds[full,2] = np.maximum.reduceat(leaf_coords[:,0],starts[full])
+            bounds[full,3] = np.maximum.reduceat(leaf_coords[:,1],starts[full])
+        self.tree = SpatialIndex(bounds)
+    
+    def __len__(self):
+        return(self.coords.shape[0])
+    
+    def query(self,x,y):
+        '''
+        :param x: Query x-coordinates.
+        :type x: numpy.ndarray
+        :param y: Query y-coordinates.
+        :type y: numpy.ndarray
+        :returns: The distance to and the index of the nearest point for each
+         query. Ties are resolved to the lowest index.
+        :rtype: tuple of numpy.ndarray
+        '''
+        x = np.asarray(x,dtype=float).reshape(-1)
+        y = np.asarray(y,dtype=float).reshape(-1)
+        if len(self) == 0:
+            raise(ValueError('No points to query.'))
+        query = np.column_stack((x,y))
+        
+        ## descend to the leaf holding each query for an initial distance
+        node = np.zeros(x.shape[0],dtype=int)
+        for level in range(self.depth):
+            axis = self._split_axis[node]
+            right = query[np.arange(x.shape[0]),axis] >= self._split_value[node]
+            node = 2*node + 1 + right
+        leaf = node - (2**self.depth - 1)
+        dist,_ = self._get_nearest_(query,np.arange(x.shape[0]),leaf)
+        ## an empty leaf has no initial distance and searches every leaf
+        dist[np.isinf(dist)] = np.finfo(float).max
+        
+        ## search all leaves within the initial distance
+        radius = np.sqrt(dist)
+        qidx,leaf = self.tree.query_boxes(np.column_stack((x-radius,y-radius,x+radius,y+radius)))
+        dist,idx = self._get_nearest_(query,qidx,leaf)
+        return(np.sqrt(dist),idx)
+    
+    def _get_nearest_(self,query,qidx,leaf):
+        ## the squared distance to and index of the nearest point in the leaves
+        ## paired with each query
+        count = self._leaf_count[leaf]
+        offsets = np.arange(count.sum()) - np.repeat(np.cumsum(count)-count,count)
+        iidx = self._order[np.repeat(self._leaf_start[leaf],count) + offsets]
+        qidx = np.repeat(qidx,count)
+        diff = self.coords[iidx] - query[qidx]
+        dist = (diff**2).sum(axis=1)
+        ret_dist = np.empty(query.shape[0],dtype=float)
+        ret_dist[:] = np.inf
+        ret_idx = np.zeros(query.shape[0],dtype=int)
+        if qidx.shape[0] == 0:
+            return(ret_dist,ret_idx)
+        ## pairs are grouped by query. reduce each group to its minimum distance
+        ## and the lowest index at that distance.
+        first = np.flatnonzero(np.concatenate(([True],qidx[1:] != qidx[:-1])))
+        group_dist = np.minimum.reduceat(dist,first)
+        nearest = dist == np.repeat(group_dist,np.diff(np.append(first,qidx.shape[0])))
+        group_idx = np.minimum.reduceat(np.where(nearest,iidx,len(self)),first)
+        ret_dist[qidx[first]] = group_dist
+        ret_idx[qidx[first]] = group_idx
+        return(ret_dist,ret_idx)
 
-#geom = sc.get_geom_dict('state_boundaries',{'id':[16]})[0]['geom']
-#geom = sc.get_geom_dict('world_countries')
-#geom = union_geom_dicts(geom)[0]['geom']
-#
-##target = Point(-99.77,41.22)
-#target = make_poly((40,41),(-99,-98))
-#
-#dims = np.arange(10,100,10)
-#build_times = []
-#int_times = []
-#for dim in dims.flat:
-#    print(dim)
-#    
-#    t1 = time.time()
-#    grid = build_index_grid(dim,geom)
-#    index = build_index(geom,grid)
-#    t2 = time.time()
-#    build_times.append(t2-t1)
-#    
-#    t1 = time.time()
-#    index_intersects(target,index)
-#    t2 = time.time()
-#    int_times.append(t2-t1)
-#
-#plt.figure(1)
-#plt.subplot(211)
-#plt.plot(dims,build_times)
-#plt.title('build times')
-#
-#plt.subplot(212)
-#plt.plot(dims,int_times)
-#plt.title('intersects times')
-#
-#plt.show()
 
-#print index_intersects(pt,index)
+def get_kdtree(x,y):
+    '''
+    :returns: A :class:`KDTree` over the points. Trees are cached by the values
+     of the coordinates.
+    :rtype: :class:`KDTree`
+    '''
+    key = (get_array_digest(x),get_array_digest(y))
+    ret = neighbor_cache.get(key)
+    if ret is None:
+        ret = KDTree(x,y)
+        neighbor_cache[key] = ret
+    return(ret)
 
-#import ipdb;ipdb.set_trace()
+def get_points_in_polygon(start,end,x,y):
+    '''
+    Test points against a polygon with the crossing number rule. Points on an
+    edge are inside. Rings are not required to be closed in any orientation.
+    
+    >>> start,end = get_segments(make_poly((0,1),(0,1)))
+    >>> get_points_in_polygon(start,end,np.array([0.5,1,2]),np.array([0.5,0.5,0.5]))
+    array([ True,  True, False])
+    
+    :param start: Start coordinates of the polygon's edges with shape `(n,2)`.
+    :type start: numpy.ndarray
+    :param end: End coordinates of the polygon's edges with shape `(n,2)`.
+    :type end: numpy.ndarray
+    :param x: Point x-coordinates.
+    :type x: numpy.ndarray
+    :param y: Point y-coordinates.
+    :type y: numpy.ndarray
+    :rtype: numpy.ndarray of bool
+    '''
+    ret = np.zeros(x.shape[0],dtype=bool)
+    if start.shape[0] == 0:
+        return(ret)
+    ymin = np.minimum(start[:,1],end[:,1])
+    ymax = np.maximum(start[:,1],end[:,1])
+    ## only edges overlapping a point's horizontal band can cross its ray. bands
+    ## are sized so each holds roughly the square root of the edge count.
+    nbands = max(int(np.sqrt(start.shape[0])),1)
+    band_edges = np.linspace(ymin.min(),ymax.max(),nbands+1)
+    candidates = np.flatnonzero(np.logical_and(y >= band_edges[0],y <= band_edges[-1]))
+    band = np.searchsorted(band_edges,y[candidates],side='right') - 1
+    band = np.clip(band,0,nbands-1)
+    order = np.argsort(band,kind='mergesort')
+    candidates = candidates[order]
+    splits = np.searchsorted(band[order],np.arange(1,nbands))
+    for idx,pidx in enumerate(np.split(candidates,splits)):
+        if pidx.shape[0] == 0:
+            continue
+        eidx = np.flatnonzero(np.logical_and(ymax >= band_edges[idx],ymin <= band_edges[idx+1]))
+        ret[pidx] = _get_inside_(start[eidx],end[eidx],x[pidx],y[pidx])
+    return(ret)
 
-################################################################################
+def _get_inside_(start,end,x,y):
+    ## crossing number test of points against all edges
+    ret = np.zeros(x.shape[0],dtype=bool)
+    if start.shape[0] == 0:
+        return(ret)
+    x0,y0 = start[:,0],start[:,1]
+    x1,y1 = end[:,0],end[:,1]
+    xmin,xmax = np.minimum(x0,x1),np.maximum(x0,x1)
+    ymin,ymax = np.minimum(y0,y1),np.maximum(y0,y1)
+    dx = x1 - x0
+    dy = y1 - y0
+    ## limit the size of the point-by-edge arrays
+    step = max(constants.spatial_index_block_size//start.shape[0],1)
+    for lower in range(0,x.shape[0],step):
+        px = x[lower:lower+step].reshape(-1,1)
+        py = y[lower:lower+step].reshape(-1,1)
+        ## edges crossing the horizontal ray extending right of each point
+        straddle = (y0 > py) != (y1 > py)
+        ## horizontal edges never straddle the ray. their undefined crossings
+        ## are discarded.
+        with np.errstate(divide='ignore',invalid='ignore'):
+            xcross = x0 + (py - y0)*dx/dy
+            crossings = np.logical_and(straddle,px < xcross).sum(axis=1)
+        inside = crossings % 2 == 1
+        ## points on an edge
+        on_edge = np.logical_and.reduce([dx*(py - y0) == dy*(px - x0),
+                                         px >= xmin,px <= xmax,py >= ymin,py <= ymax])
+        ret[lower:lower+step] = np.logical_or(inside,on_edge.any(axis=1))
+    return(ret)
 
-#rtup = (40.0,50.0)
-#ctup = (-120.0,-100.0)
-#dim = 5.0
-#
-#tag = str(datetime.now())
-#target = make_poly(rtup,ctup)
-#grid = shapely_grid(dim,rtup,ctup)
-#index = build_index(target,grid)
-#test_in = make_poly((42.17,43.31),(-118.72,-117.52))
-#test_out = make_poly((41.10,42.81),(-125.56,-123.58))
-#
-#print('in')
-#print(index_intersects(test_in,index))
-#print('out')
-#print(index_intersects(test_out,index))
-#
-#import ipdb;ipdb.set_trace()
-#
-#shapely_to_shp(target,'target_'+tag)
-#shapely_to_shp(grid,'grid_'+tag)
-#shapely_to_shp(test_in,'test_in_'+tag)
-#shapely_to_shp(test_out,'test_out_'+tag)
+def get_segments(polygon):
+    '''
+    :param polygon: A polygonal geometry.
+    :type polygon: :class:`shapely.geometry.Polygon` or :class:`shapely.geometry.MultiPolygon`
+    :returns: Start and end coordinates with shape `(n,2)` of the edges of all
+     rings.
+    :rtype: tuple of numpy.ndarray
+    '''
+    coords = []
+    for part in _get_parts_(polygon):
+        for ring in [part.exterior] + list(part.interiors):
+            coords.append(np.asarray(ring.coords)[:,0:2])
+    if len(coords) == 0:
+        return(np.empty((0,2)),np.empty((0,2)))
+    start = np.concatenate([c[:-1] for c in coords])
+    end = np.concatenate([c[1:] for c in coords])
+    return(start,end)
 
-#sc = ShpCabinet()
-#geom_dict = sc.get_geom_dict('state_boundaries',{'ugid':[25]})
-#geom = geom_dict[0]['geom']
-#bounds = geom.bounds
-#rtup = (bounds[1],bounds[3])
-#ctup = (bounds[0],bounds[2])
-#grid = shapely_grid(1.0,rtup,ctup,target=geom)
-#index = build_index(geom,grid)
-#
-#import ipdb;ipdb.set_trace()
-#
-#shapely_to_shp(geom,'geom_'+tag)
-#shapely_to_shp(grid,'grid_'+tag)
\ No newline at end of file
+def _get_parts_(geom):
+    ## the non-empty single part geometries of a geometry
+    if geom.is_empty:
+        ret = []
+    elif hasattr(geom,'geoms'):
+        ret = []
+        for part in geom.geoms:
+            ret += _get_parts_(part)
+    else:
+        ret = [geom]
+    return(ret)
@@ -0,0 +1,45 @@
+from ocgis.util.spatial.grid import classify_cells, OUTSIDE
+from ocgis.util.helpers import make_poly
+from shapely import prepared
+from shapely.geometry import Point
+import numpy as np
+import time
+
+
+def get_bounds(start,stop,res):
+    edges = np.arange(start,stop+res/2.,res)
+    return(np.column_stack((edges[:-1],edges[1:])))
+
+def select_loop(polygon,row,col):
+    '''The previous approach: a polygon created and tested for each cell.'''
+    prep_polygon = prepared.prep(polygon)
+    mask = np.ones((row.shape[0],col.shape[0]),dtype=bool)
+    for ii in range(row.shape[0]):
+        for jj in range(col.shape[0]):
+            cell = make_poly(row[ii],col[jj])
+            mask[ii,jj] = not (prep_polygon.intersects(cell) and not prep_polygon.touches(cell))
+    return(mask)
+
+def main(res=0.125):
+    ## a state sized selection on a conus grid
+    row = get_bounds(24.,50.,res)
+    col = get_bounds(-125.,-66.,res)
+    polygon = Point(-100.,40.).buffer(5.,resolution=64)
+    print('cells: {0}'.format(row.shape[0]*col.shape[0]))
+    
+    t1 = time.time()
+    loop = select_loop(polygon,row,col)
+    t_loop = time.time() - t1
+    
+    t1 = time.time()
+    vectorized = classify_cells(polygon,row,col) == OUTSIDE
+    t_vectorized = time.time() - t1
+    
+    print('cells differing: {0}'.format(np.sum(loop != vectorized)))
+    print('{0:>12} {1:>10}'.format('method','seconds'))
+    print('{0:>12} {1:>10.4f}'.format('loop',t_loop))
+    print('{0:>12} {1:>10.4f}'.format('vectorized',t_vectorized))
+
+
+if __name__ == '__main__':
+    main()
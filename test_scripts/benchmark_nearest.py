@@ -0,0 +1,48 @@
+from ocgis.util.spatial.index import KDTree
+import numpy as np
+import time
+
+
+def select_loop(x,y,px,py):
+    '''The previous approach: a distance computed for each node.'''
+    coords = np.hstack([x.reshape(-1,1),y.reshape(-1,1)])
+    pt = np.array([px,py]).reshape(1,2)
+    dist = np.empty(coords.shape[0],dtype=float)
+    norm = np.linalg.norm
+    for idx in range(coords.shape[0]):
+        dist[idx] = norm(coords[idx,:]-pt)
+    return(np.argmin(dist))
+
+def main(nrow=412,ncol=424,npoints=100):
+    ## point selections on a rotated cordex sized grid
+    rs = np.random.RandomState(1)
+    y,x = np.meshgrid(np.linspace(20.,70.,nrow),np.linspace(-40.,60.,ncol),indexing='ij')
+    x = x + 5*np.sin(np.radians(y))
+    px = rs.rand(npoints)*100 - 40.
+    py = rs.rand(npoints)*50 + 20.
+    print('nodes: {0}, points: {1}'.format(x.size,npoints))
+    
+    t1 = time.time()
+    loop = [select_loop(x,y,px[idx],py[idx]) for idx in range(npoints)]
+    t_loop = time.time() - t1
+    
+    t1 = time.time()
+    tree = KDTree(x,y)
+    t_build = time.time() - t1
+    t1 = time.time()
+    single = [tree.query(px[idx],py[idx])[1][0] for idx in range(npoints)]
+    t_single = time.time() - t1
+    t1 = time.time()
+    bulk = tree.query(px,py)[1]
+    t_bulk = time.time() - t1
+    
+    print('points differing: {0}'.format(np.sum(np.array(loop) != np.array(single)) + np.sum(np.array(loop) != bulk)))
+    print('{0:>12} {1:>10}'.format('method','seconds'))
+    print('{0:>12} {1:>10.4f}'.format('loop',t_loop))
+    print('{0:>12} {1:>10.4f}'.format('build',t_build))
+    print('{0:>12} {1:>10.4f}'.format('single',t_single))
+    print('{0:>12} {1:>10.4f}'.format('bulk',t_bulk))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+import ocgis
+from ocgis.interface.shp import ShpDataset, ShpSpatialDimension
+from ocgis.util.helpers import make_poly
+import netCDF4 as nc
+import numpy as np
+import tempfile
+import shutil
+import time
+import os
+import itertools
+
+
+def write_dataset(path,ntime=3650,nrow=180,ncol=360):
+    ds = nc.Dataset(path,'w')
+    try:
+        ds.createDimension('time',None)
+        ds.createDimension('lat',nrow)
+        ds.createDimension('lon',ncol)
+        ds.createDimension('bnds',2)
+        time_ = ds.createVariable('time','f8',('time',))
+        time_.units = 'days since 2000-01-01 00:00:00'
+        time_.calendar = 'standard'
+        time_.axis = 'T'
+        time_[:] = np.arange(ntime) + 0.5
+        for name,axis,count,origin in [('lat','Y',nrow,-90.),('lon','X',ncol,-180.)]:
+            var = ds.createVariable(name,'f8',(name,))
+            var.axis = axis
+            var.bounds = name+'_bnds'
+            var[:] = np.arange(count) + origin + 0.5
+            bnds = ds.createVariable(name+'_bnds','f8',(name,'bnds'))
+            bnds[:,0] = var[:] - 0.5
+            bnds[:,1] = var[:] + 0.5
+        tas = ds.createVariable('tas','f4',('time','lat','lon'))
+        for idx in range(0,ntime,365):
+            tas[idx:idx+365,:,:] = np.random.rand(min(365,ntime-idx),nrow,ncol)
+    finally:
+        ds.close()
+
+def get_geoms(ngeom=64,dim=3.0):
+    geoms = np.empty(ngeom,dtype=object)
+    side = int(np.ceil(np.sqrt(ngeom)))
+    for ii,(row,col) in enumerate(itertools.product(range(side),range(side))):
+        if ii == ngeom:
+            break
+        miny,minx = 20.0 + row*dim,-120.0 + col*dim
+        geoms[ii] = make_poly((miny,miny+dim),(minx,minx+dim))
+    uid = np.arange(1,ngeom+1)
+    return(ShpDataset(spatial=ShpSpatialDimension(uid,geoms)))
+
+def main(cores=(1,2,4,8,16,32),ngeom=64):
+    tdir = tempfile.mkdtemp(prefix='ocgis_benchmark_')
+    try:
+        path = os.path.join(tdir,'tas.nc')
+        print('writing dataset...')
+        write_dataset(path)
+        ocgis.env.DIR_OUTPUT = tdir
+        ocgis.env.OVERWRITE = True
+        base = None
+        print('{0:>6} {1:>10} {2:>12} {3:>8}'.format('cores','seconds','geoms/sec','speedup'))
+        for ncores in cores:
+            ocgis.env.SERIAL = ncores == 1
+            ocgis.env.CORES = ncores
+            rd = ocgis.RequestDataset(path,'tas')
+            ops = ocgis.OcgOperations(dataset=rd,geom=get_geoms(ngeom=ngeom),
+                                      calc=[{'func':'mean','name':'mean'}],
+                                      calc_grouping=['month','year'],
+                                      output_format='csv',prefix='cores_{0}'.format(ncores))
+            t1 = time.time()
+            ops.execute()
+            elapsed = time.time() - t1
+            if base is None:
+                base = elapsed
+            print('{0:>6} {1:>10.2f} {2:>12.2f} {3:>8.2f}'.format(ncores,elapsed,ngeom/elapsed,base/elapsed))
+    finally:
+        shutil.rmtree(tdir)
+        ocgis.env.reset()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,39 @@
+from ocgis.util.spatial.index import GeometryIndex
+from shapely import prepared
+from shapely.geometry import Point
+import numpy as np
+import time
+
+
+def select_loop(polygon,x,y):
+    '''The previous approach: a point created and tested for each node.'''
+    prep_polygon = prepared.prep(polygon)
+    ret = np.zeros(x.shape[0],dtype=bool)
+    for idx in range(x.shape[0]):
+        ret[idx] = prep_polygon.intersects(Point(x[idx],y[idx]))
+    return(ret)
+
+def main(npoints=1000000):
+    ## scattered stations against a detailed selection polygon
+    rs = np.random.RandomState(1)
+    x = rs.rand(npoints)*20 - 110.
+    y = rs.rand(npoints)*20 + 30.
+    polygon = Point(-100.,40.).buffer(8.,resolution=512)
+    print('points: {0}'.format(npoints))
+    
+    t1 = time.time()
+    loop = select_loop(polygon,x,y)
+    t_loop = time.time() - t1
+    
+    t1 = time.time()
+    vectorized = GeometryIndex(polygon).intersects_points(x,y)
+    t_vectorized = time.time() - t1
+    
+    print('points differing: {0}'.format(np.sum(loop != vectorized)))
+    print('{0:>12} {1:>10}'.format('method','seconds'))
+    print('{0:>12} {1:>10.4f}'.format('loop',t_loop))
+    print('{0:>12} {1:>10.4f}'.format('vectorized',t_vectorized))
+
+
+if __name__ == '__main__':
+    main()
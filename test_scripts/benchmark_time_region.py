@@ -0,0 +1,72 @@
+import ocgis
+import netCDF4 as nc
+import numpy as np
+import tempfile
+import shutil
+import time
+import os
+
+
+def write_dataset(path,nyear=30,nrow=90,ncol=180):
+    ntime = nyear*365
+    ds = nc.Dataset(path,'w')
+    try:
+        ds.createDimension('time',None)
+        ds.createDimension('lat',nrow)
+        ds.createDimension('lon',ncol)
+        time_ = ds.createVariable('time','f8',('time',))
+        time_.units = 'days since 1970-01-01 00:00:00'
+        time_.calendar = '365_day'
+        time_.axis = 'T'
+        time_[:] = np.arange(ntime) + 0.5
+        for name,axis,count,origin,step in [('lat','Y',nrow,-90.,180./nrow),('lon','X',ncol,-180.,360./ncol)]:
+            var = ds.createVariable(name,'f8',(name,))
+            var.axis = axis
+            var[:] = np.arange(count)*step + origin + step/2.
+        tas = ds.createVariable('tas','f4',('time','lat','lon'))
+        for idx in range(0,ntime,365):
+            tas[idx:idx+365,:,:] = np.random.rand(min(365,ntime-idx),nrow,ncol)
+    finally:
+        ds.close()
+
+def read_hyperslab(ds):
+    '''The previous approach: read the contiguous time span and select the
+    region indices.'''
+    ref = ds._ds.variables[ds.request_dataset.variable]
+    real_idx = ds.temporal.real_idx
+    value = ref[real_idx[0]:real_idx[-1]+1,:,:]
+    time_indices = np.arange(real_idx[0],real_idx[-1]+1)
+    select = np.array([(real_idx == time_index).sum() == 1 for time_index in time_indices])
+    return(value[select,])
+
+def main(nyear=30):
+    tdir = tempfile.mkdtemp(prefix='ocgis_benchmark_')
+    try:
+        path = os.path.join(tdir,'tas.nc')
+        print('writing dataset...')
+        write_dataset(path,nyear=nyear)
+        region = {'month':[6,7,8],'year':None}
+
+        rd = ocgis.RequestDataset(path,'tas',time_region=region)
+        ds = rd.ds.get_subset(temporal=region)
+        print('time steps selected: {0} of {1}'.format(ds.temporal.value.shape[0],rd.ds.temporal.value.shape[0]))
+        print('time runs: {0}'.format(len(ds._get_time_runs_(ds.temporal.real_idx))))
+
+        t1 = time.time()
+        hyperslab = read_hyperslab(ds)
+        t_hyperslab = time.time() - t1
+
+        t1 = time.time()
+        runs = ds.value
+        t_runs = time.time() - t1
+
+        assert(np.all(hyperslab == runs[:,0,:,:]))
+        print('{0:>12} {1:>10}'.format('method','seconds'))
+        print('{0:>12} {1:>10.2f}'.format('hyperslab',t_hyperslab))
+        print('{0:>12} {1:>10.2f}'.format('runs',t_runs))
+    finally:
+        shutil.rmtree(tdir)
+
+
+if __name__ == '__main__':
+    main()
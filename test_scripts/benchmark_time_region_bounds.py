@@ -0,0 +1,82 @@
+import ocgis
+import netCDF4 as nc
+import numpy as np
+import tempfile
+import shutil
+import datetime
+import time
+import os
+
+
+def write_dataset(path,ntime=30000):
+    ds = nc.Dataset(path,'w')
+    try:
+        ds.createDimension('time',None)
+        ds.createDimension('bnds',2)
+        ds.createDimension('lat',2)
+        ds.createDimension('lon',2)
+        time_ = ds.createVariable('time','f8',('time',))
+        time_.units = 'days since 1900-01-01 00:00:00'
+        time_.calendar = 'standard'
+        time_.axis = 'T'
+        time_.bounds = 'time_bnds'
+        time_[:] = np.arange(ntime) + 0.5
+        time_bnds = ds.createVariable('time_bnds','f8',('time','bnds'))
+        time_bnds[:] = np.column_stack((np.arange(ntime),np.arange(ntime) + 1))
+        for name,axis in [('lat','Y'),('lon','X')]:
+            var = ds.createVariable(name,'f8',(name,))
+            var.axis = axis
+            var[:] = [0.5,1.5]
+        tas = ds.createVariable('tas','f4',('time','lat','lon'))
+        tas[:] = np.random.rand(ntime,2,2)
+    finally:
+        ds.close()
+
+def select_loop(temporal,region):
+    '''The previous approach: step through each interval of the bounds in 29.5
+    day increments collecting the months and years touched.'''
+    bounds = temporal.bounds_datetime
+    select = np.zeros(bounds.shape[0],dtype=bool)
+    delta = datetime.timedelta(days=29.5)
+    for ii in range(bounds.shape[0]):
+        start,end = bounds[ii]
+        months,years = set(),set()
+        while start < end:
+            months.add(start.month)
+            years.add(start.year)
+            start += delta
+        select[ii] = any([m in months for m in region['month']]) and \
+                     any([y in years for y in region['year']])
+    return(temporal[select])
+
+def main(ntime=30000):
+    tdir = tempfile.mkdtemp(prefix='ocgis_benchmark_')
+    try:
+        path = os.path.join(tdir,'tas.nc')
+        print('writing dataset...')
+        write_dataset(path,ntime=ntime)
+        region = {'month':[6,7,8],'year':range(1920,1950)}
+        
+        ## load the time axis before timing
+        temporal = ocgis.RequestDataset(path,'tas').ds.temporal
+        temporal.bounds_datetime
+        
+        t1 = time.time()
+        loop = select_loop(temporal,region)
+        t_loop = time.time() - t1
+        
+        t1 = time.time()
+        vectorized = temporal.subset(region)
+        t_vectorized = time.time() - t1
+        
+        assert(np.all(loop.real_idx == vectorized.real_idx))
+        print('time steps selected: {0} of {1}'.format(vectorized.value.shape[0],ntime))
+        print('{0:>12} {1:>10}'.format('method','seconds'))
+        print('{0:>12} {1:>10.4f}'.format('loop',t_loop))
+        print('{0:>12} {1:>10.4f}'.format('vectorized',t_vectorized))
+    finally:
+        shutil.rmtree(tdir)
+
+
+if __name__ == '__main__':
+    main()